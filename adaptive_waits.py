@@ -0,0 +1,148 @@
+"""
+Condition-based settle waits for the preparation path.
+
+The prep steps used fixed sleeps (1s after choosing the site, 0.5s after the date,
+0.3s before continue, ...) whether or not the page was already ready. A SettleWaiter
+instead polls the page until it is idle (document loaded, no jQuery AJAX in flight,
+no visible blockUI overlay, no network activity for a short quiet window, plus an
+optional step-specific DOM check). If the page can't be probed or never reports
+idle, it sleeps a minimum settle time learned from previously recorded waits rather
+than the full legacy sleep. Every wait records how long it took, and the per-instance
+time saved against the legacy sleeps is reported.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+SETTLE_TIMINGS_FILE = 'settle_timings.json'
+
+# Keep this many recent observations per step when learning fallback settle times
+MAX_SAMPLES_PER_STEP = 200
+
+# Page is idle: loaded (or just parsed, with arguments[2] false), no jQuery AJAX in flight, no
+# visible blockUI overlay, no resource finished within the quiet window, and the step-specific
+# check (arguments[1]) passes.
+_PAGE_IDLE_JS = """
+var quietMs = arguments[0];
+var extra = arguments[1];
+var requireComplete = arguments[2];
+if (document.readyState === 'loading' || (requireComplete && document.readyState !== 'complete')) { return false; }
+if (window.jQuery && window.jQuery.active > 0) { return false; }
+var overlays = document.querySelectorAll('div.blockUI.blockOverlay');
+for (var i = 0; i < overlays.length; i++) {
+    if (overlays[i].offsetParent !== null) { return false; }
+}
+if (window.performance && performance.getEntriesByType) {
+    var entries = performance.getEntriesByType('resource');
+    if (entries.length && performance.now() - entries[entries.length - 1].responseEnd < quietMs) { return false; }
+}
+if (extra) { return !!(new Function(extra))(); }
+return true;
+"""
+
+
+class SettleTimingStore:
+    """Thread-safe store of observed settle durations, persisted between runs."""
+
+    def __init__(self, path=SETTLE_TIMINGS_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._samples = {}
+        try:
+            with open(self.path, 'r') as f:
+                self._samples = json.load(f)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logging.warning(f"Ignoring unreadable settle timings file {self.path}: {e}")
+
+    def record(self, step, seconds):
+        with self._lock:
+            samples = self._samples.setdefault(step, [])
+            samples.append(round(seconds, 4))
+            del samples[:-MAX_SAMPLES_PER_STEP]
+
+    def learned_settle(self, step, legacy_seconds):
+        """p95 of observed settle times for ``step``, never more than the legacy sleep."""
+        with self._lock:
+            samples = sorted(self._samples.get(step, []))
+        if len(samples) < 5:
+            return legacy_seconds
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        return min(p95, legacy_seconds)
+
+    def save(self):
+        with self._lock:
+            data = json.dumps(self._samples, indent=2, sort_keys=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
+
+
+class SettleWaiter:
+    """Per-instance waiter; replaces ``time.sleep(legacy_seconds)`` with ``settle(step, legacy_seconds)``."""
+
+    def __init__(self, driver, store, poll_interval=0.05, quiet_ms=100, min_grace=0.05, require_complete=True):
+        self.driver = driver
+        self.store = store
+        self.poll_interval = poll_interval
+        self.quiet_ms = quiet_ms
+        # False with the eager/none page-load strategies: images and fonts still loading don't matter
+        self.require_complete = require_complete
+        # Short floor so an AJAX request triggered by the last action has time to start
+        self.min_grace = min_grace
+        self.steps = []  # (step, legacy_seconds, waited_seconds, how)
+
+    def settle(self, step, legacy_seconds, extra_js=None):
+        """Wait until the page is settled for ``step``. Returns the seconds actually waited."""
+        start = time.perf_counter()
+        time.sleep(self.min_grace)
+        # Never poll for longer than the learned settle time (at most the legacy sleep)
+        learned = self.store.learned_settle(step, legacy_seconds)
+        deadline = start + learned
+        how = "condition"
+        try:
+            while not self.driver.execute_script(_PAGE_IDLE_JS, self.quiet_ms, extra_js, self.require_complete):
+                if time.perf_counter() >= deadline:
+                    how = "timeout"
+                    break
+                time.sleep(self.poll_interval)
+        except Exception as e:
+            logging.debug(f"Settle probe for '{step}' failed ({e}); using learned settle time.")
+            how = "fallback"
+
+        waited = time.perf_counter() - start
+        if how == "condition":
+            self.store.record(step, waited)
+        else:
+            if how == "timeout":
+                # Record the capped wait too, so the learned time isn't drawn down by only the fast samples
+                self.store.record(step, waited)
+            remaining = learned - waited
+            if remaining > 0:
+                time.sleep(remaining)
+            waited = time.perf_counter() - start
+        self.steps.append((step, legacy_seconds, waited, how))
+        return waited
+
+    def time_saved(self):
+        """Seconds saved against the legacy fixed sleeps (negative if slower)."""
+        return sum(legacy - waited for _, legacy, waited, _ in self.steps)
+
+    def report(self):
+        """One-line summary of per-step waits for this instance."""
+        per_step = {}
+        for step, legacy, waited, how in self.steps:
+            agg = per_step.setdefault(step, [0.0, 0.0, 0, set()])
+            agg[0] += legacy
+            agg[1] += waited
+            agg[2] += 1
+            agg[3].add(how)
+        parts = [
+            f"{step} {waited:.2f}s/{legacy:.2f}s" + (f" x{count}" if count > 1 else "") + ("" if hows == {"condition"} else f" [{','.join(sorted(hows))}]")
+            for step, (legacy, waited, count, hows) in per_step.items()
+        ]
+        return f"saved {self.time_saved():.2f}s vs fixed sleeps ({'; '.join(parts)})"
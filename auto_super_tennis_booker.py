@@ -4,21 +4,36 @@ import random
 import os
 import socket
 import threading
+import queue
+import contextlib
+import functools
 from datetime import datetime, timedelta
 from selenium import webdriver
 from selenium.webdriver.support.ui import Select
 from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.by import By
-from selenium.common.exceptions import TimeoutException, WebDriverException, NoSuchElementException, ElementNotInteractableException, ElementClickInterceptedException
-from config import USERS, BOOKING_WINDOW_START, BOOKING_WINDOW_END, COURT_IDS, BOOKING_RULES, COURT_PRIORITIES
-from webdriver_manager.chrome import ChromeDriverManager
-from webdriver_manager.core.os_manager import OperationSystemManager
-import sys
-import subprocess
-import urllib.request, zipfile, tempfile, shutil
-from pathlib import Path
+from selenium.common.exceptions import TimeoutException, WebDriverException, NoSuchElementException, ElementNotInteractableException, ElementClickInterceptedException, StaleElementReferenceException
+from config import USERS, BOOKING_WINDOW_START, BOOKING_WINDOW_END, COURT_IDS, BOOKING_RULES, COURT_PRIORITIES, PERMIT_QUESTION_ANSWERS
+from browser_pool import BrowserPool
+from browser_contexts import ContextBrowserPool
+from resource_usage import log_instance_resources
+from resource_blocking import get_profile as get_blocking_profile
+from driver_cache import resolve_driver_path
+from http_submitter import HttpSubmitter, SUBMIT_BUTTON_XPATH
+from http_booker import HttpTennisBooker, PERMIT_SITE_URL
+from session_cache import SessionCache
+from adaptive_waits import SettleTimingStore, SettleWaiter
+from cdp_channel import open_dom
+from command_trace import CommandRecorder, TracedWait, log_command_report
+from step_timing import StepTracer, render_step_stats
+from heartbeat import HeartbeatMonitor
+from instance_registry import InstanceRegistry, LOGGED_IN, PREPARING, PREPARED, SUBMITTING, SUBMITTED, VERIFIED, DEAD, CLOSED
+from clock_sync import estimate_server_offset
+from timing_calibration import load_override as load_timing_override, load_window as load_timing_window
+from submit_planner import plan_submissions
+from prep_admission import AttemptDurationModel, PrepWatchdog
+from precision_timer import WallClockAnchor, FireTimingRecorder, SubmitWorker, sleep_until, release_on_schedule, fine_grained_switching
 
 # Set up logging with more detailed format and separate levels for handlers
 log_formatter = logging.Formatter('%(asctime)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s')
@@ -57,142 +72,321 @@ success_delay = 5 if DEBUG_MODE else 2
 # Tennis court booking URL
 TENNIS_URL = "https://roosevelt.perfectmind.com/24063/Menu/BookMe4LandingPages?widgetId=15f6af07-39c5-473e-b053-96653f77a406&redirectedFromEmbededMode=False&categoryId=4e7bbe4a-07a7-474f-a6f8-2f46eaa14631"
 
+# Elements each prep step needs (CSS selectors). With the eager/none page-load strategies a
+# navigation returns before the page is complete, so the step polls for exactly these first.
+READINESS_PROBES = {
+    'login_form': ['#loginEmail', '#loginPassword', '#login button'],
+    'permit_form': ['#activity', '#site', '#addFacilitySet', '#event0', 'select[name=startHour]', 'select[name=endHour]', '.controlArea button'],
+    'questions': [f'[id="{element_id}"]' for element_id, _ in PERMIT_QUESTION_ANSWERS] + ['#acceptTerms'],
+}
+
+_MISSING_ELEMENTS_JS = """
+return {missing: arguments[0].filter(function(sel) { return !document.querySelector(sel); }),
+        state: document.readyState};
+"""
+
+# Resumable preparation checkpoints, in order (see TennisBooker.prepare_booking)
+PREP_CHECKPOINTS = ('logged_in', 'form_started', 'court_selected', 'datetime_set', 'questions_opened', 'questions_filled')
+# First permit question; its presence means the questions page is up
+QUESTIONS_PAGE_MARKER_ID = "11e79e5d3daf4712b9e6418d2691b976"
+# Dashboard 'New Permit' button (CSS form of the XPath used for the login check)
+NEW_PERMIT_BUTTON_SELECTOR = 'a[href="/Permits/New"][class="button"]'
+
 class CourtUnavailableError(Exception):
     """Custom exception for when a court is unavailable."""
     pass
 
+# Fills every permit question and ticks acceptTerms in a single WebDriver round trip.
+# All fields are located and matched first; nothing is modified unless every field is
+# fillable, so a failed batch can safely fall back to the per-field path.
+_BATCH_FILL_QUESTIONS_JS = """
+var answers = arguments[0];
+var failed = [];
+var plan = [];
+answers.forEach(function(a) {
+    var el = document.getElementById(a.id);
+    if (!el) { failed.push(a.id + ': not found'); return; }
+    if (el.disabled) { failed.push(a.id + ': disabled'); return; }
+    if (el.tagName === 'SELECT') {
+        // Match on visible text, like select_by_visible_text / typing into the dropdown
+        var wanted = a.value.trim().toLowerCase();
+        var opt = Array.prototype.find.call(el.options, function(o) {
+            return o.text.trim().toLowerCase() === wanted;
+        }) || Array.prototype.find.call(el.options, function(o) {
+            return o.text.trim().toLowerCase().indexOf(wanted) === 0;
+        });
+        if (!opt) { failed.push(a.id + ': no option "' + a.value + '"'); return; }
+        plan.push([el, opt.value]);
+    } else {
+        plan.push([el, a.value]);
+    }
+});
+var terms = document.getElementById('acceptTerms');
+if (!terms) { failed.push('acceptTerms: not found'); }
+if (failed.length) { return failed; }
+
+plan.forEach(function(p) {
+    var el = p[0];
+    el.focus();
+    el.value = p[1];
+    ['input', 'change', 'blur'].forEach(function(type) {
+        el.dispatchEvent(new Event(type, {bubbles: true}));
+    });
+    if (window.jQuery) { window.jQuery(el).trigger('change'); }
+});
+if (!terms.checked) { terms.click(); }
+if (!terms.checked) { failed.push('acceptTerms: did not stay checked'); }
+return failed;
+"""
+
+def _launch_with(driver_path, blocking_profile=None, page_load_strategy="normal"):
+    """Attempt to create a Chrome Service + WebDriver for the given path."""
+    service_obj = Service(driver_path)
+    opts = webdriver.ChromeOptions()
+    opts.page_load_strategy = page_load_strategy
+    # opts.add_argument("--headless=new")  # keep disabled for visibility
+    opts.add_argument("--no-sandbox")
+    opts.add_argument("--disable-dev-shm-usage")
+    opts.add_argument("--disable-gpu")
+    opts.add_argument("--remote-allow-origins=*")
+    if blocking_profile:
+        blocking_profile.apply_options(opts)
+    return webdriver.Chrome(service=service_obj, options=opts)
+
+def launch_chrome_driver(blocking_profile=None, page_load_strategy="normal"):
+    """
+    Launch a configured Chrome WebDriver. Raises WebDriverException if every launch path fails.
+    With a resource_blocking.BlockingProfile, images/fonts/third-party requests are blocked in
+    the initial window (windows opened later need blocking_profile.apply() themselves).
+    ``page_load_strategy`` "eager"/"none" also turns the implicit wait off.
+    """
+    # Driver paths come from the on-disk index in driver_cache, resolved at most once per run,
+    # so launching an instance does no network or subprocess work on a warm cache.
+    driver_path = resolve_driver_path("exact")
+
+    # First launch attempt with version-matched driver; if it immediately exits with
+    # status –9 fall back to the latest patch available for the same major release.
+    try:
+        logging.debug("Launching Chrome browser with configured options (exact patch)…")
+        driver = _launch_with(driver_path, blocking_profile, page_load_strategy)
+    except WebDriverException as e:
+        if "Status code was: -9" in str(e):
+            logging.warning("Exact-match driver crashed (status –9). Retrying with latest patch…")
+            try:
+                # Second attempt with latest arm64 patch
+                driver = _launch_with(resolve_driver_path("latest"), blocking_profile, page_load_strategy)
+            except WebDriverException as e2:
+                if "Status code was: -9" in str(e2):
+                    logging.warning("Latest arm64 patch also crashed. Trying x64 driver under Rosetta…")
+                    try:
+                        # Final attempt with x64 driver under Rosetta
+                        driver = _launch_with(resolve_driver_path("x64"), blocking_profile, page_load_strategy)
+                    except Exception as e3:
+                        logging.error(f"Failed to launch x64 driver via Rosetta: {e3}")
+                        raise
+                else:
+                    raise
+        else:
+            raise
+    logging.debug("Chrome browser launched. Setting page load timeout and implicit wait...")
+    # Set page load timeout to prevent indefinite waiting
+    driver.set_page_load_timeout(30)  # Set to 30 seconds
+    if page_load_strategy == "normal":
+        driver.implicitly_wait(3)  # Reduced wait time
+    else:
+        # Readiness probes and explicit waits do the waiting; a missing element fails at once
+        driver.implicitly_wait(0)
+    if blocking_profile:
+        try:
+            blocking_profile.apply(driver)
+        except WebDriverException as e:
+            logging.warning(f"Could not apply request blocking profile {blocking_profile.name}: {e}")
+    return driver
+
 class TennisBooker:
-    def __init__(self):
+    def __init__(self, driver=None, submit_mode="browser", session_cache=None, batch_form_fill=False, settle_store=None, tracer=None, blocking_profile=None, page_load_strategy="normal", dom_backend="webdriver", command_recorder=None):
         self.driver = None
+        # resource_blocking.BlockingProfile applied to a cold-launched browser
+        self.blocking_profile = blocking_profile
+        # "eager"/"none": navigations return early and each step probes for its own elements
+        self.page_load_strategy = page_load_strategy
+        self.fast_navigation = page_load_strategy != "normal"
+        self.readiness = []  # (probe, seconds waited, document.readyState when ready)
+        # "webdriver" or "cdp": transport for the form steps' DOM actions (see cdp_channel.py)
+        self.dom_backend = dom_backend
+        self._dom = None
         self.wait = None
+        self.session_cache = session_cache  # optional SessionCache for skipping the login form
+        # Fill all permit questions with one injected script instead of ~30 WebDriver calls
+        self.batch_form_fill = batch_form_fill
+        # With a SettleTimingStore, fixed sleeps in the prep path become condition-based waits
+        self.settle_store = settle_store
+        self.waiter = None
+        # Optional StepTracer recording per-step durations to prep_step_timings.jsonl
+        self.tracer = tracer
+        self.trace_id = tracer.new_instance_id() if tracer else None
+        # Optional command_trace.CommandRecorder recording every WebDriver command and wait
+        self.command_recorder = command_recorder
+        # "browser" clicks the submit button via WebDriver; "http" posts the captured form
+        # directly from a pre-connected HTTP session (falls back to "browser" if capture fails)
+        self.submit_mode = submit_mode
+        self.http_submitter = None
+        # Submit button located ahead of the target time by locate_submit_button()
+        self.submit_button = None
+        # Set once the prep watchdog has killed this instance's browser
+        self.aborted = False
+        # Last resumable preparation step completed (one of PREP_CHECKPOINTS)
+        self.checkpoint = None
         # Store details for logging in submit method if needed
         self.court_info_for_logging = "Unknown"
         self.user_email: str | None = None  # set on successful login so we can report which account submits
-        self.setup_driver()
+        if driver is not None:
+            # Already-running session checked out of the BrowserPool
+            self.driver = driver
+            if command_recorder:
+                command_recorder.instrument(self.driver, self)
+            self.wait = TracedWait(self.driver, 10)
+            logging.debug("Using pre-launched Chrome WebDriver from browser pool")
+        else:
+            with self._span("launch"):
+                self.setup_driver()
+
+    @contextlib.contextmanager
+    def _span(self, step, **attrs):
+        """Timing span for ``step`` when a tracer is configured; WebDriver commands inside are attributed to it."""
+        with contextlib.ExitStack() as span:
+            if self.command_recorder is not None:
+                span.enter_context(self.command_recorder.step(step))
+            if self.tracer is not None:
+                attrs.setdefault('account', self.user_email)
+                attrs.setdefault('court_info', self.court_info_for_logging)
+                attrs.setdefault('page_load_strategy', self.page_load_strategy)
+                span.enter_context(self.tracer.span(self.trace_id, step, **attrs))
+            yield
 
     def setup_driver(self):
         """Initialize the Chrome WebDriver."""
         try:
-            logging.debug("Attempting to initialize Chrome Service with webdriver-manager...")
-            # Resolve local Chrome version so we can fetch an exact-match driver (patch version too).
-            def _detect_chrome_version():
-                """Return installed Chrome full version without launching the app (macOS only)."""
-                if sys.platform != "darwin":
-                    return None
-                plist = "/Applications/Google Chrome.app/Contents/Info.plist"
-                if not os.path.exists(plist):
-                    return None
-                try:
-                    out = subprocess.check_output([
-                        "/usr/libexec/PlistBuddy",
-                        "-c",
-                        "Print :CFBundleShortVersionString",
-                        plist,
-                    ], text=True)
-                    return out.strip()
-                except Exception as e:
-                    logging.debug(f"Could not determine Chrome version: {e}")
-                    return None
-
-            chrome_version = _detect_chrome_version()
-
-            if chrome_version:
-                logging.debug(f"Detected Chrome version: {chrome_version}. Fetching matching driver…")
-                driver_path = ChromeDriverManager(driver_version=chrome_version).install()
-            else:
-                logging.debug("Chrome version could not be detected; falling back to latest driver.")
-                driver_path = ChromeDriverManager().install()
-
-            # macOS Gatekeeper quarantines downloaded executables; if the attribute is present
-            # the chromedriver process will be killed (exit code -9) as soon as it launches.
-            # Clearing the attribute once per download makes every future launch safe.
-            if sys.platform == "darwin":
-                for target in (driver_path, os.path.dirname(driver_path)):
-                    if os.path.exists(target):
-                        try:
-                            subprocess.run(["xattr", "-dr", "com.apple.quarantine", target], check=False)
-                        except Exception as e:
-                            logging.debug(f"Unable to clear quarantine attribute on {target}: {e}")
-
-            def _launch_with(driver_path):
-                """Attempt to create a Chrome Service + WebDriver for the given path."""
-                service_obj = Service(driver_path)
-                opts = webdriver.ChromeOptions()
-                # opts.add_argument("--headless=new")  # keep disabled for visibility
-                opts.add_argument("--no-sandbox")
-                opts.add_argument("--disable-dev-shm-usage")
-                opts.add_argument("--disable-gpu")
-                opts.add_argument("--remote-allow-origins=*")
-                return webdriver.Chrome(service=service_obj, options=opts)
-
-            # First launch attempt with version-matched driver; if it immediately exits with
-            # status –9 fall back to the latest patch available for the same major release.
-            try:
-                logging.debug("Launching Chrome browser with configured options (exact patch)…")
-                self.driver = _launch_with(driver_path)
-            except WebDriverException as e:
-                if "Status code was: -9" in str(e):
-                    logging.warning("Exact-match driver crashed (status –9). Fetching latest patch and retrying…")
-                    # Download latest patch (webdriver-manager default) and clear quarantine again
-                    driver_path_latest = ChromeDriverManager().install()
-                    if sys.platform == "darwin":
-                        for target in (driver_path_latest, os.path.dirname(driver_path_latest)):
-                            if os.path.exists(target):
-                                subprocess.run(["xattr", "-dr", "com.apple.quarantine", target], check=False)
-                    try:
-                        # Second attempt with latest arm64 patch
-                        self.driver = _launch_with(driver_path_latest)
-                    except WebDriverException as e2:
-                        if "Status code was: -9" in str(e2):
-                            logging.warning("Latest arm64 patch also crashed. Trying x64 driver under Rosetta…")
-                            try:
-                                tmp_dir = Path(tempfile.mkdtemp(prefix="chromedriver_x64_"))
-                                zip_path = tmp_dir / "driver.zip"
-                                url = (
-                                    f"https://storage.googleapis.com/chrome-for-testing-public/"
-                                    f"{chrome_version}/mac-x64/chromedriver-mac-x64.zip"
-                                )
-                                urllib.request.urlretrieve(url, zip_path)
-                                with zipfile.ZipFile(zip_path) as zf:
-                                    zf.extractall(tmp_dir)
-                                driver_path_x64 = str(next(tmp_dir.glob("**/chromedriver")))
-                                # Ensure executable permissions
-                                os.chmod(driver_path_x64, 0o755)
-                                if sys.platform == "darwin":
-                                    for target in (driver_path_x64, os.path.dirname(driver_path_x64)):
-                                        if os.path.exists(target):
-                                            subprocess.run(["xattr", "-dr", "com.apple.quarantine", target], check=False)
-                                # Final attempt with x64 driver under Rosetta
-                                self.driver = _launch_with(driver_path_x64)
-                            except Exception as e3:
-                                logging.error(f"Failed to launch x64 driver via Rosetta: {e3}")
-                                raise
-                        else:
-                            raise
-                else:
-                    raise
-            logging.debug("Chrome browser launched. Setting up WebDriverWait...")
-            self.wait = WebDriverWait(self.driver, 10)
-            # Set page load timeout to prevent indefinite waiting
-            self.driver.set_page_load_timeout(30)  # Set to 30 seconds
-            logging.debug("WebDriverWait set. Setting implicit wait...")
-            self.driver.implicitly_wait(3)  # Reduced wait time
+            self.driver = launch_chrome_driver(self.blocking_profile, self.page_load_strategy)
+            if self.command_recorder:
+                self.command_recorder.instrument(self.driver, self)
+            logging.debug("Setting up WebDriverWait...")
+            self.wait = TracedWait(self.driver, 10)
             logging.info("Chrome WebDriver initialized successfully") # Changed to info for more visibility
             return True
         except WebDriverException as e:
             logging.error(f"Failed to initialize WebDriver: {str(e)}")
             return False
 
-    def login(self, email, password):
-        """Log in to the tennis reservation system using the existing driver."""
+    def _restore_cached_session(self, account, email):
+        """Load cached cookies for ``account`` and probe the dashboard. Returns True if still logged in."""
+        cookies = self.session_cache.load(account)
+        if not cookies:
+            return False
+        try:
+            # CDP sets cookies without first navigating to the domain; fall back to add_cookie if unavailable
+            try:
+                self.driver.execute_cdp_cmd("Network.setCookies", {"cookies": [
+                    {k: v for k, v in {
+                        'name': c['name'], 'value': c['value'], 'domain': c.get('domain'),
+                        'path': c.get('path', '/'), 'secure': c.get('secure', False),
+                        'httpOnly': c.get('httpOnly', False), 'expires': c.get('expiry'),
+                    }.items() if v is not None}
+                    for c in cookies
+                ]})
+            except Exception:
+                # Any same-origin page will do for add_cookie; favicon.ico is blocked by the 'images' kind
+                self.driver.get("https://rioc.civicpermits.com/robots.txt")
+                for c in cookies:
+                    self.driver.add_cookie({k: v for k, v in c.items() if k in ('name', 'value', 'domain', 'path', 'secure', 'httpOnly', 'expiry')})
+
+            self.driver.get("https://rioc.civicpermits.com/")
+            TracedWait(self.driver, 3).until(
+                EC.presence_of_element_located((By.XPATH, '//a[@href="/Permits/New" and @class="button"]'))
+            )
+            self.user_email = email
+            logging.info(f"Successfully logged in as {email} (cached session)")
+            return True
+        except Exception as e:
+            logging.debug(f"[{email}] Cached session rejected ({type(e).__name__}); logging in again.")
+            self.session_cache.invalidate(account)
+            try:
+                self.driver.delete_all_cookies()
+            except Exception:
+                pass
+            return False
+
+    @property
+    def dom(self):
+        """DOM actions for the form steps over ``dom_backend``, bound to the current driver."""
+        if self._dom is None or self._dom.driver is not self.driver:
+            if self._dom is not None:
+                self._dom.close()
+            self._dom = open_dom(self.driver, self.dom_backend)
+        return self._dom
+
+    def _settle(self, step, legacy_seconds, extra_js=None):
+        """Wait for the page to settle after ``step``; the original fixed sleep without a settle store."""
+        if self.settle_store is None:
+            time.sleep(legacy_seconds)
+            return
+        if self.waiter is None or self.waiter.driver is not self.driver:
+            if self.fast_navigation:
+                # Subresources still loading don't matter here; jQuery/overlay checks still apply
+                self.waiter = SettleWaiter(self.driver, self.settle_store, quiet_ms=0, require_complete=False)
+            else:
+                self.waiter = SettleWaiter(self.driver, self.settle_store)
+        self.waiter.settle(step, legacy_seconds, extra_js)
+
+    def _await_ready(self, probe, timeout=30):
+        """
+        With fast navigation, poll until every element READINESS_PROBES[probe] lists is in the
+        DOM. A no-op with the normal strategy, whose navigations already wait for the full load.
+        """
+        if not self.fast_navigation:
+            return
+        start = time.perf_counter()
+        missing = READINESS_PROBES[probe]
+        while True:
+            try:
+                result = self.dom.evaluate(_MISSING_ELEMENTS_JS, READINESS_PROBES[probe])
+                missing = result['missing']
+                if not missing:
+                    break
+            except WebDriverException:
+                pass  # document swapped out mid-navigation; probe again
+            if time.perf_counter() - start >= timeout:
+                raise TimeoutException(f"Page not ready for {probe} after {timeout}s; missing {', '.join(missing)}")
+            time.sleep(0.025)
+        self.readiness.append((probe, time.perf_counter() - start, result['state']))
+
+    def readiness_report(self):
+        """One-line summary of the readiness probes for this instance."""
+        return ", ".join(f"{probe} {waited*1000:.0f}ms ({state})" for probe, waited, state in self.readiness)
+
+    def login(self, email, password, account=None, reuse_session=True):
+        """Log in to the tennis reservation system using the existing driver.
+
+        With a session cache and an ``account`` (USERS key), a still-valid cached session
+        is reused and the login form is skipped. Pass ``reuse_session=False`` when another
+        live instance of the account may be using that session.
+        """
+        with self._span("login", account=email):
+            return self._login(email, password, account, reuse_session)
+
+    def _login(self, email, password, account, reuse_session=True):
         try:
             # Use the existing driver instance
             if not self.driver:
                 logging.error("Driver not initialized before login attempt.")
                 return False
 
+            if self.session_cache and account and reuse_session and self._restore_cached_session(account, email):
+                return True
+
             logging.debug(f"[{email}] Attempting to navigate to login page")
             self.driver.get("https://rioc.civicpermits.com/")
+            self._await_ready('login_form')
 
             # Find the email and password fields and fill them directly
             logging.debug(f"[{email}] Filling login credentials")
@@ -205,12 +399,17 @@ class TennisBooker:
 
             # Wait for the login to complete by checking for a known element on the dashboard
             try:
-                WebDriverWait(self.driver, 10).until(
+                TracedWait(self.driver, 10).until(
                     EC.presence_of_element_located((By.XPATH, '//a[@href="/Permits/New" and @class="button"]')) # 'New Permit' button
                 )
                 # Remember which account is logged in for later reporting
                 self.user_email = email
                 logging.info(f"Successfully logged in as {email}")
+                if self.session_cache and account:
+                    try:
+                        self.session_cache.save(account, self.driver.get_cookies())
+                    except Exception as cache_err:
+                        logging.warning(f"Could not cache login session for {account}: {cache_err}")
                 return True
             except TimeoutException:
                 logging.error(f"Login failed for {email}: Did not reach dashboard after login click.")
@@ -243,20 +442,12 @@ class TennisBooker:
         for attempt in range(max_attempts):
             try:
                 # First wait for any existing overlay to disappear
-                try:
-                    WebDriverWait(self.driver, 10).until(
-                        EC.invisibility_of_element_located((By.CSS_SELECTOR, "div.blockUI.blockOverlay"))
-                    )
-                except TimeoutException:
+                if not self.dom.wait_gone("div.blockUI.blockOverlay", timeout=10):
                     logging.debug(f"Attempt {attempt+1}/{max_attempts}: Overlay not present or did not disappear in 10s.")
                 
-                # Then wait until the button is clickable
-                new_permit_button = WebDriverWait(self.driver, 10).until(
-                    EC.element_to_be_clickable((By.XPATH, '//a[@href="/Permits/New" and @class="button"]'))
-                )
-                
-                # Try JavaScript click which can sometimes bypass overlay issues
-                self.driver.execute_script("arguments[0].click();", new_permit_button)
+                # Then wait until the button is clickable and use a JavaScript click,
+                # which can sometimes bypass overlay issues
+                self.dom.click(NEW_PERMIT_BUTTON_SELECTOR, timeout=10)
                 
                 # If we reach here without exception, break the loop
                 logging.debug("Successfully clicked New Permit button")
@@ -271,8 +462,9 @@ class TennisBooker:
                     logging.error(f"All {max_attempts} attempts to click New Permit button failed.")
                     raise
         
+        self._await_ready('permit_form')
         logging.debug("Filling activity field")
-        self.wait.until(EC.element_to_be_clickable((By.ID, "activity"))).send_keys("Tennis Match")
+        self.dom.type("#activity", "Tennis Match")
 
     def select_court(self, court_number):
         """Select a specific court from the list."""
@@ -290,20 +482,16 @@ class TennisBooker:
                 raise ValueError(f"Unknown court number: {court_number}")
 
             # Select the site from dropdown
-            site_dropdown = Select(self.wait.until(EC.element_to_be_clickable((By.ID, "site"))))
-            site_dropdown.select_by_visible_text(court_name)
-            time.sleep(1) # Allow facility list to update
+            self.dom.select("#site", text=court_name)
+            self._settle("site_select", 1) # Allow facility list to update
 
             # Click "Add Facility" button
             logging.debug("Clicking Add Facility button")
-            add_facility_button = self.wait.until(EC.element_to_be_clickable((By.ID, "addFacilitySet")))
-            self.driver.execute_script("arguments[0].click();", add_facility_button)
+            self.dom.click("#addFacilitySet")
 
             # Select the specific facility checkbox
             checkbox_id = COURT_IDS[court_number]
-            facility_checkbox = self.wait.until(EC.element_to_be_clickable((By.ID, checkbox_id)))
-            if not facility_checkbox.is_selected():
-                facility_checkbox.click()
+            self.dom.check(f'[id="{checkbox_id}"]')
 
         except NoSuchElementException as e:
             logging.error(f"Court {court_number} element not found: {str(e)}")
@@ -316,87 +504,110 @@ class TennisBooker:
         """Set the date and time on the form."""
         formatted_date = booking_date.strftime('%m/%d/%Y')
         logging.debug(f"Setting date to {formatted_date}")
-        date_field = self.wait.until(EC.element_to_be_clickable((By.ID, "event0")))
-        date_field.send_keys(formatted_date)
-        self.driver.find_element(By.TAG_NAME, 'body').click() # Trigger validation
+        self.dom.type("#event0", formatted_date, clear=True)  # a resumed attempt may find the date already typed
+        self.dom.blur() # Trigger validation
         logging.debug("Waiting briefly after setting date...")
-        time.sleep(0.5) # Short pause after date setting
+        self._settle("date_set", 0.5) # Short pause after date setting
 
         start_hour = int(start_time.split(':')[0])
         end_hour = start_hour + 1
         logging.info(f"Setting time to {start_hour}:00-{end_hour}:00")
 
         try:
-            start_hour_dropdown = Select(self.wait.until(EC.element_to_be_clickable((By.NAME, "startHour"))))
-            start_hour_dropdown.select_by_value(str(start_hour))
-            end_hour_dropdown = Select(self.wait.until(EC.element_to_be_clickable((By.NAME, "endHour"))))
-            end_hour_dropdown.select_by_value(str(end_hour))
-            time.sleep(0.2)
+            self.dom.select("select[name=startHour]", value=str(start_hour))
+            self.dom.select("select[name=endHour]", value=str(end_hour))
+            self._settle("time_set", 0.2)
         except Exception as e:
             logging.error(f"Error setting time: {str(e)}")
             raise
 
+    def _fill_permit_questions_batch(self):
+        """Fill every permit question in one script call. Returns the list of fields that failed."""
+        answers = [
+            {'id': element_id, 'value': answer[1] if isinstance(answer, tuple) else answer}
+            for element_id, answer in PERMIT_QUESTION_ANSWERS
+        ]
+        return self.dom.evaluate(_BATCH_FILL_QUESTIONS_JS, answers) or []
+
     def _fill_permit_questions(self):
         """Fill out the permit questions section."""
+        if self.batch_form_fill:
+            logging.debug("Filling permit questions (batch)")
+            try:
+                failed = self._fill_permit_questions_batch()
+            except Exception as e:
+                failed = [f"script error: {e}"]
+            if not failed:
+                logging.debug("Successfully filled permit questions in one round trip")
+                return
+            logging.warning(f"Batch fill failed for {self.court_info_for_logging} ({'; '.join(failed)}). Falling back to field-by-field fill.")
+
         logging.debug("Filling permit questions")
         try:
             # Using IDs directly
-            time.sleep(1) # Extra small pause before interacting with the first field
-            activity_field = self.wait.until(EC.element_to_be_clickable((By.ID, "11e79e5d3daf4712b9e6418d2691b976")))
+            self._settle("questions_ready", 1) # Extra small pause before interacting with the first field
+            activity_field = self.wait.until(EC.element_to_be_clickable((By.ID, QUESTIONS_PAGE_MARKER_ID)))
             activity_field.clear()
             activity_field.send_keys("Playing tennis")
-            time.sleep(0.1) # Short pause for stability
+            self._settle("between_fields", 0.1) # Short pause for stability
 
             num_people_field = self.wait.until(EC.element_to_be_clickable((By.ID, "af8966101be44676b4ee564b052e1e87")))
             num_people_field.clear()
             num_people_field.send_keys("2")
-            time.sleep(0.1) # Short pause for stability
+            self._settle("between_fields", 0.1) # Short pause for stability
 
             participants_charged_field = self.wait.until(EC.element_to_be_clickable((By.ID, "f28f0dbea8b5438495778b0bb0ddcd93")))
-            participants_charged_field.send_keys("No") # Assuming clear() is not needed if default is different or if send_keys overwrites
-            time.sleep(0.1)
+            participants_charged_field.clear()
+            participants_charged_field.send_keys("No")
+            self._settle("between_fields", 0.1)
 
             spectators_charged_field = self.wait.until(EC.element_to_be_clickable((By.ID, "d46cb434558845fb9e0318ab6832e427")))
+            spectators_charged_field.clear()
             spectators_charged_field.send_keys("No")
-            time.sleep(0.1)
+            self._settle("between_fields", 0.1)
 
             table_chair_field = self.wait.until(EC.element_to_be_clickable((By.ID, "1221940f5cca4abdb5288cfcbe284820")))
+            table_chair_field.clear()
             table_chair_field.send_keys("None")
-            time.sleep(0.1)
+            self._settle("between_fields", 0.1)
 
             live_entertainment_field = self.wait.until(EC.element_to_be_clickable((By.ID, "0ce54956c4b14746ae5d364507da1e85")))
+            live_entertainment_field.clear()
             live_entertainment_field.send_keys("None")
-            time.sleep(0.1)
+            self._settle("between_fields", 0.1)
 
             advertised_field = self.wait.until(EC.element_to_be_clickable((By.ID, "6b1dda4172f840c7879662bcab1819db")))
+            advertised_field.clear()
             advertised_field.send_keys("None")
-            time.sleep(0.1)
+            self._settle("between_fields", 0.1)
 
             parking_needs_field = self.wait.until(EC.element_to_be_clickable((By.ID, "a31f4297075e4dab8c0ef154f2b9b1c1")))
+            parking_needs_field.clear()
             parking_needs_field.send_keys("None")
-            time.sleep(0.1)
+            self._settle("between_fields", 0.1)
 
             # Dropdowns
             prev_permit_dropdown = Select(self.wait.until(EC.element_to_be_clickable((By.ID, "3754dcef7216446b9cc4bf1cd0f12a2e"))))
             prev_permit_dropdown.select_by_visible_text("No")
-            time.sleep(0.1)
+            self._settle("between_fields", 0.1)
 
             on_site_security_dropdown = Select(self.wait.until(EC.element_to_be_clickable((By.ID, "06b3f73192a84fd6b88758e56a64c3ad"))))
             on_site_security_dropdown.select_by_visible_text("No")
-            time.sleep(0.1)
+            self._settle("between_fields", 0.1)
 
             # Wait for any blocking overlay to disappear, then click the terms checkbox via JS
             max_attempts_terms = 3
             for attempt in range(max_attempts_terms):
                 try:
                     # Wait up to 10s for the overlay to be gone
-                    WebDriverWait(self.driver, 10).until(
+                    TracedWait(self.driver, 10).until(
                         EC.invisibility_of_element_located((By.CSS_SELECTOR, "div.blockUI.blockOverlay"))
                     )
 
                     terms_checkbox = self.wait.until(EC.element_to_be_clickable((By.ID, "acceptTerms")))
-                    # Use JavaScript click to minimise interception issues
-                    self.driver.execute_script("arguments[0].click();", terms_checkbox)
+                    # Use JavaScript click to minimise interception issues; a resumed fill may find it ticked
+                    if not terms_checkbox.is_selected():
+                        self.driver.execute_script("arguments[0].click();", terms_checkbox)
                     break  # success
                 except Exception as e:
                     if attempt < max_attempts_terms - 1:
@@ -406,66 +617,153 @@ class TennisBooker:
                         logging.error("All attempts to click acceptTerms checkbox failed.")
                         raise
 
-            time.sleep(0.2)
+            self._settle("terms_accepted", 0.2)
             logging.debug("Successfully filled permit questions")
 
         except Exception as e:
             logging.error(f"Failed to fill permit questions: {str(e)}")
             raise
 
-    def prepare_booking(self, court_number, booking_date, start_time):
-        """Prepare the booking form up to the point before final submission click."""
-        # Store details for logging in the submit method
-        self.court_info_for_logging = f"Court {court_number} on {booking_date.strftime('%m/%d/%Y')} at {start_time}"
+    def _open_permit_questions(self):
+        """Click Continue on the permit form and wait for the questions page."""
+        logging.info(f"Continuing to permit questions page for {self.court_info_for_logging}")
+        try:
+            # Click with timeout protection using robust JS click
+            logging.debug("Scrolling to and clicking continue button...")
+            self.dom.scroll_into_view(".controlArea button")
+            self._settle("before_continue", 0.3, "return !!document.querySelector('.controlArea button');") # Brief pause for UI to settle
+            self.dom.click(".controlArea button")
+
+            # Wait for the page to actually load by checking for a known element on the questions page
+            self.dom.wait_for(f'[id="{QUESTIONS_PAGE_MARKER_ID}"]', clickable=False, timeout=30)  # First question field ID
+            self._await_ready('questions')
+        except (TimeoutException, ElementClickInterceptedException) as e:
+            logging.error(f"Failed to navigate to questions page for {self.court_info_for_logging}: {type(e).__name__} - {e}")
+            raise
+        except Exception as e:
+            logging.error(f"Unexpected error navigating to questions page for {self.court_info_for_logging}: {str(e)}")
+            raise # Re-raise to be caught by prepare_booking
+
+    def _resume_point(self):
+        """
+        Checkpoint a failed preparation can safely resume from, judged by the page the
+        browser is on: the questions page keeps 'questions_opened'; the permit form keeps
+        the last form checkpoint once the court is in (select_court is not repeatable on the
+        same form); anything else goes back to the dashboard for a fresh form. Returns None
+        if the session can't be recovered.
+        """
         try:
-            self.start_new_permit_form()
-            self.select_court(court_number)
-            self.set_date_and_time(booking_date, start_time)
+            page = self.driver.execute_script(
+                "return {questions: !!document.getElementById(arguments[0]), form: !!document.getElementById('activity')};",
+                QUESTIONS_PAGE_MARKER_ID,
+            )
+            if page.get('questions'):
+                return 'questions_opened'
+            if page.get('form') and self.checkpoint in ('court_selected', 'datetime_set'):
+                return self.checkpoint
+            # Fresh form from the dashboard; the login itself is kept
+            self.driver.get("https://rioc.civicpermits.com/")
+            TracedWait(self.driver, 10).until(
+                EC.presence_of_element_located((By.XPATH, '//a[@href="/Permits/New" and @class="button"]'))
+            )
+            return 'logged_in'
+        except Exception as e:
+            logging.warning(f"Could not restore a checkpoint for {self.court_info_for_logging}: {e}")
+            return None
 
-            logging.info(f"Continuing to permit questions page for {self.court_info_for_logging}")
+    def prepare_booking(self, court_number, booking_date, start_time, retries=0, deadline=None):
+        """
+        Prepare the booking form up to the point before final submission click.
+
+        The form is filled in resumable steps; each completed step sets ``self.checkpoint``.
+        A failed step is retried from the last checkpoint the page still supports, in the same
+        session, up to ``retries`` times and only while ``deadline`` (epoch seconds) allows.
+        """
+        # Store details for logging in the submit method
+        self.court_info_for_logging = f"Court {court_number} on {booking_date.strftime('%m/%d/%Y')} at {start_time}"
+        steps = [
+            ("start_new_permit_form", 'form_started', self.start_new_permit_form),
+            ("select_court", 'court_selected', lambda: self.select_court(court_number)),
+            ("set_date_and_time", 'datetime_set', lambda: self.set_date_and_time(booking_date, start_time)),
+            ("continue", 'questions_opened', self._open_permit_questions),
+            ("fill_questions", 'questions_filled', self._fill_permit_questions),
+        ]
+        self.checkpoint = 'logged_in'
+        attempt = 0
+        while True:
             try:
-                continue_button = self.wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, ".controlArea button")))
-                # Click with timeout protection using robust JS click
-                logging.debug("Scrolling to and clicking continue button...")
-                self.driver.execute_script("arguments[0].scrollIntoView(true);", continue_button)
-                time.sleep(0.3) # Brief pause for UI to settle
-                self.driver.execute_script("arguments[0].click();", continue_button)
-
-                # Wait for the page to actually load by checking for a known element on the questions page
-                WebDriverWait(self.driver, 30).until(
-                    EC.presence_of_element_located((By.ID, "11e79e5d3daf4712b9e6418d2691b976"))  # First question field ID
-                )
-            except (TimeoutException, ElementClickInterceptedException) as e:
-                logging.error(f"Failed to navigate to questions page for {self.court_info_for_logging}: {type(e).__name__} - {e}")
-                # Optional: self.driver.save_screenshot(f"error_questions_page_{self.court_info_for_logging.replace(' ', '_')}.png")
-                raise
-            except Exception as e:
-                logging.error(f"Unexpected error navigating to questions page for {self.court_info_for_logging}: {str(e)}")
-                raise # Re-raise to be caught by the main loop
+                resume_from = PREP_CHECKPOINTS.index(self.checkpoint)
+                for step, checkpoint, action in steps[resume_from:]:
+                    with self._span(step, attempt=attempt):
+                        action()
+                    self.checkpoint = checkpoint
+                break
 
-            self._fill_permit_questions()
+            except CourtUnavailableError as e:
+                # Log as warning because this might be expected (court taken during prep)
+                logging.warning(f"Preparation failed for {self.court_info_for_logging}: {str(e)}")
+                return False
+            except Exception as e:
+                # Log other exceptions during preparation as errors
+                logging.error(f"Failed to prepare booking for {self.court_info_for_logging}: {str(e)}")
+                try:
+                    logging.debug(f"Current URL during preparation error: {self.driver.current_url}")
+                    self.save_screenshot_on_error() # Save screenshot
+                except Exception: # Handle cases where driver might be dead
+                    pass
+                if attempt >= retries or self.aborted or (deadline is not None and time.time() >= deadline):
+                    return False
+                failed_at = self.checkpoint
+                self.checkpoint = self._resume_point()
+                if self.checkpoint is None:
+                    return False
+                attempt += 1
+                logging.warning(
+                    f"Retrying preparation of {self.court_info_for_logging} in the same session from checkpoint "
+                    f"'{self.checkpoint}' (failed after '{failed_at}'; retry {attempt}/{retries})."
+                )
 
+        try:
             logging.debug("Scrolling to bottom of the page.")
             self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(0.2)
+            self._settle("after_scroll", 0.2)
+        except Exception as e:
+            logging.error(f"Failed to prepare booking for {self.court_info_for_logging}: {str(e)}")
+            return False
 
-            logging.info(f"Booking preparation complete for {self.court_info_for_logging}. Ready for timed submission.")
-            return True
+        if self.submit_mode == "http":
+            self.capture_http_submission()
 
-        except CourtUnavailableError as e:
-            # Log as warning because this might be expected (court taken during prep)
-            logging.warning(f"Preparation failed for {self.court_info_for_logging}: {str(e)}")
-            return False
+        if self.waiter:
+            logging.info(f"Adaptive waits for {self.court_info_for_logging}: {self.waiter.report()}")
+        if self.readiness:
+            logging.info(f"Readiness probes ({self.page_load_strategy}) for {self.court_info_for_logging}: {self.readiness_report()}")
+        if self._dom and self._dom.command_count is not None:
+            logging.info(f"Form actions for {self.court_info_for_logging} took {self._dom.command_count} DevTools command(s).")
+        logging.info(f"Booking preparation complete for {self.court_info_for_logging}. Ready for timed submission.")
+        return True
+
+    def capture_http_submission(self):
+        """Capture the prepared form and cookies for an HTTP-level submit; keep browser submit on failure."""
+        try:
+            self.http_submitter = HttpSubmitter.capture(self.driver)
+            self.http_submitter.preconnect()
+            logging.debug(
+                f"Captured {len(self.http_submitter.fields)} form field(s) for HTTP submit of "
+                f"{self.court_info_for_logging} ({self.http_submitter.method} {self.http_submitter.action})"
+            )
+            return True
         except Exception as e:
-            # Log other exceptions during preparation as errors
-            logging.error(f"Failed to prepare booking for {self.court_info_for_logging}: {str(e)}")
-            try:
-                logging.debug(f"Current URL during preparation error: {self.driver.current_url}")
-                self.save_screenshot_on_error() # Save screenshot
-            except Exception: # Handle cases where driver might be dead
-                pass 
+            logging.warning(f"HTTP submit capture failed for {self.court_info_for_logging}: {e}. Falling back to browser submit.")
+            self.http_submitter = None
             return False
 
+    def warm_http_submission(self):
+        """Re-open the HTTP submit connection shortly before the target time (no-op in browser mode)."""
+        if self.http_submitter:
+            return self.http_submitter.preconnect()
+        return False
+
     def save_screenshot_on_error(self):
         """Saves a screenshot of the current browser window to a 'screenshots' directory."""
         if not self.driver:
@@ -506,24 +804,80 @@ class TennisBooker:
                 logging.warning(f"Keep-alive ping FAILED for {self.court_info_for_logging} with unexpected error: {e}")
             return False
 
-    def submit_prepared_booking(self):
-        """Finds and clicks the final submit button. No result checking."""
+    def preflight_check(self):
+        """Cheap pre-submit check: session alive and the submit button still on the page. Returns (ok, detail)."""
+        if self.http_submitter:
+            # The browser isn't used to submit; what matters is that the permit site still answers
+            if self.http_submitter.preconnect():
+                return True, "HTTP submit connection open"
+            return False, "HTTP submit connection failed"
         if not self.driver:
+            return False, "driver closed"
+        try:
+            # document.evaluate instead of find_elements so a missing button doesn't sit out the implicit wait
+            present = self.driver.execute_script(
+                "return !!document.evaluate(arguments[0], document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;",
+                SUBMIT_BUTTON_XPATH,
+            )
+        except WebDriverException as e:
+            return False, f"WebDriver error: {str(e).splitlines()[0]}"
+        if not present:
+            return False, "submit button no longer on the page"
+        return True, "submit button present"
+
+    def locate_submit_button(self):
+        """Find the final submit button ahead of time so the submit click skips the lookup."""
+        if self.http_submitter or not self.driver:
+            return False
+        try:
+            self.pre_submit_url = self.driver.current_url
+            self.submit_button = self.wait.until(EC.element_to_be_clickable((By.XPATH, SUBMIT_BUTTON_XPATH)))
+            return True
+        except Exception as e:
+            logging.warning(f"Could not pre-locate submit button for {self.court_info_for_logging}: {e}")
+            self.submit_button = None
+            return False
+
+    def submit_prepared_booking(self, on_click=None):
+        """Finds and clicks the final submit button. No result checking.
+
+        ``on_click`` is called right before the click (or HTTP post) is sent.
+        """
+        with self._span("submit_click"):
+            self._click_submit(on_click or (lambda: None))
+
+    def _click_submit(self, on_click):
+        if not self.driver and not self.http_submitter:
             logging.warning(f"Attempted to click submit for {self.court_info_for_logging}, but driver was already closed.")
             return # Cannot proceed
             
         # The higher-level submit phase already logs which account/court is submitting.
         # Downgrade this duplicate log to DEBUG to avoid clutter.
         logging.debug(f"Clicking final submit button for {self.court_info_for_logging}")
+        if self.http_submitter:
+            self._submit_via_http(on_click)
+            return
         try:
+            submit_button = self.submit_button
+            if submit_button is not None:
+                try:
+                    # Button was located during the waiting phase: click straight away
+                    on_click()
+                    self.driver.execute_script("arguments[0].click();", submit_button)
+                    logging.info(f"Submit button clicked via JS for {self.court_info_for_logging}. No result check performed.")
+                    return
+                except StaleElementReferenceException:
+                    logging.warning(f"Pre-located submit button went stale for {self.court_info_for_logging}; locating it again.")
+
             # Store initial URL for later verification (instant operation)
             self.pre_submit_url = self.driver.current_url
             
             # Find the button
             submit_button = self.wait.until(
-                EC.element_to_be_clickable((By.XPATH, "//button[@id='cancelNewPermitRequest']/preceding-sibling::button"))
+                EC.element_to_be_clickable((By.XPATH, SUBMIT_BUTTON_XPATH))
             )
             # Click using JavaScript
+            on_click()
             self.driver.execute_script("arguments[0].click();", submit_button)
             logging.info(f"Submit button clicked via JS for {self.court_info_for_logging}. No result check performed.")
             # NO time.sleep() here
@@ -537,13 +891,38 @@ class TennisBooker:
             logging.error(f"Error clicking submit for {self.court_info_for_logging}: {str(e)}")
             # Note: We don't return True/False as we aren't checking success
     
+    def _submit_via_http(self, on_click):
+        """Fire the captured permit POST directly, without touching the browser."""
+        # The form page URL stands in for the browser URL when verifying
+        self.pre_submit_url = self.http_submitter.page_url
+        try:
+            on_click()
+            response = self.http_submitter.submit()
+            logging.info(
+                f"Submit POST sent via HTTP for {self.court_info_for_logging}: status {response.status_code} "
+                f"in {self.http_submitter.elapsed_seconds*1000:.0f}ms. No result check performed."
+            )
+        except Exception as e:
+            logging.error(f"Error sending HTTP submit for {self.court_info_for_logging}: {str(e)}")
+
     def verify_submission(self):
         """Check if submission actually went through by comparing URLs. Called after all submissions."""
-        if not self.driver:
+        with self._span("verify_submission"):
+            return self._verify_submission()
+
+    def _verify_submission(self):
+        if not self.driver and not self.http_submitter:
             return None
             
         try:
-            current_url = self.driver.current_url
+            if self.http_submitter:
+                # Browser never left the form; the POST's final URL (after redirects) is what moved
+                current_url = self.http_submitter.final_url
+                if current_url is None:
+                    logging.warning(f"No HTTP submit response recorded for {self.court_info_for_logging}")
+                    return None
+            else:
+                current_url = self.driver.current_url
             pre_url = getattr(self, 'pre_submit_url', None)
             
             if pre_url is None:
@@ -563,8 +942,44 @@ class TennisBooker:
             logging.error(f"Error verifying submission for {self.court_info_for_logging}: {e}")
             return None
 
+    def abort(self):
+        """
+        Kill a hung instance from another thread: quit Chrome if chromedriver still answers,
+        then kill chromedriver itself so any WebDriver call blocked on it fails right away.
+        A browser context on a shared host is closed through DevTools first, since its hung
+        command holds the host lock that quit() needs.
+        """
+        driver = self.driver
+        if not driver:
+            return
+        self.aborted = True
+        if hasattr(driver, 'kill'):
+            if not driver.kill():
+                logging.warning(f"Could not close the hung browser context ({self.court_info_for_logging}).")
+
+        def _quit():
+            try:
+                driver.quit()
+            except Exception as e:
+                logging.debug(f"Quit during abort failed ({self.court_info_for_logging}): {e}")
+
+        quitter = threading.Thread(target=_quit, daemon=True)
+        quitter.start()
+        quitter.join(timeout=3)
+        process = getattr(getattr(driver, 'service', None), 'process', None)
+        if process and process.poll() is None:
+            process.kill()
+        logging.debug(f"Aborted browser ({self.court_info_for_logging}).")
+
     def close(self):
         """Close the browser."""
+        if self.http_submitter:
+            self.http_submitter.close()
+        if self._dom:
+            self._dom.close()
+            self._dom = None
+        if self.driver and self.aborted:
+            self.driver = None  # already torn down by abort()
         if self.driver:
             logging.debug(f"Closing browser window ({self.court_info_for_logging}).")
             try:
@@ -573,6 +988,17 @@ class TennisBooker:
                  logging.error(f"Error quitting driver ({self.court_info_for_logging}): {e}")
             self.driver = None # Prevent reuse
 
+def _log_at(when, level, message):
+    """Log ``message`` with the datetime ``when`` as its record time (for lines logged after the event)."""
+    logger = logging.getLogger()
+    if not logger.isEnabledFor(level):
+        return
+    fn, lno, func, sinfo = logger.findCaller(stacklevel=2)
+    record = logger.makeRecord(logger.name, level, fn, lno, message, None, None, func, None, sinfo)
+    record.created = when.timestamp()
+    record.msecs = (record.created - int(record.created)) * 1000
+    logger.handle(record)
+
 def check_internet_connection(host="8.8.8.8", port=53, timeout=3, retries=5, delay=15):
     """
     Checks for a live internet connection by attempting to connect to Google's DNS.
@@ -592,27 +1018,6 @@ def check_internet_connection(host="8.8.8.8", port=53, timeout=3, retries=5, del
                 logging.error(f"Internet connection failed after {retries} attempts. Cannot proceed.")
                 return False
 
-def keep_alive_pinger(instances_list, stop_event):
-    """
-    A background thread function that periodically pings all browser instances
-    to keep them from timing out.
-    """
-    while not stop_event.is_set():
-        # Wait for 20 seconds, but check the stop event every second
-        for _ in range(20):
-            if stop_event.is_set():
-                break
-            time.sleep(1)
-        
-        if not stop_event.is_set():
-            logging.info(f"HEARTBEAT: Pinging {len(instances_list)} prepared instance(s)...")
-            alive_count = 0
-            # Iterate over a copy of the list in case it's modified by the main thread
-            for inst in list(instances_list):
-                if inst.keep_alive():
-                    alive_count += 1
-            logging.info(f"HEARTBEAT: {alive_count}/{len(instances_list)} instances responded.")
-
 def main():
     """Main function to prepare and automatically submit tennis court bookings at 8 AM."""
     # --- Configuration --- 
@@ -622,19 +1027,32 @@ def main():
     # Each day can have its own second and millisecond values for precise timing
     # Format: {"second": int, "millisecond": int} where millisecond is 0-999
     SUBMIT_TIMING_BY_DAY = {
-        0: {"second": 1, "millisecond": 250},  # Monday: 8:00:02.150
-        1: {"second": 1, "millisecond": 750},  # Tuesday: 8:00:02.250
-        2: {"second": 2, "millisecond": 750},  # Wednesday: 8:00:03.100
-        3: {"second": 3, "millisecond": 200},   # Thursday: 8:00:04.050
-        4: {"second": 3, "millisecond": 500},  # Friday: 8:00:04.200
+        0: {"second": 1, "millisecond": 250},  # Monday: 8:00:01.250
+        1: {"second": 1, "millisecond": 750},  # Tuesday: 8:00:01.750
+        2: {"second": 2, "millisecond": 750},  # Wednesday: 8:00:02.750
+        3: {"second": 3, "millisecond": 200},   # Thursday: 8:00:03.200
+        4: {"second": 3, "millisecond": 500},  # Friday: 8:00:03.500
         # 5 and 6 (Saturday/Sunday) are not normally used but are provided for completeness.
         5: {"second": 3, "millisecond": 0},
         6: {"second": 3, "millisecond": 0},
     }
 
+    # Prefer the per-weekday timing calibrated from past booking summaries
+    # (timing_calibration.py -> submit_timing_override.json) over the table above.
+    USE_TIMING_CALIBRATION = True
+
     # The script will look up today's weekday; if it is missing from the map we default to 3s 0ms.
     default_timing = {"second": 3, "millisecond": 0}
     timing = SUBMIT_TIMING_BY_DAY.get(datetime.now().weekday(), default_timing)
+    calibrated_timing = load_timing_override(datetime.now().weekday()) if USE_TIMING_CALIBRATION else None
+    if calibrated_timing:
+        logging.info(
+            f"Using calibrated submit timing 8:00:{calibrated_timing['second']:02d}.{calibrated_timing['millisecond']:03d} "
+            f"(table: 8:00:{timing['second']:02d}.{timing['millisecond']:03d}, "
+            f"expected hit rate {calibrated_timing.get('expected_hit_rate') or 0:.0%}, "
+            f"{calibrated_timing.get('observations', '?')} past submissions)"
+        )
+        timing = calibrated_timing
     SUBMIT_SECOND = timing["second"]
     SUBMIT_MILLISECOND = timing["millisecond"]
     # Convert milliseconds to microseconds for datetime
@@ -645,25 +1063,112 @@ def main():
     # e.g., 0.1 means: 1st booking at +0ms, 2nd at +100ms, 3rd at +200ms, etc.
     SUBMIT_DELAY_INCREMENT_SECONDS = 0.05
 
-    # Max time (in seconds) we allow a single prepare_booking() call to run before
-    # we consider it hung and discard the attempt.
+    # Plan each instance's offset against the acceptance window learned by timing_calibration.py
+    # (most valuable slots at the most likely instants, SUBMIT_DELAY_INCREMENT_SECONDS apart).
+    # Without a learned window this is the fixed idx * SUBMIT_DELAY_INCREMENT_SECONDS stagger.
+    USE_SUBMIT_PLANNER = True
+
+    # Prepared instances are pinged concurrently this often; one that misses two heartbeats
+    # in a row is marked dead and its priority re-prepared with an unused account.
+    HEARTBEAT_INTERVAL_SECONDS = 20
+    HEARTBEAT_TIMEOUT_SECONDS = 10
+    # Heartbeats continue through the waiting phase but stop this many seconds before the
+    # target so they never compete with submission; a final pre-flight sweep runs then.
+    KEEPALIVE_BLACKOUT_SECONDS = 10
+    # Skip the pre-flight sweep if less than this is left before the target
+    PREFLIGHT_MIN_SECONDS = 3
+
+    # Once every priority has been prepared, leftover accounts prepare hot-standby spares for
+    # the top STANDBY_SPARE_PRIORITIES priorities of each date. Spares are kept alive by the
+    # heartbeat and promoted into the submit schedule when their primary dies or fails the
+    # pre-flight sweep; unused spares are closed before submission. 0 disables standby.
+    STANDBY_SPARE_PRIORITIES = 2
+
+    # Max time (in seconds) we allow a single preparation attempt to run before the
+    # watchdog considers it hung, kills its browser and retries with the next account.
     MAX_PREP_TIME_PER_INSTANCE_SECONDS = 90
+    # A failed prepare_booking step is retried this many times from the last good checkpoint
+    # (logged in, form started, court selected, date/time set, questions opened) in the same
+    # session before the account is given up. Retries stop at the attempt's watchdog deadline.
+    PREP_STEP_RETRIES = 2
+    # Every attempt must finish this many seconds before the keep-alive blackout (leaving
+    # time for the clock sync). A new attempt is only started if the duration predicted from
+    # prep_step_timings.jsonl fits; a running one is killed by the watchdog at this point.
+    PREP_FINISH_MARGIN_SECONDS = 5
+
+    # Number of preparation workers running in parallel. Each worker pulls the next
+    # (date, priority) job, takes the next unused account for that date and runs
+    # launch + login + prepare_booking. 1 reproduces the old one-at-a-time behaviour.
+    PREP_WORKER_COUNT = 4
+
+    # Pre-launch Chrome sessions in parallel at script start so each booker checks out an
+    # already-running driver instead of paying a cold launch inside the preparation loop.
+    USE_BROWSER_POOL = True
+    BROWSER_POOL_SIZE = PREP_WORKER_COUNT + 2  # idle sessions kept warm while preparing
+
+    # "process": one Chrome per account (default).
+    # "contexts": CONTEXT_HOST_COUNT Chrome processes, each account in its own isolated browser
+    # context (separate cookie jar) on one of them. Commands on one host are serialized, so
+    # browser-mode submit clicks on the same host go out one after another.
+    BROWSER_LAYOUT = "process"
+    CONTEXT_HOST_COUNT = PREP_WORKER_COUNT
+
+    # Request blocking profile for the booking pages (see resource_blocking.py): "forms" blocks
+    # images, web fonts, media and third-party analytics/font hosts; "off" loads everything.
+    BLOCKING_PROFILE = "forms"
+
+    # Opt-in fast navigation. "eager" returns from a navigation at DOMContentLoaded, "none" right
+    # away; both run with zero implicit wait, and each step polls for exactly the elements it needs
+    # (READINESS_PROBES) instead. "normal" keeps full-load navigations and the 3s implicit wait.
+    # Spans in prep_step_timings.jsonl carry the strategy (python step_timing.py --compare-strategies).
+    PAGE_LOAD_STRATEGY = "normal"
+
+    # Transport for the form steps' DOM actions (select, type, click, waits; see cdp_channel.py).
+    # "webdriver": one WebDriver HTTP call per action and 500ms-polling waits (default).
+    # "cdp": one persistent DevTools websocket per instance, one command per action and waits
+    # that resolve on the DOM change. Needs websocket-client; falls back to "webdriver" without it.
+    # Compare both: python cdp_channel.py --benchmark
+    DOM_BACKEND = "webdriver"
+
+    # Record every WebDriver command and explicit wait per instance and step (command_trace.py);
+    # the run ends with a per-instance/per-step report and the 10 slowest commands.
+    COMMAND_TRACE = True
+
+    # "selenium": one Chrome per account (default).
+    # "http": browserless HttpTennisBooker with a pooled requests session per account.
+    BOOKER_BACKEND = "selenium"
+
+    # Reuse encrypted, on-disk login sessions per account so retries and next-day runs
+    # skip the login form while the cached session is still valid.
+    USE_SESSION_CACHE = True
+
+    # Fill the permit questions page with a single injected script (falls back to the
+    # field-by-field path if any field can't be filled)
+    BATCH_FORM_FILL = True
+
+    # Replace the fixed sleeps in the prep path with waits on page-idle conditions, falling
+    # back to settle times learned from previous runs (settle_timings.json)
+    ADAPTIVE_WAITS = True
+
+    # "browser": WebDriver wait + JS click on the submit button (default).
+    # "http": capture the prepared form + cookies after prepare_booking and fire the permit
+    # POST straight from a pre-connected HTTP session at the target time.
+    SUBMIT_MODE = "browser"
+    # How long before the target time HTTP submit connections are re-warmed
+    HTTP_SUBMIT_WARMUP_SECONDS = 5
+
+    # Shift the submit schedule by the permit site's clock offset, estimated from its HTTP
+    # Date headers at the start of the waiting phase (see clock_sync.py)
+    CLOCK_SYNC = True
+    CLOCK_SYNC_SAMPLES = 8
+    # Estimates beyond these limits are logged but not applied
+    CLOCK_SYNC_MAX_OFFSET_SECONDS = 5.0
+    CLOCK_SYNC_MAX_UNCERTAINTY_SECONDS = 0.1
 
     # --- Initialization --- 
-    prepared_instances = [] # List to hold booker instances ready for submission
+    registry = InstanceRegistry() # Every booker instance and its lifecycle state
     accounts = list(USERS.keys())
-    random.shuffle(accounts)
-    account_index = 0
     
-    # --- Heartbeat Thread Setup ---
-    stop_pinger_event = threading.Event()
-    pinger_thread = threading.Thread(
-        target=keep_alive_pinger,
-        args=(prepared_instances, stop_pinger_event),
-        daemon=True  # Allow main program to exit without waiting
-    )
-    pinger_thread.start()
-
     # --- Determine Target Booking Dates & Actual Submission Time --- 
     now = datetime.now()
     today_weekday = now.weekday()
@@ -682,6 +1187,7 @@ def main():
     # i.e. 30 s before the top of the hour plus today's SUBMIT_SECOND value.
     PREPARATION_CUTOFF_SECONDS_DYNAMIC = 30 + SUBMIT_SECOND  # e.g. 33 s (Mon-Wed) or 37 s (Thu/Fri)
     preparation_hard_stop_time = target_submit_time - timedelta(seconds=PREPARATION_CUTOFF_SECONDS_DYNAMIC)
+    prep_finish_deadline = target_submit_time - timedelta(seconds=KEEPALIVE_BLACKOUT_SECONDS + PREP_FINISH_MARGIN_SECONDS)
 
     days_ahead_to_book = BOOKING_RULES.get(today_weekday, [])
 
@@ -700,176 +1206,503 @@ def main():
     # Log the originally configured submission time for today for clarity, even if actual is tomorrow
     logging.info(f"Original configured target submission time for today's rules: {SUBMIT_HOUR:02d}:{SUBMIT_MINUTE:02d}:{SUBMIT_SECOND:02d}.{SUBMIT_MILLISECOND:03d}")
 
+    # Resolve chromedriver once up front (normally an index hit) so no worker pays for it
+    if BOOKER_BACKEND == "selenium":
+        try:
+            resolve_driver_path("exact")
+        except Exception as e:
+            logging.error(f"Could not resolve chromedriver ahead of preparation: {e}")
+
+    session_cache = None
+    if USE_SESSION_CACHE:
+        try:
+            session_cache = SessionCache()
+        except Exception as e:
+            logging.warning(f"Login session cache unavailable, logging in normally: {e}")
+
+    settle_store = SettleTimingStore() if ADAPTIVE_WAITS else None
+    tracer = StepTracer()
+    command_recorder = CommandRecorder() if COMMAND_TRACE else None
+    logging.info(f"Recording per-step timings for run {tracer.run_id} (report: python step_timing.py --run {tracer.run_id})")
+    admission = AttemptDurationModel(tracer)
+    logging.info(f"Preparation admission: {admission.describe()}; attempts must finish by {prep_finish_deadline.strftime('%H:%M:%S')}.")
+
+    # --- Browser Pool ---
+    blocking_profile = get_blocking_profile(BLOCKING_PROFILE)
+    if blocking_profile and BOOKER_BACKEND == "selenium":
+        logging.info(f"Request blocking profile: {blocking_profile}")
+    launch_driver = functools.partial(launch_chrome_driver, blocking_profile, PAGE_LOAD_STRATEGY)
+    browser_pool = None
+    context_pool = None
+    if BROWSER_LAYOUT == "contexts" and BOOKER_BACKEND == "selenium":
+        context_pool = ContextBrowserPool(
+            launch_driver,
+            hosts=CONTEXT_HOST_COUNT,
+            context_setup=blocking_profile.apply if blocking_profile else None,
+        )
+        context_pool.start()
+        browser_pool = context_pool
+    elif USE_BROWSER_POOL and BOOKER_BACKEND == "selenium":
+        # Never launch more sessions than there are (account, date) attempts to use them
+        browser_pool = BrowserPool(
+            launch_driver,
+            size=BROWSER_POOL_SIZE,
+            max_launches=len(accounts) * len(days_ahead_to_book),
+        )
+        browser_pool.start()
+
     # --- Preparation Phase --- 
-    logging.info("--- Starting Preparation Phase ---")
-    
-    preparation_halted = False
-    for days_ahead in days_ahead_to_book:        
-        # Reset account pointer and reshuffle accounts so that each user can be used once *per booking date*
-        account_index = 0
-        random.shuffle(accounts)  # fresh random ordering for this date
+    logging.info(f"--- Starting Preparation Phase ({PREP_WORKER_COUNT} parallel worker(s)) ---")
+
+    # Every (date, priority) pair becomes a job. Jobs are ordered by date, then priority,
+    # so a failed priority that is put back on the queue is retried before lower ones.
+    # The last field marks standby-spare jobs, which sort after the primary for the same slot.
+    prep_jobs = queue.PriorityQueue()
+    prep_lock = threading.Lock()
+    preparation_halted = threading.Event()
+    accounts_by_date = {}
+    next_account_by_date = {}
+    booking_dates = {}
+    prep_active = True  # cleared (under prep_lock) once the job queue has drained
+    replacement_workers = []  # one-off replacement attempts started after that (see _replace_dead_instance)
+
+    for date_idx, days_ahead in enumerate(days_ahead_to_book):
+        # Each user can be used once *per booking date*, in a fresh random order per date
+        date_accounts = list(accounts)
+        random.shuffle(date_accounts)
+        accounts_by_date[date_idx] = date_accounts
+        next_account_by_date[date_idx] = 0
         booking_date_obj = datetime.now().date() + timedelta(days=days_ahead)
-        logging.info(f"== Preparing bookings for {booking_date_obj.strftime('%A, %m/%d/%Y')} ({days_ahead} days ahead) ==")
+        booking_dates[date_idx] = booking_date_obj
+        logging.info(f"== Queueing bookings for {booking_date_obj.strftime('%A, %m/%d/%Y')} ({days_ahead} days ahead) ==")
+        for priority_index in range(len(COURT_PRIORITIES)):
+            prep_jobs.put((date_idx, priority_index, booking_date_obj, False))
+
+    def _next_account(date_idx):
+        """Consume and return the next unused account for a booking date, or None if exhausted."""
+        with prep_lock:
+            account_index = next_account_by_date[date_idx]
+            if account_index >= len(accounts_by_date[date_idx]):
+                return None
+            next_account_by_date[date_idx] = account_index + 1
+            return accounts_by_date[date_idx][account_index]
+
+    def _prep_attempt(username, date_idx, priority_index, booking_date_obj, spare=False):
+        """Launch, log in and prepare one instance (a standby spare if ``spare``). Returns the prepared booker or None."""
+        priority = COURT_PRIORITIES[priority_index]
+        prep_attempt_start_time = datetime.now() # Start timer for this instance
+        # Ensure the variable exists even if setup_driver or login fails before assignment
+        preparation_success = False
+        user_data = USERS[username]
+        court_number = priority["court"]
+        preferred_time = priority["time"]
+        role = "a standby spare for " if spare else ""
+        logging.info(f"Priority #{priority_index+1}: Assigning {username} to prepare {role}Court {court_number} at {preferred_time} for {booking_date_obj.strftime('%m/%d/%Y')}")
+        record = registry.register(username, (date_idx, priority_index), spare=spare)
 
-        # Use a while loop to aggressively retry priorities instead of skipping them on failure
-        priority_index = 0
-        while priority_index < len(COURT_PRIORITIES):
-            # Check for deadline before every single attempt
-            if datetime.now() >= preparation_hard_stop_time:
-                logging.warning(f"Approaching submission deadline ({PREPARATION_CUTOFF_SECONDS_DYNAMIC}s buffer). Halting further preparations.")
-                preparation_halted = True
-                break # Break from the while loop over priorities
-            
-            # Check for available accounts before every attempt
-            if account_index >= len(accounts):
-                logging.warning(f"No more accounts available. Stopping preparation for {booking_date_obj.strftime('%m/%d/%Y')}.")
-                break # Stop processing priorities for this date if out of accounts
-
-            priority = COURT_PRIORITIES[priority_index]
-            prep_attempt_start_time = datetime.now() # Start timer for this instance
-            # Ensure the variable exists even if setup_driver or login fails before assignment
+        try:
+            if BOOKER_BACKEND == "http":
+                booker = HttpTennisBooker(session_cache=session_cache)
+            else:
+                # Fall back to a cold launch if the pool has nothing to hand out
+                pooled_driver = browser_pool.checkout() if browser_pool else None
+                booker = TennisBooker(
+                    driver=pooled_driver,
+                    submit_mode=SUBMIT_MODE,
+                    session_cache=session_cache,
+                    batch_form_fill=BATCH_FORM_FILL,
+                    settle_store=settle_store,
+                    tracer=tracer,
+                    blocking_profile=blocking_profile,
+                    page_load_strategy=PAGE_LOAD_STRATEGY,
+                    dom_backend=DOM_BACKEND,
+                    command_recorder=command_recorder,
+                )
+        except Exception as e:
+            # Same as any failed attempt: the caller re-queues the priority for the next account
+            logging.error(f"Could not start a browser for {username} (Court {court_number} at {preferred_time}): {e}. Retrying same priority with next account.")
+            registry.transition(record, CLOSED, reason="launch failed")
+            return None
+        record.booker = booker
+        # The watchdog kills the browser if the attempt is still running at its deadline
+        attempt_deadline = min(
+            prep_attempt_start_time + timedelta(seconds=MAX_PREP_TIME_PER_INSTANCE_SECONDS),
+            prep_finish_deadline,
+        )
+        watch = watchdog.watch(booker, attempt_deadline.timestamp(), f"{username} - Court {court_number} at {preferred_time}")
+        try:
+            # On two-date days the account may already hold a live form for the other date; its
+            # cached cookies are that instance's session, so log in afresh instead of sharing it
+            account_live = any(
+                r.account == username and r is not record and r.state != DEAD for r in registry.open_records()
+            )
+            if booker.driver and booker.login(user_data['email'], user_data['password'], account=username, reuse_session=not account_live):
+                registry.transition(record, LOGGED_IN)
+                logging.debug(f"Attempting to prepare instance for {username} - {court_number} at {preferred_time} on {booking_date_obj.strftime('%m/%d/%Y')}")
+                registry.transition(record, PREPARING)
+                preparation_success = booker.prepare_booking(
+                    court_number,
+                    booking_date_obj, 
+                    preferred_time,
+                    retries=PREP_STEP_RETRIES,
+                    deadline=attempt_deadline.timestamp(),
+                )
+
+                if not preparation_success:
+                    # FAILURE: the caller puts the priority back on the queue for the next account.
+                    logging.warning(f"Closing browser for {username} due to FAILED PREPARATION for {booker.court_info_for_logging} (prepare_booking returned False). Retrying same priority with next account.")
+                    booker.close()
+            else:
+                # Handle setup_driver failure or login failure
+                logging.warning(f"Skipping preparation for {username} due to setup/login failure. Closing browser and using next account for same priority.")
+                booker.close()
+
+        except Exception as e:
+            # Catch unexpected errors during the whole prep attempt for one user
+            logging.error(f"UNEXPECTED EXCEPTION during preparation attempt for {username} - {booker.court_info_for_logging if booker else 'N/A'}: {str(e)}. Closing browser.")
             preparation_success = False
-            # Get the next account
-            username = accounts[account_index]
-            user_data = USERS[username]
-            court_number = priority["court"]
-            preferred_time = priority["time"]
-            logging.info(f"Priority #{priority_index+1}: Assigning {username} to prepare Court {court_number} at {preferred_time} for {booking_date_obj.strftime('%m/%d/%Y')}")
-
-            booker = TennisBooker()
             try:
-                if booker.driver and booker.login(user_data['email'], user_data['password']):
-                    logging.debug(f"Attempting to prepare instance for {username} - {court_number} at {preferred_time} on {booking_date_obj.strftime('%m/%d/%Y')}")
-                    preparation_success = booker.prepare_booking(
-                        court_number,
-                        booking_date_obj, 
-                        preferred_time
-                    )
+                booker.close()
+            except Exception as close_err:
+                logging.error(f"Error closing browser after unexpected error for {username}: {close_err}")
+
+        # Check duration for this specific attempt
+        killed = watchdog.done(watch)
+        prep_attempt_duration_seconds = (datetime.now() - prep_attempt_start_time).total_seconds()
+        logging.debug(f"Preparation attempt for {username} - {court_number} at {preferred_time} took {prep_attempt_duration_seconds:.1f}s.")
+        if killed:
+            # Even if prepare_booking got to return True, its browser is gone
+            if preparation_success:
+                booker.close()
+            preparation_success = False
+            logging.warning(
+                f"PREPARATION TIMEOUT: {username}'s attempt for Court {court_number} at {preferred_time} was aborted by the watchdog after "
+                f"{prep_attempt_duration_seconds:.1f}s (deadline {attempt_deadline.strftime('%H:%M:%S')}). "
+                f"Discarding this instance and retrying the same priority with next account."
+            )
 
-                    if preparation_success:
-                        prepared_instances.append(booker) # Keep instance open
-                        account_index += 1 # Consume this account
-                        priority_index += 1 # SUCCESS: Move to the next priority
-
-                        # If this is the first successful prep, start the heartbeat thread
-                        if pinger_thread is None:
-                            logging.info("First instance prepared. Starting background keep-alive heartbeat thread.")
-                            pinger_thread = threading.Thread(
-                                target=keep_alive_pinger,
-                                args=(prepared_instances, stop_pinger_event),
-                                daemon=True  # Allow main program to exit without waiting
-                            )
-                            pinger_thread.start()
-                            
-                    else:
-                        # FAILURE: Don't advance priority_index, just consume the account and retry this priority.
-                        logging.warning(f"Closing browser for {username} due to FAILED PREPARATION for {booker.court_info_for_logging} (prepare_booking returned False). Retrying same priority with next account.")
-                        booker.close()
-                        account_index += 1 # Consume this account and try again
-                else:
-                    # Handle setup_driver failure or login failure
-                    logging.warning(f"Skipping preparation for {username} due to setup/login failure. Closing browser and using next account for same priority.")
-                    booker.close()
-                    account_index += 1 # Consume this account
+        if preparation_success:
+            registry.transition(record, PREPARED)
+            return booker
+        registry.transition(record, CLOSED, reason="preparation failed")
+        return None
+
+    def _run_prep_job(date_idx, priority_index, booking_date_obj, spare):
+        """Run one job. Returns True if the attempt failed and the same priority should be retried with the next account."""
+        # Check for deadline before every single attempt
+        if datetime.now() >= preparation_hard_stop_time:
+            if not preparation_halted.is_set():
+                logging.warning(f"Approaching submission deadline ({PREPARATION_CUTOFF_SECONDS_DYNAMIC}s buffer). Halting further preparations.")
+                preparation_halted.set()
+            return
 
+        # Only start an attempt that is predicted to finish in time
+        admitted, predicted = admission.admits(datetime.now(), prep_finish_deadline)
+        if not admitted:
+            if not preparation_halted.is_set():
+                logging.warning(
+                    f"An attempt is predicted to take {predicted:.0f}s and would not finish before "
+                    f"{prep_finish_deadline.strftime('%H:%M:%S')}. Halting further preparations."
+                )
+                preparation_halted.set()
+            return
+
+        # Check for available accounts before every attempt
+        username = _next_account(date_idx)
+        if username is None:
+            what = "the standby spare for " if spare else ""
+            logging.warning(f"No more accounts available. Dropping {what}Priority #{priority_index+1} for {booking_date_obj.strftime('%m/%d/%Y')}.")
+            return
+
+        booker = _prep_attempt(username, date_idx, priority_index, booking_date_obj, spare)
+        return not booker
+
+    def _prep_worker():
+        """Pull jobs until the queue is drained; the deadline check turns remaining jobs into no-ops."""
+        while True:
+            job = prep_jobs.get()
+            if job[2] is None:
+                prep_jobs.task_done()
+                return
+            try:
+                if _run_prep_job(*job):
+                    prep_jobs.put(job)
             except Exception as e:
-                # Catch unexpected errors during the whole prep attempt for one user
-                logging.error(f"UNEXPECTED EXCEPTION during preparation attempt for {username} - {booker.court_info_for_logging if booker else 'N/A'}: {str(e)}. Closing browser.")
-                try:
-                    booker.close()
-                except Exception as close_err:
-                    logging.error(f"Error closing browser after unexpected error for {username}: {close_err}")
-                account_index += 1 # Consume account so we don't retry with a failed user
-            
-            # Check duration for this specific attempt
-            prep_attempt_duration_seconds = (datetime.now() - prep_attempt_start_time).total_seconds()
-            logging.debug(f"Preparation attempt for {username} - {court_number} at {preferred_time} took {prep_attempt_duration_seconds:.1f}s.")
-            # Abort and retry if any single preparation attempt (success or failure) exceeds the time budget.
-            if prep_attempt_duration_seconds > MAX_PREP_TIME_PER_INSTANCE_SECONDS and not preparation_success:
+                logging.error(f"Preparation worker error for job {job}: {e}")
+            finally:
+                prep_jobs.task_done()
+
+    def _replacement_worker(job):
+        """Prepare one replacement after the job queue has drained, retrying with the next account until it succeeds or the deadline passes."""
+        try:
+            while _run_prep_job(*job):
+                pass
+        except Exception as e:
+            logging.error(f"Replacement preparation error for job {job}: {e}")
+
+    def _promote_spare(slot):
+        """Promote a prepared standby spare into ``slot``. Returns its record, or None if there is none."""
+        for spare_record in registry.spares(slot):
+            if registry.promote(spare_record):
+                date_idx, priority_index = slot
                 logging.warning(
-                    f"PREPARATION TIMEOUT: {username}'s attempt for Court {court_number} at {preferred_time} took "
-                    f"{prep_attempt_duration_seconds:.1f}s (limit {MAX_PREP_TIME_PER_INSTANCE_SECONDS}s). "
-                    f"Discarding this instance and retrying the same priority with next account."
+                    f"Promoted standby spare {spare_record.account} ({spare_record.booker.court_info_for_logging}) "
+                    f"into Priority #{priority_index+1} for {booking_dates[date_idx].strftime('%m/%d/%Y')}."
                 )
+                return spare_record
+        return None
+
+    def _replace_dead_instance(record):
+        """Heartbeat callback: promote a spare into a dead primary's slot, or re-prepare the priority with the next unused account."""
+        date_idx, priority_index = record.slot
+        booking_date_obj = booking_dates[date_idx]
+        # A dead primary's slot goes to its spare first; the spare is then the one replaced
+        spare = record.spare or _promote_spare(record.slot) is not None
+        job = (date_idx, priority_index, booking_date_obj, spare)
+        with prep_lock:
+            requeue = datetime.now() < preparation_hard_stop_time
+            if requeue and prep_active:
+                prep_jobs.put(job)
+            elif requeue:
+                # The queue's workers are gone once it has drained; prepare the replacement on its own thread
+                t = threading.Thread(target=_replacement_worker, args=(job,), name=f"prep-replacement-{len(replacement_workers)+1}", daemon=True)
+                replacement_workers.append(t)
+                t.start()
+        what = f"{'the standby spare for ' if spare else ''}Priority #{priority_index+1} for {booking_date_obj.strftime('%m/%d/%Y')}"
+        if requeue:
+            logging.warning(f"Re-preparing {what} after {record.account}'s instance died.")
+        elif spare and not record.spare:
+            logging.warning(f"No standby left for Priority #{priority_index+1} for {booking_date_obj.strftime('%m/%d/%Y')} after {record.account}'s instance died.")
+        else:
+            logging.warning(f"{what[0].upper() + what[1:]} lost: {record.account}'s instance died after preparation closed.")
 
-                # If the page did eventually prepare but took too long, close and remove the instance so it doesn't submit late.
-                try:
-                    booker.close()
-                except Exception as close_err:
-                    logging.error(f"Error closing slow browser instance for {username}: {close_err}")
+    # --- Heartbeat Thread Setup ---
+    heartbeat = HeartbeatMonitor(
+        registry,
+        interval=HEARTBEAT_INTERVAL_SECONDS,
+        timeout=HEARTBEAT_TIMEOUT_SECONDS,
+        on_dead=_replace_dead_instance,
+    )
+    stop_pinger_event = threading.Event()
+    blackout_start_time = target_submit_time - timedelta(seconds=KEEPALIVE_BLACKOUT_SECONDS)
+    pinger_thread = threading.Thread(
+        target=heartbeat.run,
+        args=(stop_pinger_event, blackout_start_time.timestamp()),
+        name="heartbeat",
+        daemon=True  # Allow main program to exit without waiting
+    )
+    pinger_thread.start()
 
-                # If the (slow) instance had been added to the prepared list, remove it.
-                if booker in prepared_instances:
-                    prepared_instances.remove(booker)
+    watchdog = PrepWatchdog().start()
+    prep_workers = []
+    for worker_idx in range(max(1, PREP_WORKER_COUNT)):
+        t = threading.Thread(target=_prep_worker, name=f"prep-worker-{worker_idx+1}", daemon=True)
+        prep_workers.append(t)
+        t.start()
 
-                # Consume the account and retry the same priority with the next user.
-                account_index += 1
-                # Ensure we *do not* advance priority_index so that we retry this court/time.
-                continue
+    prep_jobs.join()
 
-        logging.info(f"== Finished preparation attempts for {booking_date_obj.strftime('%m/%d/%Y')} ==")
+    # Leftover accounts become hot-standby spares for the top priorities that were prepared
+    if STANDBY_SPARE_PRIORITIES > 0 and not preparation_halted.is_set():
+        standby_slots = sorted(
+            slot for slot in {r.slot for r in registry.primaries(PREPARED)}
+            if slot[1] < STANDBY_SPARE_PRIORITIES and next_account_by_date[slot[0]] < len(accounts_by_date[slot[0]])
+        )
+        if standby_slots:
+            logging.info(f"--- Preparing {len(standby_slots)} standby spare(s) with leftover accounts ---")
+            for date_idx, priority_index in standby_slots:
+                prep_jobs.put((date_idx, priority_index, booking_dates[date_idx], True))
+            prep_jobs.join()
+
+    with prep_lock:
+        prep_active = False
+    # Sentinels sort after every real job, so they are only picked up once the queue is empty
+    for _ in prep_workers:
+        prep_jobs.put((len(days_ahead_to_book), 0, None, False))
+    prep_jobs.join()
+
+    if browser_pool:
+        browser_pool.log_stats()
+        browser_pool.shutdown()
+
+    if settle_store:
+        try:
+            settle_store.save()
+        except Exception as e:
+            logging.warning(f"Could not save settle timings: {e}")
 
-        if preparation_halted:
-            logging.info("Preparation was halted due to approaching deadline. Moving to waiting/submission phase.")
-            break # Break from days_ahead loop
+    if preparation_halted.is_set():
+        logging.info("Preparation was halted due to approaching deadline. Moving to waiting/submission phase.")
 
-    # --- End Preparation Phase ---
-    # Stop the keep-alive pinger thread as we are moving to the final wait/submission
-    if pinger_thread:
-        logging.info("Preparation phase complete. Stopping heartbeat thread.")
-        stop_pinger_event.set()
-        pinger_thread.join(timeout=5) # Wait for the thread to finish, with a timeout
+    def _close_remaining(reason):
+        """Close every instance still open (e.g. standby spares) and the context hosts before an early exit."""
+        for record in registry.open_records():
+            if record.booker:
+                try:
+                    record.booker.close()
+                except Exception as e:
+                    logging.debug(f"Error closing instance {record.id}: {e}")
+            registry.transition(record, CLOSED, reason=reason)
+        if context_pool:
+            context_pool.quit_hosts()
+        if command_recorder:
+            log_command_report(command_recorder)
 
-    if not prepared_instances:
+    # --- End Preparation Phase ---
+    # The heartbeat keeps prepared instances alive through the wait, up to the blackout
+    if not registry.primaries(PREPARED):
         logging.info("No bookings were successfully prepared. Exiting.")
+        stop_pinger_event.set()
+        heartbeat.shutdown()
+        watchdog.stop()
+        _close_remaining("nothing to submit")
         return
 
-    logging.info(f"--- Preparation Complete: {len(prepared_instances)} instances ready for submission ---")
+    logging.info(
+        f"--- Preparation Complete: {len(registry.primaries(PREPARED))} instances ready for submission, "
+        f"{len(registry.spares())} on standby ---"
+    )
+    logging.info(registry.summary())
+    if BOOKER_BACKEND == "selenium":
+        log_instance_resources(registry.in_state(PREPARED))
 
     # --- Waiting Phase --- 
-    # Replace simple sleep with an active wait loop that pings browsers
-    wait_seconds = (target_submit_time - datetime.now()).total_seconds()
-    if wait_seconds > 0:
-        logging.info(f"Entering final waiting phase. Target: {target_submit_time.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]} ({wait_seconds:.2f}s from now).")
-        # The heartbeat thread handled keep-alives during prep.
-        # This final sleep is passive since it should be short.
-        time.sleep(wait_seconds)
+    if CLOCK_SYNC:
+        # Sample outside the keep-alive blackout, leaving time for the HTTP re-warm and the submit workers
+        sync_deadline = target_submit_time - timedelta(seconds=max(KEEPALIVE_BLACKOUT_SECONDS, HTTP_SUBMIT_WARMUP_SECONDS + 3))
+        if datetime.now() < sync_deadline:
+            try:
+                clock_offset = estimate_server_offset(PERMIT_SITE_URL, samples=CLOCK_SYNC_SAMPLES, deadline=sync_deadline.timestamp())
+            except Exception as e:
+                clock_offset = None
+                logging.warning(f"Clock sync against {PERMIT_SITE_URL} failed: {e}")
+            if clock_offset is None:
+                logging.warning("Clock sync produced no estimate; keeping the local-clock schedule.")
+            elif abs(clock_offset.offset) > CLOCK_SYNC_MAX_OFFSET_SECONDS or clock_offset.uncertainty > CLOCK_SYNC_MAX_UNCERTAINTY_SECONDS:
+                logging.warning(f"Clock sync: {clock_offset} is outside the accepted limits; not applied.")
+            else:
+                # Server ahead of us (positive offset) means its target instant comes earlier on our clock
+                target_submit_time -= timedelta(seconds=clock_offset.offset)
+                # The blackout moves with the target; the running heartbeat picks up the new time
+                blackout_start_time = target_submit_time - timedelta(seconds=KEEPALIVE_BLACKOUT_SECONDS)
+                heartbeat.set_until(blackout_start_time.timestamp())
+                logging.info(
+                    f"Clock sync: {clock_offset}. Target shifted to "
+                    f"{target_submit_time.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]} local time."
+                )
+        else:
+            logging.info("Clock sync skipped: not enough time left before the target.")
+
+    # Idle until the blackout; the heartbeat thread exits on its own when it starts
+    blackout_wait = (blackout_start_time - datetime.now()).total_seconds()
+    if blackout_wait > 0:
+        logging.info(f"Keeping {len(registry.in_state(PREPARED))} instance(s) alive until the blackout at {blackout_start_time.strftime('%H:%M:%S')} ({blackout_wait:.0f}s).")
+        time.sleep(blackout_wait)
+    stop_pinger_event.set()
+    # Never let a stuck round hold the main thread into the pre-flight/submission window
+    join_budget = (target_submit_time - datetime.now()).total_seconds() - PREFLIGHT_MIN_SECONDS - 1
+    pinger_thread.join(timeout=max(0.0, min(HEARTBEAT_TIMEOUT_SECONDS + 5, join_budget)))
+    if pinger_thread.is_alive():
+        logging.warning("HEARTBEAT: last round still running at the blackout; continuing without it.")
+    logging.info(heartbeat.report())
+
+    # Replacements are admitted only if predicted to finish by prep_finish_deadline, and the watchdog aborts overruns
+    with prep_lock:
+        replacements = list(replacement_workers)
+    for t in replacements:
+        t.join(timeout=max(0.0, (target_submit_time - datetime.now()).total_seconds() - PREFLIGHT_MIN_SECONDS - 1))
+    if any(t.is_alive() for t in replacements):
+        logging.warning("A replacement preparation is still running at the blackout; leaving it out of the schedule.")
+    watchdog.stop()
+    if watchdog.killed:
+        logging.warning(f"Watchdog aborted {len(watchdog.killed)} hung preparation attempt(s).")
+
+    # Final health sweep: anything that fails it is marked dead and left out of the schedule
+    if (target_submit_time - datetime.now()).total_seconds() > PREFLIGHT_MIN_SECONDS:
+        heartbeat.preflight(timeout=PREFLIGHT_MIN_SECONDS)
     else:
-         logging.info("Target submission time is now or in the past. Proceeding immediately.")
+        logging.warning("Pre-flight sweep skipped: too close to the target.")
+    heartbeat.shutdown()
+
+    # Spares not needed to fill a slot are closed so they don't compete with the primaries
+    unused_spares = registry.spares()
+    if unused_spares:
+        logging.info(f"Closing {len(unused_spares)} unused standby spare(s).")
+        for spare_record in unused_spares:
+            try:
+                spare_record.booker.close()
+            except Exception as e:
+                logging.debug(f"Error closing standby spare {spare_record.id}: {e}")
+            registry.transition(spare_record, CLOSED, reason="standby not needed")
 
-    # --- Submission Phase --- 
-    logging.info(f"--- Target time reached! Starting RAPID Submission Phase at {datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]} ---")
-    
-    # Log the submission schedule for A/B testing
-    logging.info(f"A/B Testing Schedule - Each booking offset by {SUBMIT_DELAY_INCREMENT_SECONDS*1000:.0f}ms:")
-    for i in range(len(prepared_instances)):
-        delay_ms = i * SUBMIT_DELAY_INCREMENT_SECONDS * 1000
-        logging.info(f"  Instance {i+1}: +{delay_ms:.0f}ms delay")
-    
-    # -------------------- PARALLEL SUBMISSION PHASE --------------------
+    # Workers finish in arbitrary order; restore date/priority order for the submission schedule
+    prepared_records = sorted(registry.primaries(PREPARED), key=lambda r: r.slot)
+    prepared_slots = [record.slot for record in prepared_records]
+    prepared_instances = [record.booker for record in prepared_records]
+    if not prepared_instances:
+        logging.info("No submittable instances left after the pre-flight sweep. Exiting.")
+        _close_remaining("nothing to submit")
+        return
+
+    # All waits from here on are on perf_counter (coarse sleep + final spin), not time.sleep()
+    clock_anchor = WallClockAnchor()
+    target_perf = clock_anchor.to_perf(target_submit_time)
+    total_instances = len(prepared_instances)
+    # Fire instants are fixed against the target, so thread start-up time isn't added to each delay
+    fire_base_perf = max(target_perf, time.perf_counter())
+
+    # Per-instance offsets from the target: slot value falls with priority index
+    plan_inputs = []
+    for (date_idx, priority_index), booker_instance in zip(prepared_slots, prepared_instances):
+        priority = COURT_PRIORITIES[priority_index]
+        plan_inputs.append({
+            'label': f"{booker_instance.court_info_for_logging} using {getattr(booker_instance, 'user_email', 'unknown-user')}",
+            'slot': (date_idx, priority['court'], priority['time']),
+            'value': (len(COURT_PRIORITIES) - priority_index) / len(COURT_PRIORITIES),
+        })
+    timing_window = load_timing_window(datetime.now().weekday()) if USE_SUBMIT_PLANNER else None
+    submit_plan = plan_submissions(
+        plan_inputs,
+        window=timing_window,
+        base_offset=SUBMIT_SECOND + SUBMIT_MILLISECOND / 1000,
+        min_spacing=SUBMIT_DELAY_INCREMENT_SECONDS,
+    )
+    logging.info(submit_plan.render())
+
+    # -------------------- PARALLEL SUBMISSION WORKERS --------------------
     submit_errors = 0
     submit_errors_lock = threading.Lock()
 
-    def _fire_submit(idx, total, booker_inst):
-        """Worker thread that applies systematic delay for A/B testing, then clicks submit."""
+    def _fire_submit(idx, total, booker_inst, worker):
+        """Runs on a pre-spawned submit worker once the scheduler releases it; clicks submit."""
         nonlocal submit_errors
 
-        # Systematic delay for A/B testing: each instance gets progressively more delay
-        systematic_delay = idx * SUBMIT_DELAY_INCREMENT_SECONDS
-        time.sleep(systematic_delay)
+        # Planned offset from the target time for this instance
+        systematic_delay = submit_plan.offsets[idx]
 
-        # Log the exact timestamp when we're about to click submit
-        submission_timestamp = datetime.now()
+        # Click first: workers are released milliseconds apart and logging would make them
+        # queue on the handler lock inside the release-to-click window
+        submit_err = None
+        try:
+            booker_inst.submit_prepared_booking(on_click=worker.mark_click)
+        except Exception as e:
+            submit_err = e
+
+        # The attempt line is stamped with the click instant (parse_booking_attempts.py reads it)
+        submission_timestamp = clock_anchor.to_wall(worker.clicked_perf or worker.started_perf)
         user_tag = getattr(booker_inst, "user_email", "unknown-user")
         # Format timestamp to show milliseconds (truncate microseconds to 3 digits)
         timestamp_str = submission_timestamp.strftime('%H:%M:%S.%f')[:-3]
-        logging.info(
-            f"[{timestamp_str}] (+{systematic_delay:.1f}s delay) Clicking submit for instance {idx+1}/{total} "
+        _log_at(
+            submission_timestamp, logging.INFO,
+            f"[{timestamp_str}] ({systematic_delay:+.3f}s delay) Clicking submit for instance {idx+1}/{total} "
             f"({booker_inst.court_info_for_logging}) using {user_tag}"
         )
 
         try:
-            booker_inst.submit_prepared_booking()
+            if submit_err:
+                raise submit_err
+            registry.transition(prepared_records[idx], SUBMITTED)
         except Exception as submit_err:
             logging.error(
                 f"Unexpected error during submit click for {booker_inst.court_info_for_logging}: {submit_err}"
@@ -877,20 +1710,66 @@ def main():
             with submit_errors_lock:
                 submit_errors += 1
 
-    logging.info("--- Clicking Submit on all instances (Phase 1) in PARALLEL ---")
-
-    threads = []
-    total_instances = len(prepared_instances)
+    # Workers start now: each locates its submit button, then parks until released
+    submit_workers = []
     for idx, booker_instance in enumerate(prepared_instances):
-        t = threading.Thread(target=_fire_submit, args=(idx, total_instances, booker_instance), daemon=True)
-        threads.append(t)
-        t.start()
+        try:
+            registry.transition(prepared_records[idx], SUBMITTING)
+        except ValueError:
+            # Marked dead (e.g. by a heartbeat round still finishing) after the schedule was taken
+            logging.warning(
+                f"Skipping instance {idx+1}/{total_instances} ({booker_instance.court_info_for_logging}): "
+                f"no longer prepared ({prepared_records[idx].state})."
+            )
+            continue
+        worker = SubmitWorker(
+            f"instance {idx+1}/{total_instances}",
+            fire_base_perf + submit_plan.offsets[idx],
+            action=lambda w, i=idx, inst=booker_instance: _fire_submit(i, total_instances, inst, w),
+            prepare=booker_instance.locate_submit_button,
+        )
+        submit_workers.append(worker.start())
+
+    wait_seconds = target_perf - time.perf_counter()
+    if wait_seconds > 0:
+        logging.info(f"Entering final waiting phase. Target: {target_submit_time.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]} ({wait_seconds:.2f}s from now).")
+        # Keep-alives stopped at the blackout; this final wait is short.
+        http_instances = [inst for inst in prepared_instances if inst.http_submitter]
+        if http_instances and wait_seconds > HTTP_SUBMIT_WARMUP_SECONDS:
+            sleep_until(target_perf - HTTP_SUBMIT_WARMUP_SECONDS)
+            # Idle keep-alive connections may have been dropped by the server; re-open them in parallel
+            warm_threads = [threading.Thread(target=inst.warm_http_submission, daemon=True) for inst in http_instances]
+            for t in warm_threads:
+                t.start()
+            for t in warm_threads:
+                t.join(timeout=HTTP_SUBMIT_WARMUP_SECONDS / 2)
+            logging.info(f"Re-warmed {len(http_instances)} HTTP submit connection(s) ahead of target time.")
+        ready_workers = sum(1 for w in submit_workers if w.ready.is_set())
+        logging.info(f"{ready_workers}/{total_instances} submit workers parked and ready.")
+    else:
+         logging.info("Target submission time is now or in the past. Proceeding immediately.")
 
-    # Wait for all submission threads to complete
-    for t in threads:
-        t.join()
+    # --- Submission Phase --- 
+    fire_timings = FireTimingRecorder(clock_anchor)
+    with fine_grained_switching():
+        # Scheduler: spin until each precomputed instant and release that worker
+        release_on_schedule(submit_workers)
+        logging.info(f"--- Target time reached! Starting RAPID Submission Phase at {clock_anchor.to_wall(fire_base_perf).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]} ---")
+
+        # Wait for all submission workers to complete
+        for worker in submit_workers:
+            worker.join()
+    fire_timings.record_workers(submit_workers)
+    fire_timings.log_records()
+    logging.info(f"Submit fire timing (actual vs scheduled): {fire_timings.summary()}")
+    for worker in submit_workers:
+        latency = worker.release_latency_ms
+        logging.info(
+            f"Submit worker {worker.label}: release-to-click latency "
+            + (f"{latency:.3f}ms" if latency is not None else "n/a")
+        )
 
-    submit_attempts = len(prepared_instances)
+    submit_attempts = len(submit_workers)
     logging.info(
         f"--- Submit Clicking Phase Complete: {submit_attempts}/{len(prepared_instances)} submit clicks attempted. "
         f"Submit errors: {submit_errors} ---"
@@ -905,10 +1784,14 @@ def main():
     url_unchanged = 0
     verification_errors = 0
     
-    for idx, booker_instance in enumerate(prepared_instances):
+    for idx, record in enumerate(prepared_records):
+        if record.state != SUBMITTED:
+            verification_errors += 1
+            continue
         try:
-            result = booker_instance.verify_submission()
+            result = record.booker.verify_submission()
             if result is True:
+                registry.transition(record, VERIFIED)
                 url_changes_confirmed += 1
             elif result is False:
                 url_unchanged += 1
@@ -934,17 +1817,27 @@ def main():
     logging.info("--- Starting Cleanup Phase (Closing all browser windows - Phase 2) ---")
     closed_count = 0
     close_errors = 0
-    # Loop 2: Close all instances
-    for idx, booker_instance in enumerate(prepared_instances):
-        logging.info(f"Closing instance {idx+1}/{len(prepared_instances)} ({booker_instance.court_info_for_logging})")
+    logging.info(registry.summary())
+    # Loop 2: Close every instance still open in the registry
+    open_records = registry.open_records()
+    for idx, record in enumerate(open_records):
+        booker_instance = record.booker
+        logging.info(f"Closing instance {idx+1}/{len(open_records)} ({booker_instance.court_info_for_logging})")
         try:
             booker_instance.close()
             closed_count += 1
         except Exception as close_err:
             logging.error(f"Error closing browser window ({booker_instance.court_info_for_logging}): {close_err}")
             close_errors += 1
-
-    logging.info(f"--- Cleanup Phase Complete: {closed_count}/{len(prepared_instances)} windows closed. Close errors: {close_errors} ---")
+        registry.transition(record, CLOSED)
+    if context_pool:
+        context_pool.quit_hosts()
+
+    logging.info(f"--- Cleanup Phase Complete: {closed_count}/{len(open_records)} windows closed. Close errors: {close_errors} ---")
+    if tracer.spans:
+        logging.info("Per-step timings for this run:\n" + render_step_stats(tracer.spans))
+    if command_recorder:
+        log_command_report(command_recorder)
     logging.info("--- Script finished. ---")
     # No final summary of success/failure, as results were not checked.
 
@@ -0,0 +1,243 @@
+"""
+One Chrome process hosting many accounts in isolated browser contexts.
+
+The default layout launches a full Chrome (plus chromedriver) per account, which on
+two-date days means up to 24 browsers on one laptop. In context mode a few host
+browsers are launched instead and every booker gets its own browser context
+(Target.createBrowserContext: separate cookie jar, cache and storage, like an
+incognito profile) with one window in it.
+
+A WebDriver session can only drive one window at a time, so each booker gets a
+ContextDriver: a WebDriver sharing the host's session whose every command takes the
+host's lock and switches to its own window first. Elements found through it belong
+to it, so element commands switch too. Commands of bookers on the same host are
+therefore serialized; spread accounts over several hosts (about one per preparation
+worker) to keep preparation parallel.
+
+A command hung in one context holds the host's lock, so the prep watchdog can't
+abort it through WebDriver (and there is no per-context chromedriver to kill).
+ContextDriver.kill() instead closes the context's page target through Chrome's
+DevTools HTTP endpoint, which needs neither the lock nor chromedriver: the hung
+command fails, the lock is released and the rest of the host carries on.
+"""
+import logging
+import threading
+import time
+
+import requests
+
+from selenium.webdriver.chrome.webdriver import WebDriver as ChromeWebDriver
+from selenium.webdriver.remote.command import Command
+from selenium.webdriver.remote.mobile import Mobile
+from selenium.webdriver.remote.switch_to import SwitchTo
+
+
+class ContextDriver(ChromeWebDriver):
+    """WebDriver for one browser context on a shared host; quit() disposes only the context."""
+
+    def __init__(self, host, handle, context_id, target_id=None):
+        # Deliberately no super().__init__(): this shares the host's running session
+        self.__dict__.update(host.driver.__dict__)
+        self._switch_to = SwitchTo(self)
+        self._mobile = Mobile(self)
+        self.service = None  # chromedriver belongs to the host; never kill it for one context
+        self.host = host
+        self.handle = handle
+        self.context_id = context_id
+        self.target_id = target_id or handle
+
+    def kill(self):
+        """Close this context's page from outside the host lock (for aborting a hung command)."""
+        return self.host.close_target(self.target_id)
+
+    def execute(self, driver_command, params=None):
+        with self.host.lock:
+            self.host.activate(self.handle)
+            return super().execute(driver_command, params)
+
+    def quit(self):
+        self.host.dispose(self)
+
+    def close(self):
+        self.host.dispose(self)
+
+
+class BrowserHost:
+    """One launched Chrome and the contexts it hosts."""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.lock = threading.RLock()
+        self.home_handle = driver.current_window_handle  # the host's own window, never handed out
+        self.current_handle = self.home_handle
+        self.contexts = set()
+        self.created = 0
+        # Chrome's DevTools HTTP endpoint, reachable without going through chromedriver
+        self.debugger_address = (driver.capabilities or {}).get('goog:chromeOptions', {}).get('debuggerAddress')
+
+    def activate(self, handle):
+        """Make ``handle`` the session's current window (caller holds the lock)."""
+        if self.current_handle != handle:
+            self.driver.execute(Command.SWITCH_TO_WINDOW, {'handle': handle})
+            self.current_handle = handle
+
+    def new_context(self):
+        """Create a fresh browser context with one blank window and return its ContextDriver."""
+        with self.lock:
+            self.activate(self.home_handle)
+            context_id = self.driver.execute_cdp_cmd('Target.createBrowserContext', {})['browserContextId']
+            before = set(self.driver.window_handles)
+            target = self.driver.execute_cdp_cmd(
+                'Target.createTarget', {'url': 'about:blank', 'browserContextId': context_id, 'newWindow': True}
+            )
+            # Window handles are normally the target ids; fall back to whichever handle is new
+            handles = set(self.driver.window_handles)
+            handle = target['targetId'] if target['targetId'] in handles else next(iter(handles - before))
+            context = ContextDriver(self, handle, context_id, target['targetId'])
+            self.contexts.add(context)
+            self.created += 1
+        return context
+
+    def dispose(self, context):
+        """Close a context's window and drop its cookies; the host keeps running."""
+        with self.lock:
+            if context not in self.contexts:
+                return
+            self.contexts.discard(context)
+            self.activate(self.home_handle)
+            self.driver.execute_cdp_cmd('Target.disposeBrowserContext', {'browserContextId': context.context_id})
+
+    def close_target(self, target_id, timeout=2):
+        """Close a page target via /json/close without taking the lock. Returns True if Chrome accepted it."""
+        if not self.debugger_address:
+            logging.warning("BROWSER CONTEXTS: host has no DevTools address; cannot close a hung context.")
+            return False
+        try:
+            response = requests.get(f"http://{self.debugger_address}/json/close/{target_id}", timeout=timeout)
+            return response.ok
+        except requests.RequestException as e:
+            logging.warning(f"BROWSER CONTEXTS: could not close target {target_id}: {e}")
+            return False
+
+    def is_alive(self):
+        try:
+            with self.lock:
+                _ = self.driver.window_handles
+            return True
+        except Exception:
+            return False
+
+    def pid(self):
+        """chromedriver's process id (Chrome runs beneath it), or None."""
+        process = getattr(getattr(self.driver, 'service', None), 'process', None)
+        return process.pid if process else None
+
+    def quit(self):
+        try:
+            self.driver.quit()
+        except Exception as e:
+            logging.debug(f"BROWSER CONTEXTS: Error quitting host browser: {e}")
+
+
+class ContextBrowserPool:
+    """Drop-in for BrowserPool: checkout() hands out a new context on the least loaded host."""
+
+    def __init__(self, factory, hosts, context_setup=None):
+        """
+        Args:
+            factory: Callable returning a ready-to-use WebDriver (raises on failure)
+            hosts: Number of host browsers to launch
+            context_setup: Optional callable run on every new ContextDriver (e.g. request blocking,
+                which DevTools applies per window)
+        """
+        self.factory = factory
+        self.context_setup = context_setup
+        self.size = hosts
+        self.hosts = []
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._launching = 0
+        self._launch_failures = 0
+        self._launch_latencies = []
+        self._context_latencies = []
+        self._stopped = False
+
+    def start(self):
+        """Launch the host browsers in parallel."""
+        logging.info(f"BROWSER CONTEXTS: Launching {self.size} host browser(s) for per-account contexts...")
+        with self._lock:
+            self._launching = self.size
+        for _ in range(self.size):
+            threading.Thread(target=self._launch_one, name="browser-host-launch", daemon=True).start()
+
+    def _launch_one(self):
+        start = time.perf_counter()
+        host = None
+        try:
+            host = BrowserHost(self.factory())
+        except Exception as e:
+            logging.warning(f"BROWSER CONTEXTS: host browser launch failed: {e}")
+        with self._lock:
+            self._launching -= 1
+            if host is None:
+                self._launch_failures += 1
+            else:
+                self._launch_latencies.append(time.perf_counter() - start)
+                self.hosts.append(host)
+            self._available.notify_all()
+
+    def checkout(self, timeout=60):
+        """
+        New context on the live host with the fewest contexts, waiting for a launch if needed.
+        Returns None if no host is available within ``timeout`` so the caller can cold-launch.
+        """
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while not self.hosts:
+                if self._stopped:
+                    return None
+                remaining = deadline - time.monotonic()
+                if self._launching == 0 or remaining <= 0:
+                    return None
+                self._available.wait(timeout=remaining)
+            candidates = sorted(self.hosts, key=lambda h: len(h.contexts))
+        for host in candidates:
+            start = time.perf_counter()
+            try:
+                context = host.new_context()
+                if self.context_setup:
+                    self.context_setup(context)
+            except Exception as e:
+                logging.warning(f"BROWSER CONTEXTS: could not create a context on a host browser: {e}")
+                continue
+            with self._lock:
+                self._context_latencies.append(time.perf_counter() - start)
+            return context
+        return None
+
+    def log_stats(self):
+        with self._lock:
+            launches = list(self._launch_latencies)
+            contexts = list(self._context_latencies)
+            hosts = list(self.hosts)
+        launch = f"host launch avg {sum(launches)/len(launches):.1f}s" if launches else "no successful host launches"
+        context = f"context creation avg {sum(contexts)/len(contexts)*1000:.0f}ms" if contexts else "no contexts created"
+        per_host = ", ".join(f"{len(h.contexts)}/{h.created}" for h in hosts)
+        logging.info(
+            f"BROWSER CONTEXTS: {len(hosts)} host(s), {self._launch_failures} launch failure(s), {launch}, "
+            f"{context}; open/created contexts per host: {per_host or 'none'}."
+        )
+
+    def shutdown(self):
+        """Stop handing out contexts. Hosts stay up for the contexts still in use (see quit_hosts())."""
+        with self._lock:
+            self._stopped = True
+            self._available.notify_all()
+
+    def quit_hosts(self):
+        """Quit every host browser (and with it any context still open)."""
+        with self._lock:
+            hosts = list(self.hosts)
+            self.hosts.clear()
+        for host in hosts:
+            host.quit()
@@ -0,0 +1,188 @@
+"""
+Warm pool of pre-launched Chrome WebDriver sessions.
+
+Launching Chrome (plus chromedriver) is the slowest part of creating a TennisBooker.
+The pool starts several sessions in parallel when the script starts so that each
+booker can check out an already-running driver instead of paying a cold launch inside
+the preparation window. Idle sessions are health-checked in the background and
+crashed ones are replaced.
+"""
+import logging
+import threading
+import time
+from collections import deque
+
+
+class BrowserPool:
+    def __init__(self, factory, size, max_launches=None, health_check_interval=10):
+        """
+        Args:
+            factory: Callable returning a ready-to-use WebDriver (raises on failure)
+            size: Number of idle sessions to keep warm
+            max_launches: Upper bound on launches over the pool's lifetime (None = unbounded)
+            health_check_interval: Seconds between background liveness sweeps of idle sessions
+        """
+        self.factory = factory
+        self.size = size
+        self.max_launches = max_launches
+        self.health_check_interval = health_check_interval
+
+        self._idle = deque()
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._stop_event = threading.Event()
+        self._monitor_thread = None
+
+        self._launches_started = 0
+        self._launching = 0
+        self._checked_out = 0
+        self._launch_latencies = []
+        self._launch_failures = 0
+        self._crashed_replaced = 0
+
+    def start(self):
+        """Launch the initial sessions in parallel and start the background health monitor."""
+        logging.info(f"BROWSER POOL: Pre-launching {self.size} Chrome session(s) in parallel...")
+        self._top_up()
+        self._monitor_thread = threading.Thread(target=self._monitor, name="browser-pool-monitor", daemon=True)
+        self._monitor_thread.start()
+
+    def _top_up(self):
+        """Start enough background launches to bring idle + launching back up to the pool size."""
+        with self._lock:
+            deficit = self.size - len(self._idle) - self._launching
+            if self.max_launches is not None:
+                deficit = min(deficit, self.max_launches - self._launches_started)
+            if self._stop_event.is_set() or deficit <= 0:
+                return
+            self._launches_started += deficit
+            self._launching += deficit
+        for _ in range(deficit):
+            threading.Thread(target=self._launch_one, name="browser-pool-launch", daemon=True).start()
+
+    def _launch_one(self):
+        start = time.perf_counter()
+        driver = None
+        try:
+            driver = self.factory()
+        except Exception as e:
+            logging.warning(f"BROWSER POOL: Chrome launch failed: {e}")
+        latency = time.perf_counter() - start
+
+        with self._lock:
+            self._launching -= 1
+            if driver is None:
+                self._launch_failures += 1
+            elif self._stop_event.is_set():
+                pass  # pool shut down while we were launching; quit below
+            else:
+                self._launch_latencies.append(latency)
+                self._idle.append(driver)
+                logging.debug(f"BROWSER POOL: Chrome session ready in {latency:.1f}s ({len(self._idle)} idle).")
+                driver = None
+            self._available.notify_all()
+
+        if driver is not None:
+            self._quit(driver)
+
+    @staticmethod
+    def _is_alive(driver):
+        try:
+            _ = driver.window_handles
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _quit(driver):
+        try:
+            driver.quit()
+        except Exception as e:
+            logging.debug(f"BROWSER POOL: Error quitting driver: {e}")
+
+    def checkout(self, timeout=60):
+        """
+        Take a live driver from the pool, waiting for an in-flight launch if needed.
+
+        Returns None if no session becomes available within ``timeout`` seconds or the
+        pool cannot launch any more, so the caller can fall back to a cold launch.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                while not self._idle:
+                    remaining = deadline - time.monotonic()
+                    if self._launching == 0 or remaining <= 0 or self._stop_event.is_set():
+                        return None
+                    self._available.wait(timeout=remaining)
+                driver = self._idle.popleft()
+
+            if self._is_alive(driver):
+                with self._lock:
+                    self._checked_out += 1
+                self._top_up()
+                return driver
+
+            logging.warning("BROWSER POOL: Discarding crashed idle session at checkout.")
+            with self._lock:
+                self._crashed_replaced += 1
+            self._quit(driver)
+            self._top_up()
+
+    def _monitor(self):
+        """Periodically ping idle sessions and replace any that have died."""
+        while not self._stop_event.wait(self.health_check_interval):
+            with self._lock:
+                snapshot = list(self._idle)
+            for driver in snapshot:
+                if self._is_alive(driver):
+                    continue
+                with self._lock:
+                    if driver not in self._idle:
+                        continue  # checked out in the meantime
+                    self._idle.remove(driver)
+                    self._crashed_replaced += 1
+                logging.warning("BROWSER POOL: Idle Chrome session crashed. Launching replacement in background.")
+                self._quit(driver)
+            self._top_up()
+
+    def stats(self):
+        """Return a snapshot of pool size, launch latency and failure counters."""
+        with self._lock:
+            latencies = list(self._launch_latencies)
+            return {
+                'size': self.size,
+                'idle': len(self._idle),
+                'launching': self._launching,
+                'checked_out': self._checked_out,
+                'launched': len(latencies),
+                'launch_failures': self._launch_failures,
+                'crashed_replaced': self._crashed_replaced,
+                'launch_latency_min': min(latencies) if latencies else None,
+                'launch_latency_avg': sum(latencies) / len(latencies) if latencies else None,
+                'launch_latency_max': max(latencies) if latencies else None,
+            }
+
+    def log_stats(self):
+        s = self.stats()
+        if s['launched']:
+            latency = f"launch latency min/avg/max {s['launch_latency_min']:.1f}/{s['launch_latency_avg']:.1f}/{s['launch_latency_max']:.1f}s"
+        else:
+            latency = "no successful launches"
+        logging.info(
+            f"BROWSER POOL: size {s['size']}, {s['idle']} idle, {s['launching']} launching, "
+            f"{s['checked_out']} checked out, {s['launch_failures']} launch failure(s), "
+            f"{s['crashed_replaced']} crashed session(s) replaced, {latency}."
+        )
+
+    def shutdown(self):
+        """Stop background work and quit every idle session. Checked-out drivers are left alone."""
+        self._stop_event.set()
+        with self._lock:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._available.notify_all()
+        for driver in idle:
+            self._quit(driver)
+        if self._monitor_thread:
+            self._monitor_thread.join(timeout=5)
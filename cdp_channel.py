@@ -0,0 +1,474 @@
+#!/usr/bin/env python3
+"""
+DevTools-protocol command channel for the hot-path form actions.
+
+Every WebDriver action is its own HTTP round trip to chromedriver, and every
+``wait.until(EC.element_to_be_clickable(...))`` re-polls find/displayed/enabled every
+500ms until the element shows up. The "cdp" backend instead keeps one DevTools
+websocket open to the booker's page target (chromedriver's debuggerAddress) and runs
+each action as a single Runtime.evaluate:
+
+  - waits are event driven: one evaluate returning a promise that a MutationObserver
+    resolves the moment the element appears / becomes clickable / goes away, so the
+    wait ends on the DOM change rather than on the next poll;
+  - select, type (Input.insertText), click, check and reading the URL are one
+    command each, with no element lookups in between.
+
+TennisBooker's form steps use the small DOM-action interface below (``booker.dom``),
+implemented by WebDriverDom (the existing WebDriver calls, unchanged) and CdpDom.
+Navigation, cookies, screenshots and submission stay on WebDriver either way.
+
+websocket-client is optional: without it (or if the page target can't be reached)
+the booker logs a warning and stays on WebDriver.
+
+Benchmark both backends through the booker's own form steps against the local stand-in:
+    python cdp_channel.py --benchmark --runs 5
+"""
+import argparse
+import itertools
+import json
+import logging
+import threading
+import time
+
+import requests
+from selenium.common.exceptions import NoSuchElementException, TimeoutException, WebDriverException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import Select, WebDriverWait
+
+from command_trace import TracedWait
+
+try:
+    import websocket  # websocket-client
+except ImportError:  # optional dependency, only needed for the cdp backend
+    websocket = None
+
+DOM_BACKENDS = ('webdriver', 'cdp')
+
+# Resolves once the element matching arguments[0] is in the state arguments[1]
+# ('present', 'clickable' or 'gone'), or with false after arguments[2] ms. Evaluated with
+# awaitPromise, so the whole wait is one DevTools command.
+_AWAIT_ELEMENT_JS = """
+var selector = arguments[0], state = arguments[1], timeoutMs = arguments[2];
+function shown(el) {
+    return el.getClientRects().length > 0 && window.getComputedStyle(el).visibility !== 'hidden';
+}
+function done() {
+    var els = document.querySelectorAll(selector);
+    if (state === 'gone') {
+        return Array.prototype.every.call(els, function(el) { return !shown(el); });
+    }
+    if (!els.length) { return false; }
+    return state === 'present' || (shown(els[0]) && !els[0].disabled);
+}
+return new Promise(function(resolve) {
+    if (done()) { resolve(true); return; }
+    var timer;
+    var observer = new MutationObserver(function() {
+        if (done()) { observer.disconnect(); clearTimeout(timer); resolve(true); }
+    });
+    observer.observe(document, {childList: true, subtree: true, attributes: true});
+    timer = setTimeout(function() { observer.disconnect(); resolve(done()); }, timeoutMs);
+});
+"""
+
+_CLICK_JS = "document.querySelector(arguments[0]).click();"
+
+_CHECK_JS = "var el = document.querySelector(arguments[0]); if (!el.checked) { el.click(); }"
+
+_SCROLL_INTO_VIEW_JS = "document.querySelector(arguments[0]).scrollIntoView(true);"
+
+# Focus the field with the caret at the end (optionally emptied first) so Input.insertText
+# types into it like send_keys would
+_FOCUS_FOR_TYPING_JS = """
+var el = document.querySelector(arguments[0]);
+el.focus();
+if (arguments[1] && el.value) {
+    el.value = '';
+    el.dispatchEvent(new Event('input', {bubbles: true}));
+}
+try { el.setSelectionRange(el.value.length, el.value.length); } catch (e) {}
+"""
+
+# Select an option by visible text (whitespace-normalised, like Select.select_by_visible_text)
+# or by value and fire the events a user's choice would. Returns false if no option matches.
+_SELECT_OPTION_JS = """
+var el = document.querySelector(arguments[0]), text = arguments[1], value = arguments[2];
+var opt = Array.prototype.find.call(el.options, function(o) {
+    return text !== null ? o.text.replace(/\\s+/g, ' ').trim() === text : o.value === value;
+});
+if (!opt) { return false; }
+if (!opt.selected) {
+    opt.selected = true;
+    el.dispatchEvent(new Event('input', {bubbles: true}));
+    el.dispatchEvent(new Event('change', {bubbles: true}));
+}
+return true;
+"""
+
+_BLUR_JS = "if (document.activeElement) { document.activeElement.blur(); }"
+
+
+class CdpError(WebDriverException):
+    """A DevTools command failed or the channel is gone (a WebDriverException, so existing handlers apply)."""
+
+
+class CdpChannel:
+    """One persistent DevTools websocket to a page target, with request/response matching."""
+
+    def __init__(self, ws_url, timeout=10):
+        if websocket is None:
+            raise CdpError("websocket-client is not installed (pip install websocket-client)")
+        self.ws_url = ws_url
+        self.timeout = timeout
+        self._ws = websocket.create_connection(ws_url, timeout=timeout, suppress_origin=True)
+        self._ws.settimeout(None)  # the reader blocks until a message arrives or the socket closes
+        self._ids = itertools.count(1)
+        self._send_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._pending = {}  # command id -> [threading.Event, response]
+        self._closed = False
+        self.commands = 0
+        self._reader = threading.Thread(target=self._read, name="cdp-reader", daemon=True)
+        self._reader.start()
+
+    @classmethod
+    def for_driver(cls, driver, timeout=10):
+        """Channel to the page target behind ``driver``'s current window."""
+        address = driver.capabilities.get('goog:chromeOptions', {}).get('debuggerAddress')
+        if not address:
+            raise CdpError("Chrome session has no DevTools debuggerAddress")
+        handle = driver.current_window_handle
+        targets = requests.get(f"http://{address}/json/list", timeout=timeout).json()
+        pages = [t for t in targets if t.get('type') == 'page' and t.get('webSocketDebuggerUrl')]
+        # Window handles are the target ids; a single-window browser can only mean one page
+        target = next((t for t in pages if t.get('id') == handle), pages[0] if len(pages) == 1 else None)
+        if target is None:
+            raise CdpError(f"No DevTools page target for window {handle}")
+        return cls(target['webSocketDebuggerUrl'], timeout=timeout)
+
+    def _read(self):
+        while True:
+            try:
+                message = json.loads(self._ws.recv())
+            except Exception:
+                break
+            if 'id' not in message:
+                continue  # events; the waits run in the page instead
+            with self._lock:
+                waiter = self._pending.pop(message['id'], None)
+            if waiter:
+                waiter[1] = message
+                waiter[0].set()
+        with self._lock:
+            self._closed = True
+            pending = list(self._pending.values())
+            self._pending.clear()
+        for waiter in pending:
+            waiter[0].set()  # wake every caller; they find no response and raise
+
+    def send(self, method, params=None, timeout=None):
+        """Send a command and return its result; raises CdpError on a protocol error, timeout or closed channel."""
+        command_id = next(self._ids)
+        waiter = [threading.Event(), None]
+        with self._lock:
+            if self._closed:
+                raise CdpError(f"DevTools channel closed ({method})")
+            self._pending[command_id] = waiter
+        try:
+            with self._send_lock:
+                self._ws.send(json.dumps({'id': command_id, 'method': method, 'params': params or {}}))
+        except Exception as e:
+            with self._lock:
+                self._pending.pop(command_id, None)
+            raise CdpError(f"DevTools send failed ({method}): {e}")
+        self.commands += 1
+        if not waiter[0].wait(self.timeout if timeout is None else timeout):
+            with self._lock:
+                self._pending.pop(command_id, None)
+            raise CdpError(f"DevTools command {method} timed out")
+        response = waiter[1]
+        if response is None:
+            raise CdpError(f"DevTools channel closed while waiting for {method}")
+        if 'error' in response:
+            raise CdpError(f"{method} failed: {response['error'].get('message')}")
+        return response.get('result', {})
+
+    def close(self):
+        try:
+            self._ws.close()
+        except Exception:
+            pass
+
+
+class WebDriverDom:
+    """DOM actions over WebDriver: the booker's original calls, one HTTP round trip (or poll loop) each."""
+
+    name = 'webdriver'
+
+    def __init__(self, driver, timeout=10):
+        self.driver = driver
+        self.timeout = timeout
+
+    def _wait(self, timeout):
+        return TracedWait(self.driver, self.timeout if timeout is None else timeout)
+
+    def wait_for(self, selector, clickable=True, timeout=None):
+        condition = EC.element_to_be_clickable if clickable else EC.presence_of_element_located
+        return self._wait(timeout).until(condition((By.CSS_SELECTOR, selector)))
+
+    def wait_gone(self, selector, timeout=None):
+        """True once no matching element is visible, False if one still is after ``timeout``."""
+        try:
+            self._wait(timeout).until(EC.invisibility_of_element_located((By.CSS_SELECTOR, selector)))
+            return True
+        except TimeoutException:
+            return False
+
+    def click(self, selector, timeout=None):
+        """JavaScript click once clickable (sidesteps overlay interception)."""
+        self.driver.execute_script("arguments[0].click();", self.wait_for(selector, timeout=timeout))
+
+    def check(self, selector, timeout=None):
+        """Tick a checkbox unless it already is."""
+        checkbox = self.wait_for(selector, timeout=timeout)
+        if not checkbox.is_selected():
+            checkbox.click()
+
+    def type(self, selector, text, clear=False, timeout=None):
+        field = self.wait_for(selector, timeout=timeout)
+        if clear:
+            field.clear()
+        field.send_keys(text)
+
+    def select(self, selector, text=None, value=None, timeout=None):
+        """Choose an option by visible text or value; NoSuchElementException if there is none."""
+        dropdown = Select(self.wait_for(selector, timeout=timeout))
+        if text is not None:
+            dropdown.select_by_visible_text(text)
+        else:
+            dropdown.select_by_value(value)
+
+    def blur(self):
+        """Move focus off the current field (triggers the form's validation)."""
+        self.driver.find_element(By.TAG_NAME, 'body').click()
+
+    def scroll_into_view(self, selector, timeout=None):
+        self.driver.execute_script("arguments[0].scrollIntoView(true);", self.wait_for(selector, timeout=timeout))
+
+    def evaluate(self, script, *args):
+        """Run an execute_script-style body (``arguments[n]``, ``return``) and return its value."""
+        return self.driver.execute_script(script, *args)
+
+    def current_url(self):
+        return self.driver.current_url
+
+    @property
+    def command_count(self):
+        return None  # WebDriver commands aren't counted here
+
+    def close(self):
+        pass
+
+
+class CdpDom:
+    """DOM actions over a CdpChannel: one Runtime.evaluate per action, event-driven waits."""
+
+    name = 'cdp'
+
+    def __init__(self, driver, channel, timeout=10):
+        self.driver = driver
+        self.channel = channel
+        self.timeout = timeout
+
+    def evaluate(self, script, *args, await_promise=False, timeout=None):
+        """Run an execute_script-style body (``arguments[n]``, ``return``) in the page and return its value."""
+        expression = f"(function() {{\n{script}\n}}).apply(null, {json.dumps(list(args))})"
+        result = self.channel.send('Runtime.evaluate', {
+            'expression': expression,
+            'returnByValue': True,
+            'awaitPromise': await_promise,
+            'userGesture': True,
+        }, timeout=timeout)
+        if 'exceptionDetails' in result:
+            details = result['exceptionDetails']
+            description = details.get('exception', {}).get('description') or details.get('text')
+            raise CdpError(f"Script error: {description}")
+        return result.get('result', {}).get('value')
+
+    def _await(self, selector, state, timeout):
+        """Wait in the page for ``selector`` to reach ``state``; navigations in between are ridden out."""
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            try:
+                return bool(self.evaluate(
+                    _AWAIT_ELEMENT_JS, selector, state, int(remaining * 1000),
+                    await_promise=True, timeout=remaining + self.channel.timeout,
+                ))
+            except CdpError as e:
+                # The document was replaced mid-wait (e.g. the click that submitted the form);
+                # wait again in the new one
+                if 'context' not in str(e).lower() and 'navigated' not in str(e).lower():
+                    raise
+                time.sleep(0.01)
+
+    def wait_for(self, selector, clickable=True, timeout=None):
+        if not self._await(selector, 'clickable' if clickable else 'present', timeout):
+            raise TimeoutException(f"{selector} not {'clickable' if clickable else 'present'} within {self.timeout if timeout is None else timeout}s")
+
+    def wait_gone(self, selector, timeout=None):
+        return self._await(selector, 'gone', timeout)
+
+    def click(self, selector, timeout=None):
+        self.wait_for(selector, timeout=timeout)
+        self.evaluate(_CLICK_JS, selector)
+
+    def check(self, selector, timeout=None):
+        self.wait_for(selector, timeout=timeout)
+        self.evaluate(_CHECK_JS, selector)
+
+    def type(self, selector, text, clear=False, timeout=None):
+        self.wait_for(selector, timeout=timeout)
+        self.evaluate(_FOCUS_FOR_TYPING_JS, selector, clear)
+        self.channel.send('Input.insertText', {'text': text})
+
+    def select(self, selector, text=None, value=None, timeout=None):
+        self.wait_for(selector, timeout=timeout)
+        if not self.evaluate(_SELECT_OPTION_JS, selector, text, value):
+            wanted = f"visible text: {text}" if text is not None else f"value: {value}"
+            raise NoSuchElementException(f"Cannot locate option with {wanted}")
+
+    def blur(self):
+        self.evaluate(_BLUR_JS)
+
+    def scroll_into_view(self, selector, timeout=None):
+        self.wait_for(selector, timeout=timeout)
+        self.evaluate(_SCROLL_INTO_VIEW_JS, selector)
+
+    def current_url(self):
+        return self.evaluate("return location.href;")
+
+    @property
+    def command_count(self):
+        return self.channel.commands
+
+    def close(self):
+        self.channel.close()
+
+
+def open_dom(driver, backend='webdriver', timeout=10):
+    """DOM actions for ``driver`` over ``backend``; falls back to WebDriver if DevTools can't be reached."""
+    if backend == 'cdp':
+        try:
+            return CdpDom(driver, CdpChannel.for_driver(driver, timeout=timeout), timeout=timeout)
+        except Exception as e:
+            logging.warning(f"DevTools channel unavailable, using WebDriver for form actions: {e}")
+    elif backend != 'webdriver':
+        raise ValueError(f"Unknown DOM backend: {backend}")
+    return WebDriverDom(driver, timeout=timeout)
+
+
+# ---------------------------------------------------------------------------
+# Benchmark against the stand-in permit site
+# ---------------------------------------------------------------------------
+
+def _count_webdriver_commands(driver):
+    """Wrap ``driver.execute`` (which element commands go through too) with a counter."""
+    counter = {'commands': 0}
+    execute = driver.execute
+
+    def counting_execute(driver_command, params=None):
+        counter['commands'] += 1
+        return execute(driver_command, params)
+
+    driver.execute = counting_execute
+    return counter
+
+
+def _form_flow(backend, base_url):
+    """Log in over WebDriver, then time the booker's form steps on ``backend``. Returns (seconds, WebDriver commands, DevTools commands)."""
+    from datetime import date, timedelta
+
+    from auto_super_tennis_booker import TennisBooker, launch_chrome_driver
+
+    driver = launch_chrome_driver()
+    try:
+        driver.get(base_url + "/")
+        driver.find_element(By.ID, "loginEmail").send_keys("benchmark@example.com")
+        driver.find_element(By.ID, "loginPassword").send_keys("benchmark")
+        driver.find_element(By.CSS_SELECTOR, "#login button").click()
+        WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.CSS_SELECTOR, 'a[href="/Permits/New"]')))
+
+        booker = TennisBooker(driver=driver, batch_form_fill=True, dom_backend=backend)
+        booker.court_info_for_logging = "benchmark"
+        booker.dom  # open the channel outside the timed section, as the first prep step would
+        counter = _count_webdriver_commands(driver)
+        start = time.perf_counter()
+        booker.start_new_permit_form()
+        booker.select_court(1)
+        booker.set_date_and_time(date.today() + timedelta(days=2), "8:00")
+        booker._open_permit_questions()
+        booker._fill_permit_questions()
+        seconds = time.perf_counter() - start
+        return seconds, counter['commands'], booker.dom.command_count or 0
+    finally:
+        driver.quit()
+
+
+def benchmark(runs=3, asset_delay=0.0):
+    """Run the form steps with each backend, alternating, and print commands and wall time."""
+    from stand_in_permit_server import serve_in_background
+
+    server, base_url = serve_in_background(assets=asset_delay > 0, asset_delay=asset_delay)
+    results = {backend: [] for backend in DOM_BACKENDS}
+    try:
+        for run in range(runs):
+            for backend in DOM_BACKENDS:
+                try:
+                    results[backend].append(_form_flow(backend, base_url))
+                except Exception as e:
+                    print(f"Run {run+1} with the {backend} backend failed: {e}")
+    finally:
+        server.shutdown()
+
+    print(f"Stand-in at {base_url}, {runs} run(s) per backend (form steps: new permit -> questions filled)")
+    print(f"{'BACKEND':<11}{'WALL':>9}{'WEBDRIVER':>11}{'DEVTOOLS':>10}{'TOTAL':>8}")
+    averages = {}
+    for backend in DOM_BACKENDS:
+        flows = results[backend]
+        if not flows:
+            print(f"{backend:<11}(no successful runs)")
+            continue
+        seconds, webdriver_commands, devtools_commands = (sum(column) / len(flows) for column in zip(*flows))
+        averages[backend] = seconds
+        print(f"{backend:<11}{seconds:>8.2f}s{webdriver_commands:>11.1f}{devtools_commands:>10.1f}{webdriver_commands + devtools_commands:>8.1f}")
+    if len(averages) == 2:
+        base = averages['webdriver']
+        print(f"cdp vs webdriver: {(base - averages['cdp']) / base:+.0%} wall time")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the DevTools form-action backend against WebDriver')
+    parser.add_argument('--benchmark', action='store_true', help='Run the form steps on both backends against the stand-in site')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--asset-delay', type=float, default=0.0, help='Serve recorded page assets, each delayed this many seconds')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    if not args.benchmark:
+        parser.print_help()
+        return
+    if websocket is None:
+        print("websocket-client is not installed; the cdp backend would fall back to WebDriver (pip install websocket-client).")
+        return
+    benchmark(runs=args.runs, asset_delay=args.asset_delay)
+
+
+if __name__ == "__main__":
+    main()
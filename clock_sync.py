@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Estimate the permit site's clock offset from its HTTP Date headers.
+
+Whether a submission counts as "too early" or "too late" is decided by the
+civicpermits server clock, not by this machine's datetime.now(). Every response
+carries a Date header with 1-second resolution, so a single sample only says the
+server clock read S..S+1 at some point between sending the request (t0) and
+receiving the response (t1):
+
+    S - t1 <= offset < S + 1 - t0        (offset = server clock - local clock)
+
+Intersecting these bounds over several samples narrows the offset well below one
+second. Requests are timed (NTP-style bisection) so the expected server second
+boundary falls in the middle of each request's round trip, which halves the
+remaining interval per sample while round trips are short.
+
+Check against the local stand-in with an injected skew:
+    python stand_in_permit_server.py --port 8765 --skew 1.37
+    python clock_sync.py --url http://127.0.0.1:8765
+"""
+import argparse
+import logging
+import math
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+
+
+class ClockOffset:
+    """Estimated server-minus-local clock offset with its uncertainty (seconds)."""
+
+    def __init__(self, lower, upper, samples, min_rtt):
+        self.lower = lower
+        self.upper = upper
+        self.samples = samples
+        self.min_rtt = min_rtt
+
+    @property
+    def offset(self):
+        return (self.lower + self.upper) / 2
+
+    @property
+    def uncertainty(self):
+        return (self.upper - self.lower) / 2
+
+    def __str__(self):
+        return (
+            f"server clock offset {self.offset*1000:+.0f}ms ±{self.uncertainty*1000:.0f}ms "
+            f"({self.samples} samples, min RTT {self.min_rtt*1000:.0f}ms)"
+        )
+
+
+class ServerClockSampler:
+    """Samples a server's Date header and intersects the offset bounds."""
+
+    def __init__(self, url, session=None, timeout=5):
+        self.url = url
+        self.session = session or requests.Session()
+        self.timeout = timeout
+        self.method = 'HEAD'
+        self.lower = -math.inf
+        self.upper = math.inf
+        self.samples = 0
+        self.min_rtt = math.inf
+
+    def _request(self):
+        response = self.session.request(self.method, self.url, timeout=self.timeout, allow_redirects=False)
+        if response.status_code == 405 and self.method == 'HEAD':
+            # Some servers reject HEAD; fall back to GET for this and later samples
+            self.method = 'GET'
+            response = self.session.request(self.method, self.url, timeout=self.timeout, allow_redirects=False)
+        return response
+
+    def sample(self):
+        """Take one sample and tighten the bounds. Returns False if the sample was unusable."""
+        t0 = time.time()
+        response = self._request()
+        t1 = time.time()
+        date_header = response.headers.get('Date')
+        if not date_header:
+            logging.debug(f"No Date header from {self.url}; sample ignored.")
+            return False
+        server_second = parsedate_to_datetime(date_header).timestamp()
+        lower = server_second - t1
+        upper = server_second + 1 - t0
+        self.samples += 1
+        self.min_rtt = min(self.min_rtt, t1 - t0)
+        if lower > self.upper or upper < self.lower:
+            # Inconsistent with earlier samples (server stall or clock step): start over from this one
+            logging.debug(f"Clock sample [{lower:+.3f}, {upper:+.3f}] disjoint from [{self.lower:+.3f}, {self.upper:+.3f}]; resetting.")
+            self.lower, self.upper = lower, upper
+        else:
+            self.lower = max(self.lower, lower)
+            self.upper = min(self.upper, upper)
+        return True
+
+    def _next_send_time(self):
+        """Local time to send the next request so the midpoint estimate's second boundary
+        lands in the middle of the round trip."""
+        now = time.time()
+        if self.samples == 0 or not math.isfinite(self.min_rtt):
+            return now
+        offset = (self.lower + self.upper) / 2
+        # Next server-second boundary (under the current estimate) reached at least a little from now
+        boundary_local = math.ceil(now + offset + self.min_rtt) - offset
+        return boundary_local - self.min_rtt / 2
+
+    def estimate(self, samples=8, target_uncertainty=0.005, deadline=None):
+        """Sample up to ``samples`` times (stopping early once precise enough) and return a ClockOffset."""
+        while self.samples < samples:
+            if deadline is not None and time.time() >= deadline:
+                break
+            send_at = self._next_send_time()
+            if deadline is not None and send_at >= deadline:
+                break
+            delay = send_at - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                self.sample()
+            except requests.RequestException as e:
+                logging.debug(f"Clock sample against {self.url} failed: {e}")
+                self.samples += 1  # count it so a dead server can't loop forever
+                continue
+            if (self.upper - self.lower) / 2 <= target_uncertainty:
+                break
+        if not math.isfinite(self.lower) or not math.isfinite(self.upper):
+            return None
+        return ClockOffset(self.lower, self.upper, self.samples, self.min_rtt)
+
+
+def estimate_server_offset(url, samples=8, timeout=5, session=None, deadline=None):
+    """Convenience wrapper: ClockOffset for ``url``, or None if no usable sample was taken."""
+    return ServerClockSampler(url, session=session, timeout=timeout).estimate(samples=samples, deadline=deadline)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Estimate a server's clock offset from its HTTP Date headers")
+    parser.add_argument('--url', default='https://rioc.civicpermits.com', help='Server to sample')
+    parser.add_argument('--samples', type=int, default=8, help='Maximum number of requests')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    result = estimate_server_offset(args.url, samples=args.samples)
+    if result is None:
+        print(f"Could not estimate the clock offset of {args.url}.")
+        return
+    print(f"{args.url}: {result}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+WebDriver command-level latency instrumentation.
+
+StepTracer times whole steps; this records what happens inside them. A
+CommandRecorder instruments each booker's driver (like an event-firing driver, by
+wrapping ``driver.execute``, which element commands go through as well) and records
+every WebDriver command: its name, the locator it concerns, how long it took and
+whether it failed. TracedWait, a drop-in WebDriverWait, records each explicit wait
+as one entry with its condition, timeout and whether it ran out; the commands it
+polls with are tagged as part of the wait.
+
+Commands are attributed to the booker's current StepTracer step (outside any step,
+to the thread, e.g. [heartbeat]). The run's report aggregates them per instance and
+per step and lists the slowest commands.
+"""
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.support.ui import WebDriverWait
+
+# Rows in the slowest-commands table
+TOP_COMMANDS = 10
+
+# WebDriver element references in responses (W3C and legacy keys)
+_ELEMENT_KEYS = ('element-6066-11e4-a52e-4f735466cecf', 'ELEMENT')
+
+
+class CommandRecord:
+    """One WebDriver command, or one explicit wait (``command`` 'wait:<condition>')."""
+
+    __slots__ = ('instance', 'step', 'command', 'locator', 'start', 'duration', 'ok', 'timed_out', 'timeout', 'in_wait')
+
+    def __init__(self, instance, step, command, locator, start, duration, ok=True, timed_out=False, timeout=None, in_wait=False):
+        self.instance = instance
+        self.step = step
+        self.command = command
+        self.locator = locator
+        self.start = start
+        self.duration = duration
+        self.ok = ok
+        self.timed_out = timed_out
+        self.timeout = timeout
+        self.in_wait = in_wait
+
+    @property
+    def is_wait(self):
+        return self.command.startswith('wait:')
+
+
+class _WaitScope:
+    """A TracedWait in progress on one thread; takes the locator of the first lookup it polls."""
+
+    def __init__(self):
+        self.locator = None
+
+
+def _element_id(value):
+    if isinstance(value, dict):
+        for key in _ELEMENT_KEYS:
+            if key in value:
+                return value[key]
+    return None
+
+
+def _condition_name(method):
+    """'element_to_be_clickable' for EC closures, the function name otherwise."""
+    name = getattr(method, '__qualname__', None) or type(method).__name__
+    return name.split('.<locals>')[0]
+
+
+class CommandRecorder:
+    """Thread-safe recorder of the WebDriver commands of every instance in a run."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._locators = {}  # element id -> locator it was found by
+        self.records = []
+
+    def instrument(self, driver, instance):
+        """Record every command ``driver`` sends as belonging to ``instance`` (a TennisBooker)."""
+        execute = driver.execute
+
+        def traced_execute(driver_command, params=None):
+            start = time.perf_counter()
+            try:
+                response = execute(driver_command, params)
+            except TimeoutException:
+                self._record(instance, driver_command, params, start, ok=False, timed_out=True)
+                raise
+            except Exception:
+                self._record(instance, driver_command, params, start, ok=False)
+                raise
+            self._record(instance, driver_command, params, start, response=response)
+            return response
+
+        driver.execute = traced_execute
+        driver.command_recorder = self
+        driver.command_instance = instance
+
+    def _current_step(self):
+        return getattr(self._local, 'step', None) or f"[{threading.current_thread().name}]"
+
+    @contextmanager
+    def step(self, name):
+        """Attribute commands sent from this thread inside the block to step ``name``."""
+        previous = getattr(self._local, 'step', None)
+        self._local.step = name
+        try:
+            yield
+        finally:
+            self._local.step = previous
+
+    def _locator(self, driver_command, params):
+        params = params or {}
+        if 'using' in params and 'value' in params:
+            return f"{params['using']}={params['value']}"
+        if 'script' in params:
+            script = ' '.join(params['script'].split())
+            return f"script: {script[:60]}" + ('...' if len(script) > 60 else '')
+        element = params.get('id') or params.get('elementId')
+        if element is not None:
+            return self._locators.get(element, 'element')
+        if 'url' in params:
+            return params['url']
+        return ''
+
+    def _record(self, instance, driver_command, params, start, response=None, ok=True, timed_out=False):
+        duration = time.perf_counter() - start
+        locator = self._locator(driver_command, params)
+        wait = getattr(self._local, 'wait', None)
+        with self._lock:
+            if response and 'using' in (params or {}):
+                value = response.get('value')
+                for element in value if isinstance(value, list) else [value]:
+                    element_id = _element_id(element)
+                    if element_id:
+                        self._locators[element_id] = locator
+            self.records.append(CommandRecord(
+                instance, self._current_step(), driver_command, locator, start, duration,
+                ok=ok, timed_out=timed_out, in_wait=wait is not None,
+            ))
+        if wait is not None and wait.locator is None and locator:
+            wait.locator = locator
+
+    @contextmanager
+    def wait(self, instance, method, timeout):
+        """Record the enclosed explicit wait as one entry; commands inside it are tagged in_wait."""
+        scope = _WaitScope()
+        outer = getattr(self._local, 'wait', None)
+        self._local.wait = scope
+        start = time.perf_counter()
+        ok = timed_out = False
+        try:
+            yield
+            ok = True
+        except TimeoutException:
+            timed_out = True
+            raise
+        finally:
+            self._local.wait = outer
+            with self._lock:
+                self.records.append(CommandRecord(
+                    instance, self._current_step(), f"wait:{_condition_name(method)}", scope.locator or '',
+                    start, time.perf_counter() - start, ok=ok, timed_out=timed_out, timeout=timeout,
+                    in_wait=outer is not None,
+                ))
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.records)
+
+
+class TracedWait(WebDriverWait):
+    """WebDriverWait that reports to the driver's CommandRecorder, if it has one."""
+
+    def until(self, method, message=""):
+        recorder = getattr(self._driver, 'command_recorder', None)
+        if recorder is None:
+            return super().until(method, message)
+        with recorder.wait(self._driver.command_instance, method, self._timeout):
+            return super().until(method, message)
+
+    def until_not(self, method, message=""):
+        recorder = getattr(self._driver, 'command_recorder', None)
+        if recorder is None:
+            return super().until_not(method, message)
+        with recorder.wait(self._driver.command_instance, method, self._timeout):
+            return super().until_not(method, message)
+
+
+def _instance_label(booker):
+    return f"#{getattr(booker, 'trace_id', None) or id(booker)} {getattr(booker, 'user_email', None) or '?'} {getattr(booker, 'court_info_for_logging', '')}"
+
+
+def render_command_report(records, top=TOP_COMMANDS):
+    """Per-instance and per-step command counts/latency, plus the ``top`` slowest commands and waits."""
+    if not records:
+        return "WebDriver commands: none recorded."
+    commands = [r for r in records if not r.is_wait]
+    waits = [r for r in records if r.is_wait]
+
+    def _totals(rows):
+        own = [r for r in rows if not r.is_wait]
+        row_waits = [r for r in rows if r.is_wait]
+        return (
+            f"{len(own):>6}{sum(r.duration for r in own):>9.2f}s{sum(1 for r in own if not r.ok):>7}"
+            f"{len(row_waits):>7}{sum(1 for r in row_waits if r.timed_out):>9}"
+            f"{sum(r.duration for r in row_waits if r.timed_out):>9.1f}s"
+        )
+
+    header = f"{'CMDS':>6}{'CMD TIME':>10}{'FAILED':>7}{'WAITS':>7}{'TIMEOUTS':>9}{'LOST':>10}"
+    lines = [
+        f"WebDriver commands: {len(commands)} command(s) and {len(waits)} explicit wait(s) over "
+        f"{len({id(r.instance) for r in records})} instance(s). LOST = time spent in waits that ran out.",
+        "",
+        f"{'INSTANCE':<58}{header}",
+    ]
+    by_instance = defaultdict(list)
+    for r in records:
+        by_instance[id(r.instance)].append(r)
+    for rows in by_instance.values():
+        lines.append(f"{_instance_label(rows[0].instance)[:57]:<58}{_totals(rows)}")
+
+    lines += ["", f"{'STEP':<28}{'AVG CMDS/INSTANCE':>18}{header}"]
+    by_step = defaultdict(list)
+    for r in records:
+        by_step[r.step].append(r)
+    for step, rows in sorted(by_step.items(), key=lambda item: item[1][0].start):
+        per_instance = sum(1 for r in rows if not r.is_wait) / len({id(r.instance) for r in rows})
+        lines.append(f"{step[:27]:<28}{per_instance:>18.1f}{_totals(rows)}")
+
+    # Commands polled inside a wait are covered by the wait's own entry
+    slowest = sorted((r for r in records if not r.in_wait), key=lambda r: r.duration, reverse=True)[:top]
+    lines += ["", f"Top {len(slowest)} slowest commands:", f"{'SECONDS':>8}  {'COMMAND':<34}{'STEP':<24}{'INSTANCE':<10}LOCATOR"]
+    for r in slowest:
+        flag = " TIMED OUT" if r.timed_out else ("" if r.ok else " FAILED")
+        timeout = f" (timeout {r.timeout:g}s)" if r.timeout is not None else ""
+        lines.append(
+            f"{r.duration:>8.3f}  {(r.command + flag)[:33]:<34}{r.step[:23]:<24}"
+            f"{'#' + str(getattr(r.instance, 'trace_id', None) or '?'):<10}{r.locator[:70]}{timeout}"
+        )
+    return "\n".join(lines)
+
+
+def log_command_report(recorder):
+    try:
+        logging.info(render_command_report(recorder.snapshot()))
+    except Exception as e:
+        logging.debug(f"WebDriver command report failed: {e}")
@@ -110,4 +110,20 @@ COURT_IDS = {
     4: "d311851d-ce53-49fc-9662-42adcda26109",
     5: "8a5ca8e8-3be0-4145-a4ef-91a69671295b",
     6: "77c7f42c-8891-4818-a610-d5c1027c62fe"
-} 
\ No newline at end of file
+} 
+
+# Permit question answers keyed by element ID, in page order (don't change unless the
+# website changes these questions). Plain strings are typed into the field,
+# ("select", text) entries pick the dropdown option with that visible text.
+PERMIT_QUESTION_ANSWERS = [
+    ("11e79e5d3daf4712b9e6418d2691b976", "Playing tennis"),  # activity
+    ("af8966101be44676b4ee564b052e1e87", "2"),  # number of people
+    ("f28f0dbea8b5438495778b0bb0ddcd93", "No"),  # participants charged
+    ("d46cb434558845fb9e0318ab6832e427", "No"),  # spectators charged
+    ("1221940f5cca4abdb5288cfcbe284820", "None"),  # tables/chairs
+    ("0ce54956c4b14746ae5d364507da1e85", "None"),  # live entertainment
+    ("6b1dda4172f840c7879662bcab1819db", "None"),  # advertised
+    ("a31f4297075e4dab8c0ef154f2b9b1c1", "None"),  # parking needs
+    ("3754dcef7216446b9cc4bf1cd0f12a2e", ("select", "No")),  # previous permit
+    ("06b3f73192a84fd6b88758e56a64c3ad", ("select", "No")),  # on-site security
+]
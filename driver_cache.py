@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Persistent chromedriver resolution cache.
+
+Resolving a chromedriver (browser version probe, ChromeDriverManager install, macOS
+quarantine clearing, optional x64 download) used to happen for every TennisBooker.
+This module does it once per run, records the result in an on-disk index keyed by
+platform and detected browser version, and hands out the cached path afterwards so
+creating an instance does no network or subprocess work.
+
+Prefetch ahead of the morning run with:
+    python driver_cache.py --prefetch
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import plistlib
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import urllib.request
+import zipfile
+from datetime import datetime
+from pathlib import Path
+
+from webdriver_manager.chrome import ChromeDriverManager
+
+logger = logging.getLogger(__name__)
+
+DRIVER_INDEX_FILE = os.path.join(os.path.expanduser("~"), ".wdm", "octogon_driver_index.json")
+
+# Driver variants, in the order launch_chrome_driver falls back through them:
+#   exact  - driver matching the installed browser's full version
+#   latest - webdriver-manager's latest patch (used when the exact match crashes with -9)
+#   x64    - mac-x64 build run under Rosetta (last resort on Apple Silicon)
+DRIVER_VARIANTS = ("exact", "latest", "x64")
+
+_MAC_CHROME_PLIST = "/Applications/Google Chrome.app/Contents/Info.plist"
+_LINUX_CHROME_BINARIES = ("google-chrome", "google-chrome-stable", "chromium", "chromium-browser")
+
+_lock = threading.Lock()
+_browser_version = None
+_browser_version_detected = False
+_resolved = {}  # variant -> driver path, resolved during this run
+
+
+def detect_chrome_version():
+    """Return the installed Chrome full version (e.g. '131.0.6778.85'), or None if unknown."""
+    if sys.platform == "darwin":
+        if not os.path.exists(_MAC_CHROME_PLIST):
+            return None
+        try:
+            with open(_MAC_CHROME_PLIST, 'rb') as f:
+                return plistlib.load(f).get("CFBundleShortVersionString")
+        except Exception as e:
+            logger.debug(f"Could not read Chrome Info.plist: {e}")
+            return None
+
+    if sys.platform.startswith("linux"):
+        for binary in _LINUX_CHROME_BINARIES:
+            path = shutil.which(binary)
+            if not path:
+                continue
+            try:
+                out = subprocess.check_output([path, "--version"], text=True, timeout=10)
+            except Exception as e:
+                logger.debug(f"Could not determine version from {path}: {e}")
+                continue
+            match = re.search(r'(\d+\.\d+\.\d+\.\d+)', out)
+            if match:
+                return match.group(1)
+        return None
+
+    return None
+
+
+def platform_key():
+    return f"{sys.platform}-{platform.machine()}"
+
+
+def _index_key(browser_version):
+    return f"{platform_key()}|{browser_version or 'unknown'}"
+
+
+def _load_index():
+    try:
+        with open(DRIVER_INDEX_FILE, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable driver index {DRIVER_INDEX_FILE}: {e}")
+        return {}
+
+
+def _save_index(index):
+    os.makedirs(os.path.dirname(DRIVER_INDEX_FILE), exist_ok=True)
+    tmp_path = f"{DRIVER_INDEX_FILE}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(index, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, DRIVER_INDEX_FILE)
+
+
+def _clear_quarantine(driver_path):
+    """
+    macOS Gatekeeper quarantines downloaded executables; if the attribute is present
+    the chromedriver process will be killed (exit code -9) as soon as it launches.
+    Clearing the attribute once per download makes every future launch safe.
+    """
+    if sys.platform != "darwin":
+        return
+    for target in (driver_path, os.path.dirname(driver_path)):
+        if os.path.exists(target):
+            try:
+                subprocess.run(["xattr", "-dr", "com.apple.quarantine", target], check=False)
+            except Exception as e:
+                logger.debug(f"Unable to clear quarantine attribute on {target}: {e}")
+
+
+def _install(variant, browser_version):
+    """Download (or locate in the webdriver-manager cache) the driver for one variant."""
+    if variant == "exact":
+        if browser_version:
+            logger.debug(f"Detected Chrome version: {browser_version}. Fetching matching driver…")
+            return ChromeDriverManager(driver_version=browser_version).install()
+        logger.debug("Chrome version could not be detected; falling back to latest driver.")
+        return ChromeDriverManager().install()
+
+    if variant == "latest":
+        return ChromeDriverManager().install()
+
+    if variant == "x64":
+        if not browser_version:
+            raise RuntimeError("Cannot fetch x64 chromedriver without a detected Chrome version")
+        cache_dir = Path(os.path.dirname(DRIVER_INDEX_FILE)) / f"chromedriver_x64_{browser_version}"
+        existing = next(cache_dir.glob("**/chromedriver"), None) if cache_dir.exists() else None
+        if existing:
+            return str(existing)
+        tmp_dir = Path(tempfile.mkdtemp(prefix="chromedriver_x64_"))
+        zip_path = tmp_dir / "driver.zip"
+        url = (
+            f"https://storage.googleapis.com/chrome-for-testing-public/"
+            f"{browser_version}/mac-x64/chromedriver-mac-x64.zip"
+        )
+        urllib.request.urlretrieve(url, zip_path)
+        with zipfile.ZipFile(zip_path) as zf:
+            zf.extractall(tmp_dir)
+        zip_path.unlink()
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        shutil.move(str(tmp_dir), str(cache_dir))
+        driver_path = str(next(cache_dir.glob("**/chromedriver")))
+        # Ensure executable permissions
+        os.chmod(driver_path, 0o755)
+        return driver_path
+
+    raise ValueError(f"Unknown driver variant: {variant}")
+
+
+def browser_version():
+    """Detect the browser version once per run."""
+    global _browser_version, _browser_version_detected
+    with _lock:
+        if not _browser_version_detected:
+            _browser_version = detect_chrome_version()
+            _browser_version_detected = True
+        return _browser_version
+
+
+def resolve_driver_path(variant="exact"):
+    """
+    Return a chromedriver path for ``variant``, resolving it at most once per run.
+
+    The on-disk index is consulted first; only a cache miss (new browser version, new
+    machine, deleted driver) falls through to ChromeDriverManager or a download. When
+    the browser version can't be detected the index is bypassed: an entry for an unknown
+    version could not tell when the browser has been updated past it.
+    """
+    if variant not in DRIVER_VARIANTS:
+        raise ValueError(f"Unknown driver variant: {variant}")
+
+    version = browser_version()
+    with _lock:
+        if variant in _resolved:
+            return _resolved[variant]
+
+        index = _load_index()
+        key = _index_key(version)
+        entry = index.get(key, {}).get(variant) if version else None
+        if entry and os.path.exists(entry['driver_path']):
+            logger.debug(f"Driver index hit for {key} ({variant}): {entry['driver_path']}")
+            _resolved[variant] = entry['driver_path']
+            return entry['driver_path']
+
+        logger.info(f"Driver index miss for {key} ({variant}); resolving chromedriver…")
+        driver_path = _install(variant, version)
+        _clear_quarantine(driver_path)
+        _resolved[variant] = driver_path
+        if not version:
+            return driver_path
+
+        index.setdefault(key, {})[variant] = {
+            'driver_path': driver_path,
+            'browser_version': version,
+            'platform': platform_key(),
+            'resolved_at': datetime.now().isoformat(timespec='seconds'),
+        }
+        try:
+            _save_index(index)
+        except Exception as e:
+            logger.warning(f"Could not write driver index {DRIVER_INDEX_FILE}: {e}")
+        return driver_path
+
+
+def main():
+    """Prefetch drivers into the index ahead of the time-critical run."""
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Resolve and cache chromedriver ahead of the booking run')
+    parser.add_argument('--prefetch', action='store_true', help='Resolve the exact-match driver into the index')
+    parser.add_argument('--all-variants', action='store_true',
+                        help='Also resolve the fallback drivers (latest patch, and mac-x64 on macOS)')
+    parser.add_argument('--show', action='store_true', help='Print the current driver index')
+    args = parser.parse_args()
+
+    if args.prefetch or args.all_variants:
+        variants = ["exact"]
+        if args.all_variants:
+            variants.append("latest")
+            if sys.platform == "darwin":
+                variants.append("x64")
+        print(f"Platform: {platform_key()}, Chrome version: {browser_version() or 'unknown'}")
+        for variant in variants:
+            try:
+                print(f"  {variant:>6}: {resolve_driver_path(variant)}")
+            except Exception as e:
+                print(f"  {variant:>6}: FAILED ({e})")
+                if variant == "exact":
+                    sys.exit(1)
+
+    if args.show or not (args.prefetch or args.all_variants):
+        print(json.dumps(_load_index(), indent=2, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Concurrent keep-alive heartbeat for prepared instances.
+
+Every round pings all prepared instances in the InstanceRegistry at once (one
+keep_alive() call per instance on a thread pool), records each round trip in a
+per-instance latency history and counts consecutive failures. An instance that
+misses FAILURES_TO_DEAD heartbeats in a row (an error, False, or no answer within
+the timeout) is marked dead in the registry, its browser is closed and the
+``on_dead`` callback gets the record so the slot can be prepared again.
+
+The loop keeps running through the waiting phase until a blackout instant before the
+target (so no ping competes with submission), tightening its interval after a round
+with misses and shortening the last wait so the final round lands just before the
+blackout. preflight() then runs one last concurrent health sweep that reports which
+instances are still submittable.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from instance_registry import PREPARED, DEAD
+
+# Consecutive missed heartbeats before an instance is declared dead
+FAILURES_TO_DEAD = 2
+# Latency samples kept per instance
+HISTORY_LENGTH = 50
+# Longest the loop sleeps before re-reading its schedule (the blackout may be moved while it runs)
+SCHEDULE_POLL_SECONDS = 1.0
+# The final round is aimed this far ahead of its latest safe start, to absorb wake-up jitter
+FINAL_ROUND_LEAD_SECONDS = 0.25
+
+
+class HeartbeatMonitor:
+    """Pings prepared instances concurrently and retires the ones that stop answering."""
+
+    def __init__(self, registry, interval=20, timeout=10, failures_to_dead=FAILURES_TO_DEAD, on_dead=None, max_workers=16):
+        self.registry = registry
+        self.interval = interval
+        self.timeout = timeout
+        self.failures_to_dead = failures_to_dead
+        self.on_dead = on_dead
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="heartbeat")
+        self._lock = threading.Lock()
+        self.histories = {}  # record id -> deque of (timestamp, latency seconds or None, ok)
+        self.consecutive_failures = {}  # record id -> count
+        self._inflight = {}  # record id -> last ping future
+        self._last_round_clean = True
+        self.until = None  # epoch start of the blackout; read by run() on every pass, see set_until()
+
+    @staticmethod
+    def _timed_ping(booker):
+        start = time.perf_counter()
+        ok = booker.keep_alive()
+        return bool(ok), time.perf_counter() - start
+
+    def ping_round(self):
+        """Ping every prepared instance once. Returns (responded, pinged)."""
+        records = self.registry.in_state(PREPARED)
+        if not records:
+            return 0, 0
+        started = time.time()
+        futures = {}
+        for r in records:
+            # A ping still hanging from the last round is waited on again rather than stacked
+            pending = self._inflight.get(r.id)
+            futures[pending if pending and not pending.done() else self._executor.submit(self._timed_ping, r.booker)] = r
+        self._inflight = {r.id: f for f, r in futures.items()}
+        done, _ = wait(futures, timeout=self.timeout)
+
+        responded = 0
+        latencies = []
+        for future, record in futures.items():
+            ok, latency = False, None
+            if future in done:
+                try:
+                    ok, latency = future.result()
+                except Exception as e:
+                    logging.warning(f"HEARTBEAT: ping raised for {record.booker.court_info_for_logging}: {e}")
+            else:
+                logging.warning(f"HEARTBEAT: no answer from {record.booker.court_info_for_logging} within {self.timeout}s")
+            with self._lock:
+                self.histories.setdefault(record.id, deque(maxlen=HISTORY_LENGTH)).append((started, latency, ok))
+                failures = 0 if ok else self.consecutive_failures.get(record.id, 0) + 1
+                self.consecutive_failures[record.id] = failures
+            if ok:
+                responded += 1
+                latencies.append(latency)
+            elif failures >= self.failures_to_dead:
+                self._mark_dead(record, failures)
+
+        self._last_round_clean = responded == len(records)
+        if latencies:
+            latencies.sort()
+            logging.info(
+                f"HEARTBEAT: {responded}/{len(records)} instances responded "
+                f"(p50 {latencies[len(latencies)//2]*1000:.0f}ms, max {latencies[-1]*1000:.0f}ms)."
+            )
+        else:
+            logging.info(f"HEARTBEAT: 0/{len(records)} instances responded.")
+        return responded, len(records)
+
+    def _mark_dead(self, record, failures=None, reason=None):
+        reason = reason or f"missed {failures} heartbeats in a row"
+        try:
+            self.registry.transition(record, DEAD, reason=reason)
+        except ValueError:
+            return  # moved on (e.g. started submitting) since the snapshot
+        logging.warning(f"HEARTBEAT: {record.booker.court_info_for_logging} ({record.account}) {reason}; marking it dead.")
+        try:
+            record.booker.close()
+        except Exception as e:
+            logging.debug(f"Error closing dead instance {record.id}: {e}")
+        if self.on_dead:
+            try:
+                self.on_dead(record)
+            except Exception as e:
+                logging.error(f"HEARTBEAT: replacement handler failed for instance {record.id}: {e}")
+
+    def set_until(self, until):
+        """Move the start of the blackout (epoch seconds), e.g. after the target is shifted by a clock sync."""
+        self.until = until
+
+    def run(self, stop_event, until=None):
+        """
+        Heartbeat loop until ``stop_event`` is set or the epoch time ``until`` (start of the
+        blackout, movable with set_until()) is reached. Rounds come every ``interval`` seconds,
+        twice as often after a round with misses. A round is only started if it can run its
+        full ``timeout`` before ``until``, so no round (or the closing of a dead instance)
+        spills into the blackout. When the next round would come too late, the wait is
+        shortened and one final round runs at the last safe start instead.
+        """
+        if until is not None:
+            self.until = until
+        next_round = time.time() + self.interval
+        while True:
+            now = time.time()
+            last_start = self.until - self.timeout if self.until is not None else None
+            final = last_start is not None and next_round >= last_start - FINAL_ROUND_LEAD_SECONDS
+            due = last_start - FINAL_ROUND_LEAD_SECONDS if final else next_round
+            if now < due:
+                if stop_event.wait(min(due - now, SCHEDULE_POLL_SECONDS)):
+                    return
+                continue
+            if final and now > last_start:
+                break  # too late for a full round (e.g. the blackout was moved earlier)
+            try:
+                self.ping_round()
+            except Exception as e:
+                logging.error(f"HEARTBEAT: round failed: {e}")
+            if final:
+                break
+            next_round = time.time() + (self.interval if self._last_round_clean else self.interval / 2)
+        logging.info("HEARTBEAT: entering blackout before the target; keep-alives paused.")
+
+    def preflight(self, timeout=None):
+        """
+        Final concurrent health sweep over the prepared instances (booker.preflight_check()).
+        Failing instances are marked dead. Returns (submittable, failed) record lists.
+        """
+        timeout = timeout or self.timeout
+        records = self.registry.in_state(PREPARED)
+
+        def _check(booker):
+            start = time.perf_counter()
+            ok, detail = booker.preflight_check()
+            return ok, detail, time.perf_counter() - start
+
+        futures = {self._executor.submit(_check, r.booker): r for r in records}
+        done, _ = wait(futures, timeout=timeout)
+        submittable, failed = [], []
+        lines = [f"PRE-FLIGHT: {len(records)} prepared instance(s) checked"]
+        for future, record in futures.items():
+            ok, detail, latency = False, f"no answer within {timeout}s", None
+            if future in done:
+                try:
+                    ok, detail, latency = future.result()
+                except Exception as e:
+                    detail = f"check raised {type(e).__name__}: {e}"
+            timing = f" ({latency*1000:.0f}ms)" if latency is not None else ""
+            lines.append(f"  {'OK  ' if ok else 'FAIL'} #{record.id} {record.account} {record.booker.court_info_for_logging}: {detail}{timing}")
+            (submittable if ok else failed).append(record)
+        lines.append(f"PRE-FLIGHT: {len(submittable)}/{len(records)} instances submittable")
+        logging.info("\n".join(lines))
+        for record in failed:
+            self._mark_dead(record, reason="failed pre-flight check")
+        return submittable, failed
+
+    def latency_stats(self, record):
+        """(samples, mean ms, max ms, last ms) over the successful pings of ``record``, or None."""
+        with self._lock:
+            values = [lat for _, lat, ok in self.histories.get(record.id, ()) if ok]
+        if not values:
+            return None
+        return len(values), sum(values) / len(values) * 1000, max(values) * 1000, values[-1] * 1000
+
+    def report(self):
+        lines = ["Heartbeat latency per instance:"]
+        with self._lock:
+            ids = list(self.histories)
+        by_id = {r.id: r for r in self.registry.records()}
+        for record_id in ids:
+            record = by_id.get(record_id)
+            if record is None:
+                continue
+            stats = self.latency_stats(record)
+            misses = sum(1 for _, _, ok in self.histories[record_id] if not ok)
+            label = f"#{record.id} {record.account} {record.booker.court_info_for_logging}"
+            if stats:
+                n, mean, longest, last = stats
+                lines.append(f"  {label}: {n} ok, {misses} missed, mean {mean:.0f}ms, max {longest:.0f}ms, last {last:.0f}ms [{record.state}]")
+            else:
+                lines.append(f"  {label}: {misses} missed, no successful ping [{record.state}]")
+        return "\n".join(lines)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
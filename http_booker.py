@@ -0,0 +1,517 @@
+"""
+Browserless booking client for rioc.civicpermits.com.
+
+HttpTennisBooker implements the same interface as TennisBooker (login,
+start_new_permit_form, select_court, set_date_and_time, _fill_permit_questions,
+prepare_booking, submit_prepared_booking, verify_submission, keep_alive, close) but
+drives the site with plain HTTP requests and an HTML form model instead of Chrome.
+Each instance holds its own pooled requests.Session, so the per-account cost is a
+cookie jar and a keep-alive connection rather than a browser process.
+
+Select it in auto_super_tennis_booker.main() with BOOKER_BACKEND = "http". Try it
+locally against stand_in_permit_server.py:
+    python stand_in_permit_server.py --port 8765
+    HttpTennisBooker(base_url="http://127.0.0.1:8765")
+"""
+import logging
+import time
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import COURT_IDS, PERMIT_QUESTION_ANSWERS
+from http_submitter import HttpSubmitter
+from session_cache import cookies_from_requests
+
+PERMIT_SITE_URL = "https://rioc.civicpermits.com"
+
+# Browsers send this; some ASP.NET sites serve a reduced page to unknown agents
+DEFAULT_USER_AGENT = (
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36"
+)
+
+
+class CourtUnavailableError(Exception):
+    """Raised when the facility for a court cannot be found on the permit form."""
+    pass
+
+
+class HtmlForm:
+    """Minimal model of an HTML form that serialises the way a browser would post it."""
+
+    def __init__(self, attrs, page_url):
+        self.id = attrs.get('id')
+        self.action = urljoin(page_url, attrs.get('action') or page_url)
+        self.method = (attrs.get('method') or 'get').upper()
+        self.fields = []
+
+    def find(self, element_id):
+        return next((f for f in self.fields if f.get('id') == element_id), None)
+
+    def find_by_name(self, name):
+        return next((f for f in self.fields if f.get('name') == name), None)
+
+    def _require(self, element_id=None, name=None):
+        field = self.find(element_id) if element_id else self.find_by_name(name)
+        if field is None:
+            raise LookupError(f"Form field not found: {element_id or name}")
+        return field
+
+    def set_value(self, value, element_id=None, name=None):
+        self._require(element_id, name)['value'] = value
+
+    def select_by_value(self, value, element_id=None, name=None):
+        field = self._require(element_id, name)
+        if not any(opt['value'] == value for opt in field['options']):
+            raise LookupError(f"Option value {value!r} not found in {element_id or name}")
+        field['value'] = value
+
+    def select_by_visible_text(self, text, element_id=None, name=None):
+        field = self._require(element_id, name)
+        for opt in field['options']:
+            if opt['text'].strip() == text:
+                field['value'] = opt['value']
+                return
+        raise LookupError(f"Option {text!r} not found in {element_id or name}")
+
+    def check(self, element_id):
+        self._require(element_id)['checked'] = True
+
+    def buttons(self):
+        return [f for f in self.fields if f['tag'] == 'button' or f.get('type') in ('submit', 'image')]
+
+    def serialize(self, submitter=None):
+        """Return (name, value) pairs for a submission, optionally triggered by ``submitter``."""
+        pairs = []
+        for field in self.fields:
+            name = field.get('name')
+            if not name or field.get('disabled'):
+                continue
+            ftype = field.get('type')
+            if field['tag'] == 'button' or ftype in ('submit', 'image', 'reset', 'button'):
+                if field is submitter:
+                    pairs.append((name, field.get('value', '')))
+                continue
+            if ftype in ('checkbox', 'radio'):
+                if field.get('checked'):
+                    pairs.append((name, field.get('value') or 'on'))
+                continue
+            if field['tag'] == 'select':
+                value = field.get('value')
+                if value is None and field['options']:
+                    value = field['options'][0]['value']
+                if value is not None:
+                    pairs.append((name, value))
+                continue
+            pairs.append((name, field.get('value', '')))
+        return pairs
+
+
+class PageParser(HTMLParser):
+    """Collects forms, their fields and anchors from an HTML page."""
+
+    def __init__(self, page_url):
+        super().__init__(convert_charrefs=True)
+        self.page_url = page_url
+        self.forms = []
+        self.links = []  # (href, classes)
+        self.orphans = []  # fields outside any <form>
+        self._form = None
+        self._option = None
+        self._select = None
+        self._textarea = None
+        self._button = None
+        self._div_classes = []
+
+    def _add_field(self, field):
+        field['in_control_area'] = any('controlArea' in c for c in self._div_classes)
+        (self._form.fields if self._form is not None else self.orphans).append(field)
+
+    def handle_starttag(self, tag, attrs):
+        a = dict(attrs)
+        if tag == 'div':
+            self._div_classes.append((a.get('class') or '').split())
+        elif tag == 'form':
+            self._form = HtmlForm(a, self.page_url)
+            self.forms.append(self._form)
+        elif tag == 'a':
+            self.links.append((a.get('href'), (a.get('class') or '').split()))
+        elif tag == 'input':
+            self._add_field({
+                'tag': 'input',
+                'type': (a.get('type') or 'text').lower(),
+                'id': a.get('id'),
+                'name': a.get('name'),
+                'value': a.get('value', ''),
+                'checked': 'checked' in a,
+                'disabled': 'disabled' in a,
+            })
+        elif tag == 'select':
+            self._select = {'tag': 'select', 'id': a.get('id'), 'name': a.get('name'),
+                            'value': None, 'options': [], 'disabled': 'disabled' in a}
+            self._add_field(self._select)
+        elif tag == 'option' and self._select is not None:
+            self._option = {'value': a.get('value'), 'text': '', 'selected': 'selected' in a}
+            self._select['options'].append(self._option)
+        elif tag == 'textarea':
+            self._textarea = {'tag': 'textarea', 'id': a.get('id'), 'name': a.get('name'),
+                              'value': '', 'disabled': 'disabled' in a}
+            self._add_field(self._textarea)
+        elif tag == 'button':
+            self._button = {
+                'tag': 'button',
+                'type': (a.get('type') or 'submit').lower(),
+                'id': a.get('id'),
+                'name': a.get('name'),
+                'value': a.get('value', ''),
+                'text': '',
+                'formaction': a.get('formaction'),
+                'data_url': a.get('data-url'),
+                'disabled': 'disabled' in a,
+            }
+            self._add_field(self._button)
+
+    def handle_endtag(self, tag):
+        if tag == 'div' and self._div_classes:
+            self._div_classes.pop()
+        elif tag == 'form':
+            self._form = None
+        elif tag == 'option' and self._option is not None:
+            if self._option['value'] is None:
+                self._option['value'] = self._option['text'].strip()
+            if self._option['selected']:
+                self._select['value'] = self._option['value']
+            self._option = None
+        elif tag == 'select':
+            self._select = None
+        elif tag == 'textarea':
+            self._textarea = None
+        elif tag == 'button':
+            self._button = None
+
+    def handle_data(self, data):
+        if self._option is not None:
+            self._option['text'] += data
+        elif self._textarea is not None:
+            self._textarea['value'] += data
+        elif self._button is not None:
+            self._button['text'] += data
+
+
+def parse_page(html, page_url):
+    parser = PageParser(page_url)
+    parser.feed(html)
+    parser.close()
+    return parser
+
+
+class HttpTennisBooker:
+    def __init__(self, base_url=PERMIT_SITE_URL, timeout=15, session_cache=None):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.session_cache = session_cache  # optional SessionCache for skipping the login form
+        self.court_info_for_logging = "Unknown"
+        self.user_email: str | None = None
+        # Same attribute names as TennisBooker so the submit/verify code paths stay shared
+        self.http_submitter = None
+        self.submit_mode = "http"
+
+        # Pooled keep-alive connections for this account's session
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({'User-Agent': DEFAULT_USER_AGENT})
+
+        self.current_url = None
+        self._page = None
+        self._form = None
+        self.questions_form = None
+
+    @property
+    def driver(self):
+        """Truthy while the session is open; mirrors TennisBooker.driver for liveness checks."""
+        return self.session
+
+    def _url(self, path):
+        return urljoin(self.base_url + '/', path.lstrip('/'))
+
+    def _load(self, response):
+        response.raise_for_status()
+        self.current_url = response.url
+        self._page = parse_page(response.text, response.url)
+        return self._page
+
+    def _get(self, path):
+        return self._load(self.session.get(self._url(path), timeout=self.timeout))
+
+    def _post_form(self, form, submitter=None):
+        action = urljoin(form.action, submitter['formaction']) if submitter and submitter.get('formaction') else form.action
+        data = form.serialize(submitter)
+        if form.method == 'GET':
+            response = self.session.get(action, params=data, timeout=self.timeout, headers={'Referer': self.current_url})
+        else:
+            response = self.session.post(action, data=data, timeout=self.timeout, headers={'Referer': self.current_url})
+        return self._load(response)
+
+    def _form_with(self, element_id):
+        form = next((f for f in self._page.forms if f.find(element_id)), None)
+        if form is None:
+            raise LookupError(f"No form containing #{element_id} on {self.current_url}")
+        return form
+
+    def _on_dashboard(self):
+        return any(href == '/Permits/New' and 'button' in classes for href, classes in self._page.links)
+
+    def _restore_cached_session(self, account, email):
+        """Load cached cookies for ``account`` and probe the dashboard. Returns True if still logged in."""
+        cookies = self.session_cache.load(account)
+        if not cookies:
+            return False
+        for c in cookies:
+            self.session.cookies.set(c['name'], c['value'], domain=c.get('domain'), path=c.get('path', '/'))
+        try:
+            self._get("/")
+        except requests.RequestException as e:
+            logging.debug(f"[{email}] Session probe failed: {e}")
+            self._page = None
+        if self._page is not None and self._on_dashboard():
+            self.user_email = email
+            logging.info(f"Successfully logged in as {email} (cached session)")
+            return True
+        logging.debug(f"[{email}] Cached session rejected; logging in again.")
+        self.session_cache.invalidate(account)
+        self.session.cookies.clear()
+        return False
+
+    def login(self, email, password, account=None, reuse_session=True):
+        """Log in with the site's login form. Returns True once the dashboard is reached.
+
+        With a session cache and an ``account`` (USERS key), a still-valid cached session
+        is reused and the login form is skipped (unless ``reuse_session`` is False).
+        """
+        try:
+            if self.session_cache and account and reuse_session and self._restore_cached_session(account, email):
+                return True
+
+            logging.debug(f"[{email}] Loading login page (HTTP backend)")
+            self._get("/")
+            form = next((f for f in self._page.forms if f.id == 'login'), None) or self._form_with("loginEmail")
+            form.set_value(email, element_id="loginEmail")
+            form.set_value(password, element_id="loginPassword")
+            buttons = form.buttons()
+            self._post_form(form, buttons[0] if buttons else None)
+            if self._on_dashboard():
+                self.user_email = email
+                logging.info(f"Successfully logged in as {email}")
+                if self.session_cache and account:
+                    try:
+                        self.session_cache.save(account, cookies_from_requests(self.session.cookies))
+                    except Exception as cache_err:
+                        logging.warning(f"Could not cache login session for {account}: {cache_err}")
+                return True
+            logging.error(f"Login failed for {email}: Did not reach dashboard after login POST.")
+            return False
+        except Exception as e:
+            logging.error(f"Login failed for {email}: {str(e)}")
+            return False
+
+    def start_new_permit_form(self):
+        """Load a new permit form."""
+        logging.debug("Loading new permit form (HTTP backend)")
+        self._get("/Permits/New")
+        self._form = self._form_with("activity")
+        self._form.set_value("Tennis Match", element_id="activity")
+
+    def select_court(self, court_number):
+        """Select the site and tick the facility checkbox for a court."""
+        logging.debug(f"Selecting court {court_number}")
+        if court_number in (1, 4, 5, 6):
+            court_name = f"Octagon Tennis Court {court_number}"
+        elif court_number in (2, 3):
+            court_name = f"Octagon Tennis court {court_number}"
+        else:
+            raise ValueError(f"Unknown court number: {court_number}")
+
+        self._form.select_by_visible_text(court_name, element_id="site")
+        checkbox_id = COURT_IDS[court_number]
+        if self._form.find(checkbox_id) is None:
+            # Facilities may be rendered by "Add Facility" from a fragment URL instead of inline
+            add_button = next((f for f in self._form.fields + self._page.orphans if f.get('id') == 'addFacilitySet'), None)
+            fragment_url = add_button and (add_button.get('data_url') or add_button.get('formaction'))
+            if fragment_url:
+                site_field = self._form.find("site")
+                response = self.session.get(
+                    urljoin(self.current_url, fragment_url),
+                    params={site_field['name']: site_field['value']} if site_field.get('name') else None,
+                    timeout=self.timeout,
+                )
+                response.raise_for_status()
+                self._form.fields.extend(parse_page(response.text, response.url).orphans)
+        if self._form.find(checkbox_id) is None:
+            raise CourtUnavailableError(f"Court {court_number} is not available or element ID changed")
+        self._form.check(checkbox_id)
+
+    def set_date_and_time(self, booking_date, start_time):
+        """Set the date and start/end hour fields."""
+        formatted_date = booking_date.strftime('%m/%d/%Y')
+        start_hour = int(start_time.split(':')[0])
+        end_hour = start_hour + 1
+        logging.info(f"Setting time to {start_hour}:00-{end_hour}:00")
+        self._form.set_value(formatted_date, element_id="event0")
+        self._form.select_by_value(str(start_hour), name="startHour")
+        self._form.select_by_value(str(end_hour), name="endHour")
+
+    def _continue_to_questions(self):
+        continue_button = next((f for f in self._form.buttons() if f.get('in_control_area')), None)
+        self._post_form(self._form, continue_button)
+        self.questions_form = self._form_with(PERMIT_QUESTION_ANSWERS[0][0])
+
+    def _fill_permit_questions(self):
+        """Fill out the permit questions section."""
+        logging.debug("Filling permit questions (HTTP backend)")
+        form = self.questions_form
+        for element_id, answer in PERMIT_QUESTION_ANSWERS:
+            if isinstance(answer, tuple):
+                form.select_by_visible_text(answer[1], element_id=element_id)
+            else:
+                form.set_value(answer, element_id=element_id)
+        form.check("acceptTerms")
+
+    def _submit_button(self):
+        """The button immediately preceding #cancelNewPermitRequest, as in the browser XPath."""
+        buttons = [f for f in self.questions_form.fields if f['tag'] == 'button']
+        for prev, button in zip(buttons, buttons[1:]):
+            if button.get('id') == 'cancelNewPermitRequest':
+                return prev
+        raise LookupError("Submit button preceding #cancelNewPermitRequest not found")
+
+    def prepare_booking(self, court_number, booking_date, start_time, retries=0, deadline=None):
+        """
+        Prepare the booking up to the final submission POST. The form lives client-side, so a
+        failed attempt is retried from a fresh form in the same session (up to ``retries`` times,
+        while ``deadline`` allows).
+        """
+        for attempt in range(retries + 1):
+            if attempt:
+                if deadline is not None and time.time() >= deadline:
+                    break
+                logging.warning(f"Retrying preparation of {self.court_info_for_logging} in the same session (retry {attempt}/{retries}).")
+            result = self._prepare_once(court_number, booking_date, start_time)
+            if result is not None:
+                return result
+        return False
+
+    def _prepare_once(self, court_number, booking_date, start_time):
+        """True when prepared, False if the court is unavailable, None for a failure worth retrying."""
+        self.court_info_for_logging = f"Court {court_number} on {booking_date.strftime('%m/%d/%Y')} at {start_time}"
+        try:
+            self.start_new_permit_form()
+            self.select_court(court_number)
+            self.set_date_and_time(booking_date, start_time)
+            logging.info(f"Continuing to permit questions page for {self.court_info_for_logging}")
+            self._continue_to_questions()
+            self._fill_permit_questions()
+
+            submitter = self._submit_button()
+            action = urljoin(self.questions_form.action, submitter['formaction']) if submitter.get('formaction') else self.questions_form.action
+            self.http_submitter = HttpSubmitter(
+                action=action,
+                method=self.questions_form.method,
+                fields=self.questions_form.serialize(submitter),
+                cookies=[],
+                user_agent=self.session.headers['User-Agent'],
+                page_url=self.current_url,
+                timeout=self.timeout,
+                session=self.session,
+            )
+            logging.info(f"Booking preparation complete for {self.court_info_for_logging}. Ready for timed submission.")
+            return True
+        except CourtUnavailableError as e:
+            logging.warning(f"Preparation failed for {self.court_info_for_logging}: {str(e)}")
+            return False
+        except Exception as e:
+            logging.error(f"Failed to prepare booking for {self.court_info_for_logging}: {str(e)}")
+            logging.debug(f"Current URL during preparation error: {self.current_url}")
+            return None
+
+    def warm_http_submission(self):
+        if self.http_submitter:
+            return self.http_submitter.preconnect()
+        return False
+
+    def preflight_check(self):
+        """Pre-submit check: prepared, and the session still answers. Returns (ok, detail)."""
+        if not self.http_submitter:
+            return False, "not prepared"
+        if self.keep_alive():
+            return True, "session answered"
+        return False, "keep-alive failed"
+
+    def locate_submit_button(self):
+        # Nothing to locate: the submit POST was captured during prepare_booking
+        return False
+
+    def keep_alive(self):
+        """Touch the prepared form URL so the server session stays warm."""
+        if not self.session:
+            return False
+        try:
+            self.session.head(self.current_url or self._url("/"), timeout=self.timeout, allow_redirects=False)
+            logging.debug(f"Keep-alive ping successful for {self.court_info_for_logging}")
+            return True
+        except requests.RequestException as e:
+            logging.warning(f"Keep-alive ping FAILED for {self.court_info_for_logging}: {e}")
+            return False
+
+    def submit_prepared_booking(self, on_click=None):
+        """Fire the prepared permit POST. No result checking.
+
+        ``on_click`` is called right before the POST is sent.
+        """
+        if not self.http_submitter:
+            logging.warning(f"Attempted to submit {self.court_info_for_logging}, but it was never prepared.")
+            return
+        self.pre_submit_url = self.http_submitter.page_url
+        try:
+            if on_click:
+                on_click()
+            response = self.http_submitter.submit()
+            logging.info(
+                f"Submit POST sent via HTTP for {self.court_info_for_logging}: status {response.status_code} "
+                f"in {self.http_submitter.elapsed_seconds*1000:.0f}ms. No result check performed."
+            )
+        except Exception as e:
+            logging.error(f"Error sending HTTP submit for {self.court_info_for_logging}: {str(e)}")
+
+    def verify_submission(self):
+        """Compare the POST's final URL against the questions page URL."""
+        final_url = self.http_submitter.final_url if self.http_submitter else None
+        pre_url = getattr(self, 'pre_submit_url', None)
+        if final_url is None or pre_url is None:
+            logging.warning(f"No HTTP submit response recorded for {self.court_info_for_logging}")
+            return None
+        url_changed = final_url != pre_url
+        if url_changed:
+            logging.info(f"✅ URL CHANGED for {self.court_info_for_logging}: {pre_url} → {final_url}")
+        else:
+            logging.warning(f"❌ URL UNCHANGED for {self.court_info_for_logging}: Still at {final_url}")
+        return url_changed
+
+    def save_screenshot_on_error(self):
+        """No browser to screenshot in the HTTP backend."""
+        pass
+
+    def abort(self):
+        """Watchdog hook: requests calls are bounded by their timeouts, so closing the session is enough."""
+        self.close()
+
+    def close(self):
+        """Close the HTTP session."""
+        if self.session:
+            logging.debug(f"Closing HTTP session ({self.court_info_for_logging}).")
+            self.session.close()
+            self.session = None
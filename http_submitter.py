@@ -0,0 +1,126 @@
+"""
+HTTP-level submission of a prepared permit form.
+
+When a booking has been prepared in the browser, the permit form fields and the
+session cookies are captured from the WebDriver. At the target time the permit POST
+is fired directly from a pre-connected requests.Session instead of going through a
+WebDriver wait + JS click + browser form submission.
+"""
+import logging
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Same locator the browser submit path uses for the final "Submit" button
+SUBMIT_BUTTON_XPATH = "//button[@id='cancelNewPermitRequest']/preceding-sibling::button"
+
+# Serialises the form owning the submit button exactly as the browser would post it,
+# including the submit button's own name/value pair when it has one.
+_CAPTURE_FORM_JS = """
+var button = document.evaluate(arguments[0], document, null,
+    XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+if (!button) { return {error: 'submit button not found'}; }
+var form = button.form || button.closest('form');
+if (!form) { return {error: 'submit button is not inside a form'}; }
+var fields = [];
+new FormData(form).forEach(function(value, name) {
+    if (typeof value === 'string') { fields.push([name, value]); }
+});
+if (button.name) { fields.push([button.name, button.value || '']); }
+return {
+    action: button.getAttribute('formaction') ? button.formAction : form.action,
+    method: (button.getAttribute('formmethod') || form.method || 'post').toUpperCase(),
+    fields: fields,
+    user_agent: navigator.userAgent,
+    page_url: window.location.href
+};
+"""
+
+
+class HttpSubmitter:
+    def __init__(self, action, method, fields, cookies, user_agent, page_url, timeout=15, session=None):
+        self.action = action
+        self.method = method
+        self.fields = fields
+        self.page_url = page_url
+        self.timeout = timeout
+
+        parts = urlsplit(action)
+        self.origin = f"{parts.scheme}://{parts.netloc}"
+
+        if session is not None:
+            # Browserless bookers already hold a logged-in pooled session
+            self.session = session
+        else:
+            # One connection per instance: the pool only has to hold the connection we pre-open
+            self.session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1, max_retries=0)
+            self.session.mount("https://", adapter)
+            self.session.mount("http://", adapter)
+        self.session.headers.update({
+            'User-Agent': user_agent,
+            'Origin': self.origin,
+            'Referer': page_url,
+        })
+        for cookie in cookies:
+            self.session.cookies.set(
+                cookie['name'],
+                cookie['value'],
+                domain=cookie.get('domain'),
+                path=cookie.get('path', '/'),
+            )
+
+        self.response = None
+        self.sent_at = None
+        self.elapsed_seconds = None
+
+    @classmethod
+    def capture(cls, driver):
+        """Capture form fields, cookies and headers from a prepared WebDriver page."""
+        form = driver.execute_script(_CAPTURE_FORM_JS, SUBMIT_BUTTON_XPATH)
+        if not form or form.get('error'):
+            raise RuntimeError(f"Could not capture permit form: {form.get('error') if form else 'no result'}")
+        return cls(
+            action=form['action'],
+            method=form['method'],
+            fields=[tuple(pair) for pair in form['fields']],
+            cookies=driver.get_cookies(),
+            user_agent=form['user_agent'],
+            page_url=form['page_url'],
+        )
+
+    def preconnect(self):
+        """Open (or refresh) the pooled keep-alive connection so the submit skips DNS/TCP/TLS."""
+        start = time.perf_counter()
+        try:
+            self.session.head(self.origin + "/", timeout=self.timeout, allow_redirects=False)
+            logging.debug(f"HTTP submit connection to {self.origin} warmed in {(time.perf_counter() - start)*1000:.0f}ms")
+            return True
+        except requests.RequestException as e:
+            logging.warning(f"Could not pre-connect HTTP submit session to {self.origin}: {e}")
+            return False
+
+    def submit(self):
+        """Fire the permit POST. Returns the final response (after redirects)."""
+        self.sent_at = time.time()
+        start = time.perf_counter()
+        try:
+            self.response = self.session.request(
+                self.method,
+                self.action,
+                data=self.fields,
+                timeout=self.timeout,
+                allow_redirects=True,
+            )
+        finally:
+            self.elapsed_seconds = time.perf_counter() - start
+        return self.response
+
+    @property
+    def final_url(self):
+        return self.response.url if self.response is not None else None
+
+    def close(self):
+        self.session.close()
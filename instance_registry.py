@@ -0,0 +1,176 @@
+"""
+Registry of booker instances and the state each one is in.
+
+Every preparation attempt is registered with the account and the (date, priority)
+slot it works on and then moves through
+
+    launching -> logged_in -> preparing -> prepared -> submitting -> submitted -> verified -> closed
+
+with a timestamp for every transition. Any state can move to closed (failed
+attempts, cleanup); a prepared instance that stops answering heartbeats is marked
+dead until cleanup closes it. Hot-standby spares go through the same lifecycle but
+are flagged ``spare`` and stay out of the submit schedule until promoted into the
+slot of a primary that died. The preparation workers, the heartbeat, the submit and verify
+phases and cleanup all read and update the same registry under one lock, so
+per-state counts and time-in-state latencies can be queried at any moment.
+"""
+import itertools
+import logging
+import threading
+import time
+
+LAUNCHING = 'launching'
+LOGGED_IN = 'logged_in'
+PREPARING = 'preparing'
+PREPARED = 'prepared'
+SUBMITTING = 'submitting'
+SUBMITTED = 'submitted'
+VERIFIED = 'verified'
+DEAD = 'dead'
+CLOSED = 'closed'
+
+STATES = [LAUNCHING, LOGGED_IN, PREPARING, PREPARED, SUBMITTING, SUBMITTED, VERIFIED, DEAD, CLOSED]
+
+# Allowed forward transitions; closed is reachable from every state
+TRANSITIONS = {
+    LAUNCHING: {LOGGED_IN},
+    LOGGED_IN: {PREPARING},
+    PREPARING: {PREPARED},
+    PREPARED: {SUBMITTING, DEAD},
+    SUBMITTING: {SUBMITTED},
+    SUBMITTED: {VERIFIED},
+    VERIFIED: set(),
+    DEAD: set(),
+    CLOSED: set(),
+}
+
+
+class InstanceRecord:
+    """One booker instance: who it is, what it is booking and where it is in its lifecycle."""
+
+    def __init__(self, instance_id, account, slot, booker=None, spare=False):
+        self.id = instance_id
+        self.account = account
+        self.slot = slot
+        self.booker = booker
+        self.spare = spare
+        self.state = LAUNCHING
+        self.history = [(LAUNCHING, time.time())]
+        self.info = {}
+
+    @property
+    def entered_at(self):
+        """When the current state was entered."""
+        return self.history[-1][1]
+
+    def time_in(self, state):
+        """Seconds spent in ``state`` (up to now if still in it), or None if it never got there."""
+        for i, (s, ts) in enumerate(self.history):
+            if s == state:
+                end = self.history[i + 1][1] if i + 1 < len(self.history) else time.time()
+                return end - ts
+        return None
+
+    def reached(self, state):
+        return any(s == state for s, _ in self.history)
+
+    def __repr__(self):
+        role = " spare" if self.spare else ""
+        return f"<Instance #{self.id}{role} {self.account} slot={self.slot} {self.state}>"
+
+
+class InstanceRegistry:
+    """Thread-safe collection of InstanceRecords."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._ids = itertools.count(1)
+        self._records = []
+
+    def register(self, account, slot, booker=None, spare=False):
+        with self._lock:
+            record = InstanceRecord(next(self._ids), account, slot, booker, spare)
+            self._records.append(record)
+        logging.debug(f"Registry: registered {record}")
+        return record
+
+    def transition(self, record, state, **info):
+        """Move ``record`` to ``state``. Raises ValueError for a transition the lifecycle doesn't allow."""
+        with self._lock:
+            if state != CLOSED and state not in TRANSITIONS[record.state]:
+                raise ValueError(f"Invalid transition for instance #{record.id}: {record.state} -> {state}")
+            if record.state == CLOSED:
+                return record
+            record.state = state
+            record.history.append((state, time.time()))
+            record.info.update(info)
+        logging.debug(f"Registry: {record}" + (f" {info}" if info else ""))
+        return record
+
+    def in_state(self, *states):
+        """Snapshot of the records currently in any of ``states``, in registration order."""
+        with self._lock:
+            return [r for r in self._records if r.state in states]
+
+    def primaries(self, *states):
+        """Like in_state(), without the hot-standby spares."""
+        return [r for r in self.in_state(*states) if not r.spare]
+
+    def spares(self, slot=None):
+        """Prepared spares (for ``slot`` only, if given), in registration order."""
+        return [r for r in self.in_state(PREPARED) if r.spare and (slot is None or r.slot == slot)]
+
+    def promote(self, record):
+        """Turn a prepared spare into a primary for its slot. Returns False if it's no longer prepared."""
+        with self._lock:
+            if not record.spare or record.state != PREPARED:
+                return False
+            record.spare = False
+            record.info['promoted_at'] = time.time()
+        logging.debug(f"Registry: promoted {record}")
+        return True
+
+    def records(self):
+        """Snapshot of every record, in registration order."""
+        with self._lock:
+            return list(self._records)
+
+    def open_records(self):
+        """Every record that hasn't been closed yet."""
+        with self._lock:
+            return [r for r in self._records if r.state != CLOSED]
+
+    def find(self, booker):
+        with self._lock:
+            for r in self._records:
+                if r.booker is booker:
+                    return r
+        return None
+
+    def counts(self):
+        """{state: number of instances currently in it}, for every state."""
+        with self._lock:
+            counts = {state: 0 for state in STATES}
+            for r in self._records:
+                counts[r.state] += 1
+        return counts
+
+    def latencies(self):
+        """{state: (count, mean, max)} of time spent in each state, over every instance that entered it."""
+        with self._lock:
+            durations = {state: [] for state in STATES if state != CLOSED}
+            for r in self._records:
+                for state in durations:
+                    d = r.time_in(state)
+                    if d is not None:
+                        durations[state].append(d)
+        return {state: (len(d), sum(d) / len(d), max(d)) for state, d in durations.items() if d}
+
+    def summary(self):
+        counts = self.counts()
+        parts = [f"{state} {n}" for state, n in counts.items() if n]
+        spares = len(self.spares())
+        lines = [f"Instances by state: {', '.join(parts) or 'none'}" + (f" ({spares} prepared as standby)" if spares else "")]
+        for state, (n, mean, longest) in self.latencies().items():
+            lines.append(f"  time in {state:<10} n={n:<3} mean {mean:6.2f}s  max {longest:6.2f}s")
+        return "\n".join(lines)
@@ -0,0 +1,177 @@
+"""
+High-precision scheduling for the submit phase.
+
+time.sleep() alone can overshoot by several milliseconds (OS scheduler granularity,
+thread wake-up), which is the same order as the SUBMIT_TIMING_BY_DAY tuning. The
+helpers here sleep coarsely until shortly before the target and then spin on
+time.perf_counter() for the last few milliseconds. SubmitWorker threads are started
+ahead of time and released at their precomputed instants. FireTimingRecorder keeps the
+scheduled fire time of every instance next to the moment its submit command was
+actually sent (and the moment the scheduler released it) so the accuracy can be
+checked in the logs.
+"""
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+# Sleep until this long before the target, then spin
+DEFAULT_SPIN_WINDOW_SECONDS = 0.005
+
+
+class WallClockAnchor:
+    """Maps wall-clock datetimes onto the monotonic perf_counter timeline (anchored once)."""
+
+    def __init__(self):
+        # Take the pair back to back; perf_counter is what we actually wait on
+        self.perf = time.perf_counter()
+        self.wall = datetime.now()
+
+    def to_perf(self, when):
+        return self.perf + (when - self.wall).total_seconds()
+
+    def to_wall(self, perf):
+        return self.wall + timedelta(seconds=perf - self.perf)
+
+
+def sleep_until(target_perf, spin_window=DEFAULT_SPIN_WINDOW_SECONDS):
+    """Block until perf_counter() >= target_perf. Returns the actual perf_counter() on wake."""
+    while True:
+        remaining = target_perf - time.perf_counter()
+        if remaining <= spin_window:
+            break
+        # Coarse phase: wake up a little early, re-check, repeat
+        time.sleep(min(remaining - spin_window, 1.0))
+    while True:
+        now = time.perf_counter()
+        if now >= target_perf:
+            return now
+        # sleep(0) yields the GIL so several spinning submit threads don't starve each other
+        time.sleep(0)
+
+
+@contextmanager
+def fine_grained_switching(interval=0.0002):
+    """Temporarily shorten the interpreter's thread switch interval around the critical window."""
+    previous = sys.getswitchinterval()
+    sys.setswitchinterval(interval)
+    try:
+        yield
+    finally:
+        sys.setswitchinterval(previous)
+
+
+class FireTimingRecorder:
+    """Collects scheduled vs actual fire times (perf_counter seconds) per instance."""
+
+    def __init__(self, anchor):
+        self.anchor = anchor
+        self._lock = threading.Lock()
+        self.records = []  # (instance_label, scheduled_perf, actual_perf or None, released_perf or None)
+
+    def record(self, label, scheduled_perf, actual_perf, released_perf=None):
+        """``actual_perf`` is when the submit command was sent (None if it never was)."""
+        with self._lock:
+            self.records.append((label, scheduled_perf, actual_perf, released_perf))
+
+    def record_workers(self, workers):
+        """Record finished SubmitWorkers: the click they marked is the actual fire time."""
+        for worker in workers:
+            self.record(worker.label, worker.scheduled_perf, worker.clicked_perf, worker.released_perf)
+
+    def log_records(self):
+        """Log scheduled vs actual fire time (and release time) of every recorded instance."""
+        with self._lock:
+            records = sorted(self.records, key=lambda r: r[1])
+
+        def _fmt(perf):
+            return self.anchor.to_wall(perf).strftime('%H:%M:%S.%f') if perf is not None else "n/a"
+
+        for label, scheduled_perf, actual_perf, released_perf in records:
+            error = f"{(actual_perf - scheduled_perf) * 1000:+.3f}ms" if actual_perf is not None else "n/a (no click)"
+            logging.info(
+                f"Fire timing {label}: scheduled {_fmt(scheduled_perf)} actual {_fmt(actual_perf)} "
+                f"error {error} released {_fmt(released_perf)}"
+            )
+
+    def summary(self):
+        with self._lock:
+            errors = sorted((actual - scheduled) * 1000 for _, scheduled, actual, _ in self.records if actual is not None)
+        if not errors:
+            return "no fire times recorded"
+        abs_errors = sorted(abs(e) for e in errors)
+        p95 = abs_errors[min(len(abs_errors) - 1, int(len(abs_errors) * 0.95))]
+        return (
+            f"{len(errors)} instance(s): mean error {sum(errors)/len(errors):+.3f}ms, "
+            f"p95 |error| {p95:.3f}ms, max |error| {abs_errors[-1]:.3f}ms "
+            f"(min {errors[0]:+.3f}ms, max {errors[-1]:+.3f}ms)"
+        )
+
+
+class SubmitWorker:
+    """
+    Submit thread started during the waiting phase. It runs ``prepare`` (e.g. locating the
+    submit button), parks on its release event, and runs ``action(worker)`` once the
+    scheduler releases it at ``scheduled_perf``.
+    """
+
+    def __init__(self, label, scheduled_perf, action, prepare=None):
+        self.label = label
+        self.scheduled_perf = scheduled_perf
+        self.action = action
+        self.prepare = prepare
+        self.ready = threading.Event()
+        self._release = threading.Event()
+        self.released_perf = None
+        self.started_perf = None
+        self.clicked_perf = None
+        self.error = None
+        self.thread = threading.Thread(target=self._run, name=f"submit-{label}", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def _run(self):
+        if self.prepare:
+            try:
+                self.prepare()
+            except Exception as e:
+                logging.warning(f"Submit worker {self.label}: preparation failed: {e}")
+        self.ready.set()
+        self._release.wait()
+        self.started_perf = time.perf_counter()
+        try:
+            self.action(self)
+        except Exception as e:
+            self.error = e
+            logging.error(f"Submit worker {self.label} failed: {e}")
+
+    def release(self):
+        self.released_perf = time.perf_counter()
+        self._release.set()
+        return self.released_perf
+
+    def mark_click(self):
+        """Called right before the click command itself is sent (logging comes after the click)."""
+        self.clicked_perf = time.perf_counter()
+
+    def join(self, timeout=None):
+        self.thread.join(timeout)
+
+    @property
+    def release_latency_ms(self):
+        """Time from the scheduler's release to the click (or to the action start if unmarked)."""
+        end = self.clicked_perf or self.started_perf
+        if self.released_perf is None or end is None:
+            return None
+        return (end - self.released_perf) * 1000
+
+
+def release_on_schedule(workers, spin_window=DEFAULT_SPIN_WINDOW_SECONDS):
+    """Release each worker at its scheduled_perf, in schedule order, from the calling thread."""
+    for worker in sorted(workers, key=lambda w: w.scheduled_perf):
+        sleep_until(worker.scheduled_perf, spin_window=spin_window)
+        worker.release()
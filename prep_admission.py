@@ -0,0 +1,161 @@
+"""
+Deadline-aware admission and a hang watchdog for preparation attempts.
+
+Before this, the prep loop only refused to *start* an attempt after
+preparation_hard_stop_time, and MAX_PREP_TIME_PER_INSTANCE_SECONDS was only checked
+after prepare_booking() returned, so one hung attempt could hold its worker (and the
+join that ends preparation) well past both.
+
+  - AttemptDurationModel predicts how long a new attempt will take from the step
+    spans in prep_step_timings.jsonl (previous runs) plus the spans recorded so far in
+    this run, using a high quantile of complete-attempt durations. An attempt is only
+    admitted if it is predicted to finish before the preparation deadline.
+  - PrepWatchdog watches every running attempt and, once one outlives its own deadline,
+    aborts it from outside by killing its browser, so the blocked WebDriver call in the
+    worker fails immediately instead of whenever the page gives up.
+"""
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from step_timing import STEP_TIMINGS_FILE
+
+# Steps that make up one preparation attempt (launch only appears for cold launches)
+PREP_STEPS = ('launch', 'login', 'start_new_permit_form', 'select_court', 'set_date_and_time', 'continue', 'fill_questions')
+# Quantile of past attempt durations used as the prediction
+PREDICTION_QUANTILE = 0.9
+# Below this many recorded attempts the default is used instead
+MIN_ATTEMPTS = 5
+# Prediction (seconds) until enough attempts are on record
+DEFAULT_ATTEMPT_SECONDS = 30.0
+# Only the most recent attempts from previous runs are considered
+HISTORY_ATTEMPTS = 100
+
+
+def attempt_durations(spans):
+    """Total duration of every complete attempt (all prep steps ok, ending in fill_questions), oldest first."""
+    by_attempt = defaultdict(list)
+    for s in spans:
+        if s.get('step') in PREP_STEPS:
+            by_attempt[(s.get('run_id'), s.get('instance'))].append(s)
+    attempts = []
+    for steps in by_attempt.values():
+        if not all(s.get('ok') for s in steps) or not any(s['step'] == 'fill_questions' for s in steps):
+            continue
+        start = min(s['start'] for s in steps)
+        attempts.append((start, sum(s['duration'] for s in steps)))
+    return [duration for _, duration in sorted(attempts)]
+
+
+class AttemptDurationModel:
+    """Predicts the duration of the next preparation attempt from recorded step timings."""
+
+    def __init__(self, tracer=None, path=STEP_TIMINGS_FILE, quantile=PREDICTION_QUANTILE, default=DEFAULT_ATTEMPT_SECONDS):
+        self.tracer = tracer
+        self.quantile = quantile
+        self.default = default
+        run_id = tracer.run_id if tracer else None
+        self.history = attempt_durations(s for s in self._read(path) if s.get('run_id') != run_id)[-HISTORY_ATTEMPTS:]
+
+    @staticmethod
+    def _read(path):
+        spans = []
+        try:
+            with open(path, 'r') as f:
+                for line in f:
+                    try:
+                        spans.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except OSError:
+            pass
+        return spans
+
+    def samples(self):
+        """Past attempt durations followed by this run's, which reflect today's site."""
+        current = attempt_durations(list(self.tracer.spans)) if self.tracer else []
+        return self.history + current
+
+    def predict(self):
+        """Predicted seconds for one more attempt."""
+        durations = self.samples()
+        if len(durations) < MIN_ATTEMPTS:
+            return self.default
+        durations = sorted(durations)
+        return durations[min(len(durations) - 1, int(len(durations) * self.quantile))]
+
+    def admits(self, now, deadline):
+        """(admitted, predicted seconds) for an attempt starting at ``now`` that must finish by ``deadline``."""
+        predicted = self.predict()
+        return now.timestamp() + predicted <= deadline.timestamp(), predicted
+
+    def describe(self):
+        durations = self.samples()
+        source = f"p{self.quantile*100:.0f} of {len(durations)} recorded attempts" if len(durations) >= MIN_ATTEMPTS else "default, too few recorded attempts"
+        return f"predicted attempt duration {self.predict():.1f}s ({source})"
+
+
+class WatchedAttempt:
+    """One attempt under the watchdog; ``killed`` is set if it was aborted."""
+
+    def __init__(self, booker, deadline, label):
+        self.booker = booker
+        self.deadline = deadline
+        self.label = label
+        self.started = time.time()
+        self.killed = False
+
+
+class PrepWatchdog:
+    """Aborts preparation attempts that outlive their deadline by killing their browser."""
+
+    def __init__(self, poll_interval=0.5):
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._watched = set()
+        self._stop = threading.Event()
+        self._thread = None
+        self.killed = []
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="prep-watchdog", daemon=True)
+        self._thread.start()
+        return self
+
+    def watch(self, booker, deadline, label):
+        """Start watching ``booker`` until done(); ``deadline`` is an epoch time."""
+        attempt = WatchedAttempt(booker, deadline, label)
+        with self._lock:
+            self._watched.add(attempt)
+        return attempt
+
+    def done(self, attempt):
+        with self._lock:
+            self._watched.discard(attempt)
+        return attempt.killed
+
+    def _run(self):
+        while not self._stop.wait(self.poll_interval):
+            now = time.time()
+            with self._lock:
+                expired = [a for a in self._watched if now >= a.deadline]
+                for attempt in expired:
+                    self._watched.discard(attempt)
+                    attempt.killed = True
+            for attempt in expired:
+                logging.warning(
+                    f"WATCHDOG: preparation for {attempt.label} still running after "
+                    f"{now - attempt.started:.1f}s; killing its browser."
+                )
+                self.killed.append(attempt)
+                try:
+                    attempt.booker.abort()
+                except Exception as e:
+                    logging.error(f"WATCHDOG: could not abort {attempt.label}: {e}")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.poll_interval * 2)
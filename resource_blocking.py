@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Network request blocking for the booking pages.
+
+The booker only needs the DOM, the site's own scripts/stylesheets and the form
+endpoints, but every civicpermits page also pulls images, web fonts and third-party
+analytics/font hosts, and the page "load" the WebDriver waits for includes all of
+them. A blocking profile drops those requests:
+
+  - images are disabled through Chrome's content-settings preference;
+  - everything else is blocked per page with DevTools Network.setBlockedURLs
+    (applied to every window the booker drives, including browser contexts).
+
+ALLOWLIST lists real URLs the forms actually load. Network.setBlockedURLs has no
+exceptions, so any block pattern that matches one of them is dropped (with a
+warning) when the profile is compiled rather than risk breaking a form.
+
+Benchmark against the local stand-in serving a recorded copy of the page assets
+(images, fonts, stylesheets, first- and third-party scripts, each with a delay):
+    python resource_blocking.py --benchmark --runs 5 --asset-delay 0.15
+"""
+import argparse
+import logging
+import time
+from fnmatch import fnmatchcase
+
+# URL patterns (Network.setBlockedURLs wildcards) per kind of resource
+BLOCK_PATTERNS = {
+    'images': ['*.png', '*.jpg', '*.jpeg', '*.gif', '*.svg', '*.ico', '*.webp'],
+    'fonts': ['*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot'],
+    'media': ['*.mp4', '*.webm', '*.mp3', '*.ogg'],
+    'third_party': [
+        '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*', '*facebook.net*',
+        '*fonts.googleapis.com*', '*fonts.gstatic.com*', '*hotjar.com*', '*newrelic.com*', '*nr-data.net*',
+    ],
+}
+
+# Never blocked: the site's own documents, scripts (jQuery, blockUI), stylesheets and form
+# posts, plus the same-origin page TennisBooker loads before add_cookie
+ALLOWLIST = [
+    'https://rioc.civicpermits.com/',
+    'https://rioc.civicpermits.com/robots.txt',
+    'https://rioc.civicpermits.com/Account/Login',
+    'https://rioc.civicpermits.com/Permits',
+    'https://rioc.civicpermits.com/Permits/New',
+    'https://rioc.civicpermits.com/Scripts/jquery.min.js',
+    'https://rioc.civicpermits.com/Scripts/jquery.blockUI.js',
+    'https://rioc.civicpermits.com/Content/site.css',
+]
+
+PROFILES = {
+    'off': [],
+    'forms': ['images', 'fonts', 'media', 'third_party'],
+}
+
+
+class BlockingProfile:
+    """A named set of blocked URL patterns plus the Chrome prefs that go with it."""
+
+    def __init__(self, name, kinds, allowlist=ALLOWLIST):
+        self.name = name
+        self.kinds = list(kinds)
+        self.patterns = []
+        for kind in self.kinds:
+            for pattern in BLOCK_PATTERNS[kind]:
+                # setBlockedURLs wildcards match the whole URL, like fnmatch's '*'
+                conflicts = [url for url in allowlist if fnmatchcase(url, pattern)]
+                if conflicts:
+                    logging.warning(f"Blocking profile '{name}': not blocking {pattern} (would block allowlisted {conflicts[0]})")
+                    continue
+                self.patterns.append(pattern)
+
+    def apply_options(self, options):
+        """Add launch-time prefs to ChromeOptions."""
+        if 'images' in self.kinds:
+            options.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
+
+    def apply(self, driver):
+        """Block the profile's URLs in ``driver``'s current window (per page target, so call it for every window)."""
+        if not self.patterns:
+            return
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': self.patterns})
+
+    def __str__(self):
+        return f"{self.name} ({', '.join(self.kinds) or 'nothing blocked'})"
+
+
+def get_profile(name):
+    """BlockingProfile for a PROFILES name, or None for 'off'/None."""
+    if not name or name == 'off':
+        return None
+    return BlockingProfile(name, PROFILES[name])
+
+
+# ---------------------------------------------------------------------------
+# Benchmark against the stand-in permit site
+# ---------------------------------------------------------------------------
+
+_PAGE_TIMING_JS = """
+var nav = performance.getEntriesByType('navigation')[0];
+var resources = performance.getEntriesByType('resource');
+var bytes = 0;
+resources.forEach(function(r) { bytes += r.transferSize || 0; });
+return {load: nav ? nav.loadEventEnd - nav.startTime : null,
+        dcl: nav ? nav.domContentLoadedEventEnd - nav.startTime : null,
+        resources: resources.length, bytes: bytes};
+"""
+
+_FILL_QUESTIONS_JS = """
+document.querySelectorAll('#permitQuestions input[type=text]').forEach(function(el) { el.value = 'None'; });
+document.querySelectorAll('#permitQuestions select').forEach(function(el) { el.value = '0'; });
+document.getElementById('acceptTerms').checked = true;
+"""
+
+
+def _page_timing(driver, wait):
+    """Navigation timing of the current page once its load event has fired."""
+    wait.until(lambda d: d.execute_script("return document.readyState") == "complete")
+    return driver.execute_script(_PAGE_TIMING_JS)
+
+
+def _prep_flow(driver, base_url):
+    """Login -> new permit -> form -> questions on the stand-in. Returns (seconds, per-page timings)."""
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import Select, WebDriverWait
+
+    from config import COURT_IDS
+
+    wait = WebDriverWait(driver, 30)
+    pages = {}
+    start = time.perf_counter()
+
+    driver.get(base_url + "/")
+    pages['login'] = _page_timing(driver, wait)
+    wait.until(EC.element_to_be_clickable((By.ID, "loginEmail"))).send_keys("benchmark@example.com")
+    driver.find_element(By.ID, "loginPassword").send_keys("benchmark")
+    driver.find_element(By.XPATH, '//form[@id="login"]/div/table/tbody/tr/td/button').click()
+
+    new_permit = wait.until(EC.element_to_be_clickable((By.XPATH, '//a[@href="/Permits/New" and @class="button"]')))
+    pages['dashboard'] = _page_timing(driver, wait)
+    driver.execute_script("arguments[0].click();", new_permit)
+
+    wait.until(EC.element_to_be_clickable((By.ID, "activity"))).send_keys("Tennis Match")
+    pages['permit_form'] = _page_timing(driver, wait)
+    _, checkbox_id = sorted(COURT_IDS.items())[0]
+    Select(driver.find_element(By.ID, "site")).select_by_index(1)
+    driver.find_element(By.ID, "addFacilitySet").click()
+    wait.until(EC.element_to_be_clickable((By.ID, checkbox_id))).click()
+    driver.find_element(By.ID, "event0").send_keys("01/01/2030")
+    Select(driver.find_element(By.NAME, "startHour")).select_by_value("8")
+    Select(driver.find_element(By.NAME, "endHour")).select_by_value("9")
+    driver.execute_script("arguments[0].click();", driver.find_element(By.CSS_SELECTOR, ".controlArea button"))
+
+    wait.until(EC.presence_of_element_located((By.ID, "acceptTerms")))
+    pages['questions'] = _page_timing(driver, wait)
+    driver.execute_script(_FILL_QUESTIONS_JS)
+    return time.perf_counter() - start, pages
+
+
+def benchmark(runs=3, asset_delay=0.1, profiles=('off', 'forms')):
+    """Run the prep flow against the stand-in with each profile, alternating, and print the comparison."""
+    from auto_super_tennis_booker import launch_chrome_driver
+    from stand_in_permit_server import serve_in_background
+
+    server, base_url = serve_in_background(assets=True, asset_delay=asset_delay)
+    results = {name: [] for name in profiles}
+    try:
+        for run in range(runs):
+            for name in profiles:
+                profile = get_profile(name)
+                driver = launch_chrome_driver(blocking_profile=profile)
+                try:
+                    results[name].append(_prep_flow(driver, base_url))
+                except Exception as e:
+                    print(f"Run {run+1} with profile '{name}' failed: {e}")
+                finally:
+                    driver.quit()
+    finally:
+        server.shutdown()
+
+    print(f"Stand-in at {base_url}, {runs} run(s) per profile, {asset_delay*1000:.0f}ms per asset")
+    print(f"{'PROFILE':<8}{'PAGE':<13}{'LOAD':>9}{'DCL':>9}{'RESOURCES':>11}{'KB':>8}")
+    totals = {}
+    for name in profiles:
+        flows = results[name]
+        if not flows:
+            print(f"{name:<8}(no successful runs)")
+            continue
+        totals[name] = sum(seconds for seconds, _ in flows) / len(flows)
+        for page in flows[0][1]:
+            samples = [pages[page] for _, pages in flows]
+            load = sum(s['load'] or 0 for s in samples) / len(samples)
+            dcl = sum(s['dcl'] or 0 for s in samples) / len(samples)
+            count = sum(s['resources'] for s in samples) / len(samples)
+            kb = sum(s['bytes'] for s in samples) / len(samples) / 1024
+            print(f"{name:<8}{page:<13}{load:>7.0f}ms{dcl:>7.0f}ms{count:>11.1f}{kb:>8.1f}")
+    for name, seconds in totals.items():
+        line = f"{name:<8}prep flow {seconds:.2f}s"
+        if name != profiles[0] and profiles[0] in totals:
+            base = totals[profiles[0]]
+            line += f" ({(base - seconds) / base:+.0%} vs {profiles[0]})"
+        print(line)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Show or benchmark the request-blocking profiles')
+    parser.add_argument('--profile', default='forms', choices=sorted(PROFILES))
+    parser.add_argument('--benchmark', action='store_true', help='Compare page loads and prep time against the stand-in site')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--asset-delay', type=float, default=0.1, help='Seconds the stand-in waits before serving each asset')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.benchmark:
+        benchmark(runs=args.runs, asset_delay=args.asset_delay, profiles=('off', args.profile) if args.profile != 'off' else ('off',))
+        return
+    profile = BlockingProfile(args.profile, PROFILES[args.profile])
+    print(f"Profile {profile}:")
+    for pattern in profile.patterns:
+        print(f"  block {pattern}")
+    for pattern in ALLOWLIST:
+        print(f"  allow {pattern}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Memory and CPU used per prepared instance.
+
+Sums resident memory and CPU time over each browser's process tree (chromedriver,
+Chrome and its renderer/GPU/utility children). With one Chrome per account every
+instance owns its tree; in browser-context mode several instances share a host's
+tree, so the host's totals are split evenly across the instances on it. Compare the
+"per prepared instance" line between the two layouts.
+
+psutil is optional: without it the report says so and nothing else changes.
+"""
+import logging
+from collections import defaultdict
+
+try:
+    import psutil
+except ImportError:  # optional dependency, only needed for this report
+    psutil = None
+
+
+def process_tree_usage(pid):
+    """(rss bytes, cpu seconds, process count) for ``pid`` and all its descendants, or None."""
+    if psutil is None or pid is None:
+        return None
+    try:
+        root = psutil.Process(pid)
+        processes = [root] + root.children(recursive=True)
+    except psutil.Error:
+        return None
+    rss = cpu = 0
+    count = 0
+    for process in processes:
+        try:
+            rss += process.memory_info().rss
+            times = process.cpu_times()
+            cpu += times.user + times.system
+            count += 1
+        except psutil.Error:
+            continue  # exited while we were walking the tree
+    return rss, cpu, count
+
+
+def browser_pid(booker):
+    """Root process (chromedriver) behind a booker's browser: its own, or its context host's."""
+    driver = getattr(booker, 'driver', None)
+    host = getattr(driver, 'host', None)
+    if host is not None:
+        return host.pid()
+    process = getattr(getattr(driver, 'service', None), 'process', None)
+    return process.pid if process else None
+
+
+def render_instance_resources(records):
+    """Report memory/CPU per prepared instance for registry ``records``."""
+    if psutil is None:
+        return "Resource usage per instance: unavailable (pip install psutil)."
+    by_pid = defaultdict(list)
+    for record in records:
+        pid = browser_pid(record.booker)
+        if pid is not None:
+            by_pid[pid].append(record)
+    if not by_pid:
+        return "Resource usage per instance: no browser processes to measure."
+
+    lines = [f"Resource usage ({len(by_pid)} browser process tree(s) for {sum(len(r) for r in by_pid.values())} instance(s)):"]
+    total_rss = total_cpu = 0
+    measured = 0
+    for pid, pid_records in by_pid.items():
+        usage = process_tree_usage(pid)
+        if usage is None:
+            lines.append(f"  pid {pid}: gone")
+            continue
+        rss, cpu, count = usage
+        total_rss += rss
+        total_cpu += cpu
+        measured += len(pid_records)
+        share = len(pid_records)
+        for record in pid_records:
+            lines.append(
+                f"  #{record.id} {record.account} {record.booker.court_info_for_logging}: "
+                f"{rss / share / 2**20:.0f}MB RSS, {cpu / share:.1f}s CPU"
+                + (f" (1/{share} of pid {pid}, {count} processes)" if share > 1 else f" (pid {pid}, {count} processes)")
+            )
+    if measured:
+        lines.append(
+            f"  Per prepared instance: {total_rss / measured / 2**20:.0f}MB RSS, {total_cpu / measured:.1f}s CPU "
+            f"(total {total_rss / 2**20:.0f}MB, {total_cpu:.1f}s)"
+        )
+    return "\n".join(lines)
+
+
+def log_instance_resources(records):
+    try:
+        logging.info(render_instance_resources(records))
+    except Exception as e:
+        logging.debug(f"Resource report failed: {e}")
@@ -44,6 +44,10 @@ else
     log_message "Failed to generate daily summary"
 fi
 
+# Recalibrate the next runs' submit timing from the booking summaries
+log_message "Recalibrating submit timing..."
+"$VENV_PYTHON" "$OCTOGON_DIR/timing_calibration.py" 2>&1 | tee -a "$LOG_FILE"
+
 log_message "Daily workflow completed"
 
 # Keep terminal open to see results
@@ -0,0 +1,117 @@
+"""
+Encrypted on-disk cache of permit-site login sessions, one entry per USERS account.
+
+A cached cookie jar lets a booker skip the login form (typing credentials, the login
+POST and the dashboard wait) on retries and on the next day's run. Entries are
+validated with a cheap dashboard probe by the caller and are only replaced after a
+real login, i.e. when the cached session has expired.
+
+Cookies are encrypted with Fernet; the key is created on first use next to the cache
+files and is readable only by the current user.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+from cryptography.fernet import Fernet, InvalidToken
+
+logger = logging.getLogger(__name__)
+
+SESSION_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".octogon", "sessions")
+
+# Upper bound on how long a cached session is trusted before a fresh login, even if the
+# server would still accept it. Long enough to carry over to the next morning's run.
+SESSION_CACHE_MAX_AGE_SECONDS = 36 * 3600
+
+
+class SessionCache:
+    def __init__(self, cache_dir=SESSION_CACHE_DIR, max_age_seconds=SESSION_CACHE_MAX_AGE_SECONDS):
+        self.cache_dir = cache_dir
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, mode=0o700, exist_ok=True)
+        self._fernet = Fernet(self._load_or_create_key())
+
+    def _load_or_create_key(self):
+        key_path = os.path.join(self.cache_dir, "session.key")
+        try:
+            with open(key_path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            key = Fernet.generate_key()
+            # O_EXCL so two processes starting at once don't overwrite each other's key
+            try:
+                fd = os.open(key_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            except FileExistsError:
+                with open(key_path, 'rb') as f:
+                    return f.read()
+            with os.fdopen(fd, 'wb') as f:
+                f.write(key)
+            return key
+
+    def _path(self, account):
+        return os.path.join(self.cache_dir, f"{account}.session")
+
+    def load(self, account):
+        """Return the cached cookies for ``account``, or None if missing, unreadable or expired."""
+        with self._lock:
+            try:
+                with open(self._path(account), 'rb') as f:
+                    entry = json.loads(self._fernet.decrypt(f.read()))
+            except FileNotFoundError:
+                return None
+            except (InvalidToken, ValueError) as e:
+                logger.warning(f"Discarding unreadable session cache for {account}: {e}")
+                self._remove(account)
+                return None
+
+        now = time.time()
+        if now - entry['saved_at'] > self.max_age_seconds:
+            logger.debug(f"Session cache for {account} is older than {self.max_age_seconds}s; ignoring.")
+            return None
+        expiries = [c['expiry'] for c in entry['cookies'] if c.get('expiry')]
+        if expiries and min(expiries) <= now:
+            logger.debug(f"Session cache for {account} has expired cookies; ignoring.")
+            return None
+        return entry['cookies']
+
+    def save(self, account, cookies):
+        """Encrypt and store ``cookies`` (Selenium-style dicts) for ``account``."""
+        entry = {'saved_at': time.time(), 'cookies': cookies}
+        token = self._fernet.encrypt(json.dumps(entry).encode('utf-8'))
+        path = self._path(account)
+        tmp_path = f"{path}.tmp"
+        with self._lock:
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(token)
+            os.replace(tmp_path, path)
+        logger.debug(f"Saved login session for {account} ({len(cookies)} cookie(s)).")
+
+    def invalidate(self, account):
+        """Forget the cached session for ``account`` (e.g. after a failed probe)."""
+        with self._lock:
+            self._remove(account)
+
+    def _remove(self, account):
+        try:
+            os.remove(self._path(account))
+        except FileNotFoundError:
+            pass
+
+
+def cookies_from_requests(jar):
+    """Convert a requests cookie jar to Selenium-style cookie dicts."""
+    return [
+        {
+            'name': c.name,
+            'value': c.value,
+            'domain': c.domain,
+            'path': c.path,
+            'secure': c.secure,
+            **({'expiry': int(c.expires)} if c.expires else {}),
+        }
+        for c in jar
+    ]
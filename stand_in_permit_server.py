@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for rioc.civicpermits.com.
+
+Mimics the parts of the permit site the booker touches: the login form, the
+dashboard "New Permit" button, the permit form (activity, site, facilities,
+date/time, continue) and the permit questions page with its Submit/Cancel buttons.
+Element IDs and names match the ones the Selenium and HTTP backends look for, so
+either backend can be pointed at it for a dry run:
+
+    python stand_in_permit_server.py --port 8765
+    python -c "from http_booker import HttpTennisBooker; ..."
+
+Accepted submissions can be inspected at /__submissions. --skew shifts the clock the
+server reports in its Date headers, for checking clock_sync.py. --assets makes every
+page pull a recorded copy of the real pages' subresources (site stylesheet and script,
+images, web fonts, third-party analytics/font hosts mirrored under localhost), each
+served after --asset-delay seconds, for benchmarking resource_blocking.py.
+"""
+import argparse
+import json
+import logging
+import secrets
+import threading
+import time
+from datetime import datetime
+from html import escape
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from config import COURT_IDS, PERMIT_QUESTION_ANSWERS
+
+logger = logging.getLogger(__name__)
+
+SESSION_COOKIE = "ASP.NET_SessionId"
+
+# Subresources of the recorded pages: path -> (content type, size in bytes). Third-party
+# hosts are mirrored as path prefixes on a different host name (localhost vs 127.0.0.1).
+RECORDED_ASSETS = {
+    '/Content/site.css': ('text/css', 24_000),
+    '/Scripts/jquery.min.js': ('application/javascript', 87_000),
+    '/Scripts/jquery.blockUI.js': ('application/javascript', 19_000),
+    '/Content/images/logo.png': ('image/png', 38_000),
+    '/Content/images/banner.jpg': ('image/jpeg', 160_000),
+    '/Content/images/icons.svg': ('image/svg+xml', 12_000),
+    '/Content/fonts/opensans-regular.woff2': ('font/woff2', 64_000),
+    '/fonts.googleapis.com/css': ('text/css', 1_500),
+    '/fonts.gstatic.com/s/roboto.woff2': ('font/woff2', 48_000),
+    '/www.google-analytics.com/analytics.js': ('application/javascript', 52_000),
+    '/www.googletagmanager.com/gtag.js': ('application/javascript', 110_000),
+}
+
+COURT_NAMES = {
+    n: (f"Octagon Tennis Court {n}" if n in (1, 4, 5, 6) else f"Octagon Tennis court {n}")
+    for n in COURT_IDS
+}
+
+
+class StandInState:
+    """Server-side sessions, permit drafts and accepted submissions."""
+
+    def __init__(self, password=None):
+        self.password = password  # None accepts any non-empty password
+        self.lock = threading.Lock()
+        self.sessions = {}  # session id -> {'email': str | None}
+        self.drafts = {}  # draft id -> permit form fields
+        self.submissions = []
+
+    def new_session(self):
+        sid = secrets.token_hex(12)
+        with self.lock:
+            self.sessions[sid] = {'email': None}
+        return sid
+
+
+def _recorded_asset_tags(port):
+    """<head>/<body> markup pulling RECORDED_ASSETS, the way the real pages reference them."""
+    third_party = f"http://localhost:{port}"
+    head = f"""
+<link rel="stylesheet" href="/Content/site.css">
+<link rel="stylesheet" href="{third_party}/fonts.googleapis.com/css">
+<style>@font-face {{ font-family: OpenSans; src: url(/Content/fonts/opensans-regular.woff2); }}
+@font-face {{ font-family: Roboto; src: url({third_party}/fonts.gstatic.com/s/roboto.woff2); }}
+body {{ font-family: OpenSans, Roboto, sans-serif; }}</style>
+<script src="/Scripts/jquery.min.js"></script>
+<script src="/Scripts/jquery.blockUI.js"></script>
+<script async src="{third_party}/www.googletagmanager.com/gtag.js"></script>
+<script async src="{third_party}/www.google-analytics.com/analytics.js"></script>"""
+    body = """
+<img src="/Content/images/logo.png" alt=""><img src="/Content/images/banner.jpg" alt=""><img src="/Content/images/icons.svg" alt="">"""
+    return head, body
+
+
+def _page(title, body):
+    return f"""<!DOCTYPE html>
+<html><head><title>{escape(title)}</title></head>
+<body>
+{body}
+</body></html>"""
+
+
+def _login_page(error=""):
+    return _page("Login", f"""
+<p class="error">{escape(error)}</p>
+<form id="login" method="post" action="/Account/Login">
+  <div>
+    <table><tbody><tr><td>
+      <input id="loginEmail" name="Email" type="text">
+      <input id="loginPassword" name="Password" type="password">
+      <button type="submit">Log In</button>
+    </td></tr></tbody></table>
+  </div>
+</form>""")
+
+
+def _dashboard_page(email):
+    return _page("Dashboard", f"""
+<p>Signed in as {escape(email)}</p>
+<a href="/Permits/New" class="button">New Permit</a>""")
+
+
+def _new_permit_page():
+    sites = "\n".join(f'    <option value="site-{n}">{escape(name)}</option>' for n, name in sorted(COURT_NAMES.items()))
+    facilities = "\n".join(
+        f'    <label><input type="checkbox" id="{cid}" name="FacilityIds" value="{cid}"> {escape(COURT_NAMES[n])}</label>'
+        for n, cid in sorted(COURT_IDS.items())
+    )
+    start_hours = "".join(f'<option value="{h}">{h}:00</option>' for h in range(7, 21))
+    end_hours = "".join(f'<option value="{h}">{h}:00</option>' for h in range(8, 22))
+    return _page("New Permit", f"""
+<form id="newPermit" method="post" action="/Permits/New">
+  <input id="activity" name="Activity" type="text">
+  <select id="site" name="SiteId">
+    <option value="">-- Select --</option>
+{sites}
+  </select>
+  <button type="button" id="addFacilitySet"
+          onclick="document.getElementById('facilities').style.display='block'">Add Facility</button>
+  <div id="facilities" style="display:none">
+{facilities}
+  </div>
+  <input id="event0" name="Events[0].Date" type="text">
+  <select name="startHour">{start_hours}</select>
+  <select name="endHour">{end_hours}</select>
+  <div class="controlArea"><button type="submit">Continue</button></div>
+</form>""")
+
+
+def _questions_page(draft_id):
+    fields = []
+    for element_id, answer in PERMIT_QUESTION_ANSWERS:
+        if isinstance(answer, tuple):
+            fields.append(
+                f'  <select id="{element_id}" name="Q_{element_id}">'
+                f'<option value="">--</option><option value="0">No</option><option value="1">Yes</option></select>'
+            )
+        else:
+            fields.append(f'  <input id="{element_id}" name="Q_{element_id}" type="text">')
+    questions = "\n".join(fields)
+    return _page("Permit Questions", f"""
+<form id="permitQuestions" method="post" action="/Permits/Submit/{draft_id}">
+{questions}
+  <input type="checkbox" id="acceptTerms" name="AcceptTerms" value="true">
+  <div class="controlArea">
+    <button type="submit" name="command" value="submit">Submit</button><button type="button" id="cancelNewPermitRequest">Cancel</button>
+  </div>
+</form>""")
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    server_version = "StandInPermits/1.0"
+    state: StandInState = None  # set by make_server
+    clock_skew = 0.0  # seconds added to this server's clock (Date header), set by make_server
+    assets = False  # pages pull RECORDED_ASSETS, set by make_server
+    asset_delay = 0.0  # seconds before each asset is served
+
+    def date_time_string(self, timestamp=None):
+        if timestamp is None:
+            timestamp = time.time() + self.clock_skew
+        return super().date_time_string(timestamp)
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    # --- helpers ---
+    def _session_id(self):
+        cookie = SimpleCookie(self.headers.get('Cookie', ''))
+        sid = cookie[SESSION_COOKIE].value if SESSION_COOKIE in cookie else None
+        return sid if sid in self.state.sessions else None
+
+    def _form(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length).decode('utf-8') if length else ''
+        return {k: v[-1] for k, v in parse_qs(body, keep_blank_values=True).items()}
+
+    def _send(self, status, body="", content_type="text/html; charset=utf-8", headers=None):
+        if self.assets and content_type.startswith("text/html") and body:
+            head, images = _recorded_asset_tags(self.server.server_address[1])
+            body = body.replace("</head>", head + "\n</head>", 1).replace("<body>", "<body>" + images, 1)
+        data = body.encode('utf-8') if isinstance(body, str) else body
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(data)
+
+    def _redirect(self, location, headers=None):
+        self._send(303, "", headers={'Location': location, **(headers or {})})
+
+    def _require_login(self):
+        sid = self._session_id()
+        if not sid or not self.state.sessions[sid]['email']:
+            self._redirect("/")
+            return None
+        return sid
+
+    # --- routes ---
+    def do_HEAD(self):
+        self._send(200)
+
+    def _send_asset(self, path):
+        content_type, size = RECORDED_ASSETS[path]
+        if self.asset_delay:
+            time.sleep(self.asset_delay)
+        if content_type.startswith("text/css"):
+            body = "/* recorded stylesheet */\n" + " " * size
+        elif content_type == "application/javascript":
+            body = "/* recorded script */\n" + " " * size
+        else:
+            body = b"\0" * size
+        self._send(200, body, content_type=content_type, headers={'Cache-Control': 'no-store'})
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if self.assets and path in RECORDED_ASSETS:
+            self._send_asset(path)
+        elif path == "/":
+            sid = self._session_id()
+            if sid and self.state.sessions[sid]['email']:
+                self._send(200, _dashboard_page(self.state.sessions[sid]['email']))
+            else:
+                self._send(200, _login_page())
+        elif path == "/Permits":
+            sid = self._require_login()
+            if sid:
+                self._send(200, _dashboard_page(self.state.sessions[sid]['email']))
+        elif path == "/Permits/New":
+            if self._require_login():
+                self._send(200, _new_permit_page())
+        elif path.startswith("/Permits/Questions/"):
+            if self._require_login():
+                draft_id = path.rsplit("/", 1)[-1]
+                if draft_id in self.state.drafts:
+                    self._send(200, _questions_page(draft_id))
+                else:
+                    self._send(404, _page("Not found", "Unknown permit draft"))
+        elif path.startswith("/Permits/Confirmation/"):
+            if self._require_login():
+                self._send(200, _page("Submitted", "<p>Your permit request has been received.</p>"))
+        elif path == "/__submissions":
+            with self.state.lock:
+                body = json.dumps(self.state.submissions, indent=2)
+            self._send(200, body, content_type="application/json")
+        else:
+            self._send(404, _page("Not found", "Not found"))
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        form = self._form()
+        if path == "/Account/Login":
+            email = form.get('Email', '').strip()
+            password = form.get('Password', '')
+            valid = email and password and (self.state.password is None or password == self.state.password)
+            if not valid:
+                self._send(200, _login_page("Invalid email or password."))
+                return
+            sid = self._session_id() or self.state.new_session()
+            with self.state.lock:
+                self.state.sessions[sid]['email'] = email
+            self._redirect("/Permits", headers={'Set-Cookie': f"{SESSION_COOKIE}={sid}; Path=/; HttpOnly"})
+        elif path == "/Permits/New":
+            sid = self._require_login()
+            if not sid:
+                return
+            missing = [k for k in ('Activity', 'SiteId', 'FacilityIds', 'Events[0].Date', 'startHour', 'endHour') if not form.get(k)]
+            if missing:
+                self._send(200, _new_permit_page().replace("<form", f'<p class="error">Missing: {", ".join(missing)}</p>\n<form', 1))
+                return
+            draft_id = secrets.token_hex(8)
+            with self.state.lock:
+                self.state.drafts[draft_id] = dict(form, email=self.state.sessions[sid]['email'])
+            self._redirect(f"/Permits/Questions/{draft_id}")
+        elif path.startswith("/Permits/Submit/"):
+            sid = self._require_login()
+            if not sid:
+                return
+            draft_id = path.rsplit("/", 1)[-1]
+            draft = self.state.drafts.get(draft_id)
+            unanswered = [element_id for element_id, _ in PERMIT_QUESTION_ANSWERS if not form.get(f"Q_{element_id}")]
+            if draft is None or unanswered or form.get('AcceptTerms') != 'true':
+                self._send(200, _questions_page(draft_id).replace("<form", '<p class="error">Please answer every question.</p>\n<form', 1))
+                return
+            with self.state.lock:
+                self.state.submissions.append({
+                    'received_at': datetime.now().isoformat(timespec='milliseconds'),
+                    'email': draft['email'],
+                    'facility': draft['FacilityIds'],
+                    'date': draft['Events[0].Date'],
+                    'start_hour': draft['startHour'],
+                    'end_hour': draft['endHour'],
+                })
+                confirmation = len(self.state.submissions)
+            self._redirect(f"/Permits/Confirmation/{confirmation}")
+        else:
+            self._send(404, _page("Not found", "Not found"))
+
+
+def make_server(host="127.0.0.1", port=0, password=None, clock_skew=0.0, assets=False, asset_delay=0.0):
+    """Create (but do not start) a stand-in server. port=0 picks a free port.
+    ``clock_skew`` shifts the server clock reported in Date headers (seconds, may be negative).
+    ``assets`` serves the recorded page subresources, each after ``asset_delay`` seconds."""
+    state = StandInState(password=password)
+    handler = type("BoundStandInHandler", (StandInHandler,), {
+        'state': state, 'clock_skew': clock_skew, 'assets': assets, 'asset_delay': asset_delay,
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.state = state
+    return server
+
+
+def serve_in_background(host="127.0.0.1", port=0, **kwargs):
+    """Start a stand-in server on a daemon thread. Returns (server, base_url)."""
+    server = make_server(host, port, **kwargs)
+    threading.Thread(target=server.serve_forever, name="stand-in-permit-server", daemon=True).start()
+    return server, f"http://{server.server_address[0]}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a local stand-in for the RIOC permit site')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--password', default=None, help='Only accept this password (default: any)')
+    parser.add_argument('--skew', type=float, default=0.0, help='Seconds to shift the server clock in Date headers (e.g. 1.37 or -0.4)')
+    parser.add_argument('--assets', action='store_true', help='Serve the recorded images/fonts/stylesheets/scripts with every page')
+    parser.add_argument('--asset-delay', type=float, default=0.1, help='Seconds before each recorded asset is served (with --assets)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG)
+    server = make_server(args.host, args.port, password=args.password, clock_skew=args.skew,
+                         assets=args.assets, asset_delay=args.asset_delay)
+    print(f"Stand-in permit site listening on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
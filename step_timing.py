@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Per-step timing spans for booking preparation and submission.
+
+TennisBooker wraps each step (login, start_new_permit_form, select_court,
+set_date_and_time, the continue click, _fill_permit_questions, the submit click and
+verify_submission) in a span. Every finished span is appended as one JSON line to
+prep_step_timings.jsonl, tagged with the run, the instance, the account and the court.
+
+Render a Gantt-style view of a run and per-step statistics with:
+    python step_timing.py                  # latest run
+    python step_timing.py --run 20251121_074500
+    python step_timing.py --date 2025-11-21
+
+Compare step durations across page-load strategies (every run in the file):
+    python step_timing.py --compare-strategies
+"""
+import argparse
+import itertools
+import json
+import logging
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+STEP_TIMINGS_FILE = 'prep_step_timings.jsonl'
+
+# One character per step in the Gantt chart
+STEP_SYMBOLS = {
+    'launch': 'B',
+    'login': 'L',
+    'start_new_permit_form': 'N',
+    'select_court': 'C',
+    'set_date_and_time': 'D',
+    'continue': '>',
+    'fill_questions': 'Q',
+    'submit_click': 'S',
+    'verify_submission': 'V',
+}
+
+
+class StepTracer:
+    """Thread-safe span recorder shared by every instance in a run."""
+
+    def __init__(self, path=STEP_TIMINGS_FILE, run_id=None):
+        self.path = path
+        self.run_id = run_id or datetime.now().strftime('%Y%m%d_%H%M%S')
+        self._lock = threading.Lock()
+        self._instance_ids = itertools.count(1)
+        self.spans = []
+
+    def new_instance_id(self):
+        return next(self._instance_ids)
+
+    def record(self, instance, step, start, end, ok=True, error=None, **attrs):
+        entry = {
+            'run_id': self.run_id,
+            'instance': instance,
+            'step': step,
+            'start': round(start, 6),
+            'end': round(end, 6),
+            'duration': round(end - start, 6),
+            'ok': ok,
+            **attrs,
+        }
+        if error:
+            entry['error'] = error
+        with self._lock:
+            self.spans.append(entry)
+            try:
+                with open(self.path, 'a') as f:
+                    f.write(json.dumps(entry) + '\n')
+            except OSError as e:
+                logging.debug(f"Could not write step timing: {e}")
+        return entry
+
+    @contextmanager
+    def span(self, instance, step, **attrs):
+        """Time the enclosed block; exceptions are recorded (ok=False) and re-raised."""
+        start = time.time()
+        try:
+            yield
+        except BaseException as e:
+            self.record(instance, step, start, time.time(), ok=False, error=f"{type(e).__name__}: {e}"[:200], **attrs)
+            raise
+        self.record(instance, step, start, time.time(), **attrs)
+
+
+def load_all_spans(path=STEP_TIMINGS_FILE):
+    """Every recorded span, across runs."""
+    spans = []
+    try:
+        with open(path, 'r') as f:
+            for line in f:
+                try:
+                    spans.append(json.loads(line))
+                except ValueError:
+                    continue
+    except FileNotFoundError:
+        return []
+    return spans
+
+
+def load_spans(path=STEP_TIMINGS_FILE, run_id=None, date=None):
+    """Load spans for one run (default: the latest run, or the latest run on ``date``)."""
+    spans = load_all_spans(path)
+    if not spans:
+        return []
+    if run_id is None:
+        runs = sorted({s['run_id'] for s in spans if date is None or s['run_id'].startswith(date.strftime('%Y%m%d'))})
+        if not runs:
+            return []
+        run_id = runs[-1]
+    return [s for s in spans if s['run_id'] == run_id]
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+def render_step_stats(spans):
+    """Table of duration stats per step across all instances in a run."""
+    by_step = defaultdict(list)
+    failures = defaultdict(int)
+    for s in spans:
+        by_step[s['step']].append(s['duration'])
+        if not s['ok']:
+            failures[s['step']] += 1
+    order = [step for step in STEP_SYMBOLS if step in by_step] + sorted(set(by_step) - set(STEP_SYMBOLS))
+    lines = [f"{'STEP':<24}{'COUNT':>6}{'MEAN':>8}{'P50':>8}{'P90':>8}{'MAX':>8}{'TOTAL':>9}{'FAILED':>8}"]
+    for step in order:
+        d = by_step[step]
+        lines.append(
+            f"{step:<24}{len(d):>6}{sum(d)/len(d):>7.2f}s{_percentile(d, 0.5):>7.2f}s"
+            f"{_percentile(d, 0.9):>7.2f}s{max(d):>7.2f}s{sum(d):>8.1f}s{failures[step]:>8}"
+        )
+    return "\n".join(lines)
+
+
+def render_strategy_comparison(spans, baseline='normal'):
+    """Mean/p50 of successful step durations per page-load strategy, with the change against ``baseline``."""
+    by_key = defaultdict(list)
+    for s in spans:
+        if s['ok']:
+            # Spans recorded before strategies were tagged ran with the normal strategy
+            by_key[(s.get('page_load_strategy') or 'normal', s['step'])].append(s['duration'])
+    strategies = sorted({strategy for strategy, _ in by_key}, key=lambda x: (x != baseline, x))
+    steps = [step for step in STEP_SYMBOLS if any(k[1] == step for k in by_key)]
+    if not steps:
+        return "No successful step timings recorded."
+    lines = [f"{'STEP':<24}{'STRATEGY':<10}{'COUNT':>6}{'MEAN':>8}{'P50':>8}{'VS ' + baseline.upper():>12}"]
+    for step in steps:
+        base = by_key.get((baseline, step))
+        base_mean = sum(base) / len(base) if base else None
+        for strategy in strategies:
+            d = by_key.get((strategy, step))
+            if not d:
+                continue
+            mean = sum(d) / len(d)
+            delta = f"{(mean - base_mean) / base_mean:+.0%}" if base_mean and strategy != baseline else ""
+            lines.append(f"{step:<24}{strategy:<10}{len(d):>6}{mean:>7.2f}s{_percentile(d, 0.5):>7.2f}s{delta:>12}")
+    return "\n".join(lines)
+
+
+def render_gantt(spans, width=100):
+    """Text Gantt chart: one row per instance, one symbol per step, shared time axis."""
+    if not spans:
+        return "No step timings recorded."
+    t0 = min(s['start'] for s in spans)
+    t1 = max(s['end'] for s in spans)
+    scale = max(t1 - t0, 1e-6) / width
+
+    rows = defaultdict(list)
+    labels = {}
+    for s in spans:
+        rows[s['instance']].append(s)
+        # Early spans (launch/login) don't know the court yet; keep the most complete label
+        court_info = s.get('court_info') if s.get('court_info') != 'Unknown' else None
+        label = f"#{s['instance']} {s.get('account') or '?'} {court_info or ''}".strip()[:48]
+        if len(label) > len(labels.get(s['instance'], '')):
+            labels[s['instance']] = label
+
+    label_width = max(len(label) for label in labels.values())
+    lines = [
+        f"Run {spans[0]['run_id']}: {len(rows)} instance(s) over {t1 - t0:.1f}s "
+        f"({datetime.fromtimestamp(t0).strftime('%H:%M:%S')} → {datetime.fromtimestamp(t1).strftime('%H:%M:%S')}), "
+        f"1 column ≈ {scale:.2f}s"
+    ]
+    for instance in sorted(rows, key=lambda i: min(s['start'] for s in rows[i])):
+        bar = [' '] * width
+        for s in sorted(rows[instance], key=lambda x: x['start']):
+            first = min(width - 1, int((s['start'] - t0) / scale))
+            last = min(width - 1, max(first, int((s['end'] - t0) / scale)))
+            symbol = STEP_SYMBOLS.get(s['step'], '?')
+            if not s['ok']:
+                symbol = 'x'
+            for col in range(first, last + 1):
+                bar[col] = symbol
+        total = sum(s['duration'] for s in rows[instance])
+        lines.append(f"{labels[instance]:<{label_width}} |{''.join(bar)}| {total:6.1f}s")
+    legend = "  ".join(f"{sym}={step}" for step, sym in STEP_SYMBOLS.items())
+    lines.append(f"Legend: {legend}  x=failed")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Show per-step preparation/submission timings for a run')
+    parser.add_argument('--file', default=STEP_TIMINGS_FILE)
+    parser.add_argument('--run', default=None, help='Run id (YYYYMMDD_HHMMSS). Defaults to the latest run.')
+    parser.add_argument('--date', default=None, help='Latest run on this date (YYYY-MM-DD)')
+    parser.add_argument('--width', type=int, default=100, help='Gantt chart width in columns')
+    parser.add_argument('--compare-strategies', action='store_true', help='Compare step durations per page-load strategy over all runs')
+    args = parser.parse_args()
+
+    if args.compare_strategies:
+        print(render_strategy_comparison(load_all_spans(args.file)))
+        return
+
+    date = None
+    if args.date:
+        try:
+            date = datetime.strptime(args.date, '%Y-%m-%d')
+        except ValueError:
+            print(f"Error: Invalid date format '{args.date}'. Please use YYYY-MM-DD format.")
+            sys.exit(1)
+
+    spans = load_spans(args.file, run_id=args.run, date=date)
+    if not spans:
+        print("No step timings found.")
+        return
+    print(render_gantt(spans, width=args.width))
+    print()
+    print(render_step_stats(spans))
+
+
+if __name__ == "__main__":
+    main()
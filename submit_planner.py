@@ -0,0 +1,175 @@
+"""
+Per-instance submit offsets planned against the learned acceptance window.
+
+The submit phase used to fire instance ``idx`` at ``target + idx * 0.05s`` in
+preparation order, whatever slot it held. The planner instead gives every prepared
+instance its own offset from the target:
+
+  - the acceptance window (when the server starts accepting, when slots are gone) comes
+    from timing_calibration.py, with its uncertainty expanded into a grid of opening /
+    closing scenarios; a boundary the history never bracketed is taken to be the
+    earliest / latest submission seen;
+  - instances are placed on a grid of candidate instants (never closer together than
+    the minimum spacing), most valuable slot first, each taking the instant that adds
+    the most expected value given the instances already planned for the same slot, so
+    redundant instances for one slot spread across the uncertain edges instead of
+    piling onto the same instant;
+  - the expected number of bookings (at most one per slot) is reported for the plan
+    and for the old fixed stagger before anything fires.
+"""
+import math
+from collections import defaultdict
+from statistics import NormalDist
+
+# Boundaries are never treated as sharper than this (seconds), whatever the calibration says
+MIN_BOUNDARY_SIGMA = 0.03
+# Chance that an in-window submission is approved when the calibration doesn't say
+DEFAULT_IN_WINDOW_HIT_RATE = 0.5
+# Opening/closing quantiles per boundary; scenarios = SCENARIO_QUANTILES ** 2
+SCENARIO_QUANTILES = 15
+
+
+class SubmitPlan:
+    """Planned offsets (seconds from the target, aligned with the input instances) and their expected outcome."""
+
+    def __init__(self, instances, offsets, probabilities, expected_bookings, window_text, baseline_bookings=None):
+        self.instances = instances
+        self.offsets = offsets
+        self.probabilities = probabilities
+        self.expected_bookings = expected_bookings
+        self.baseline_bookings = baseline_bookings
+        self.window_text = window_text
+
+    def render(self):
+        lines = [f"Submit plan ({self.window_text}):"]
+        order = sorted(range(len(self.instances)), key=lambda i: self.offsets[i])
+        for i in order:
+            inst = self.instances[i]
+            p = self.probabilities[i]
+            lines.append(
+                f"  {self.offsets[i]*1000:+7.0f}ms  "
+                + (f"p={p:.2f}" if p is not None else "p=?   ")
+                + f"  value {inst['value']:.2f}  {inst['label']}"
+            )
+        if self.expected_bookings is not None:
+            summary = f"Expected bookings: {self.expected_bookings:.2f}"
+            if self.baseline_bookings is not None:
+                summary += f" (fixed stagger in preparation order: {self.baseline_bookings:.2f})"
+            lines.append(summary)
+        return "\n".join(lines)
+
+
+class _WindowModel:
+    """Opening/closing scenarios relative to the target, each equally likely."""
+
+    def __init__(self, window, base_offset):
+        self.hit_rate = min(0.95, max(0.05, window.get('expected_hit_rate') or DEFAULT_IN_WINDOW_HIT_RATE))
+        opens = self._boundary(window.get('opens'), base_offset)
+        closes = self._boundary(window.get('closes'), base_offset)
+        # An unbracketed boundary is only known to lie beyond the submissions seen so far
+        observed = window.get('observed')
+        if observed and not opens:
+            opens = self._boundary({'offset': observed['first']}, base_offset)
+        if observed and not closes:
+            closes = self._boundary({'offset': observed['last']}, base_offset)
+        self.opens, self.closes = opens, closes
+        open_points = self._quantiles(opens) if opens else [-math.inf]
+        close_points = self._quantiles(closes) if closes else [math.inf]
+        self.scenarios = [(o, c) for o in open_points for c in close_points if o < c] or [(-math.inf, math.inf)]
+
+    @staticmethod
+    def _boundary(entry, base_offset):
+        if not entry:
+            return None
+        return entry['offset'] - base_offset, max(entry.get('uncertainty', 0.0), MIN_BOUNDARY_SIGMA)
+
+    @staticmethod
+    def _quantiles(boundary):
+        dist = NormalDist(*boundary)
+        return [dist.inv_cdf((k + 0.5) / SCENARIO_QUANTILES) for k in range(SCENARIO_QUANTILES)]
+
+    def in_window(self, t):
+        """Per-scenario 0/1 vector: does instant ``t`` fall inside the window?"""
+        return [1.0 if o <= t < c else 0.0 for o, c in self.scenarios]
+
+    def span(self, count, spacing):
+        """Range of candidate instants worth considering for ``count`` instances."""
+        if self.opens:
+            lo = self.opens[0] - 2 * self.opens[1]
+        else:
+            lo = self.closes[0] - 2 * self.closes[1] - count * spacing
+        if self.closes:
+            hi = self.closes[0] + 2 * self.closes[1]
+        else:
+            hi = self.opens[0] + 2 * self.opens[1] + count * spacing
+        # Always leave at least one candidate per instance
+        hi = max(hi, lo + (count - 1) * spacing)
+        return lo, hi
+
+    def describe(self):
+        parts = []
+        if self.opens:
+            parts.append(f"opens {self.opens[0]*1000:+.0f}ms ±{self.opens[1]*1000:.0f}ms")
+        if self.closes:
+            parts.append(f"closes {self.closes[0]*1000:+.0f}ms ±{self.closes[1]*1000:.0f}ms")
+        parts.append(f"in-window hit rate {self.hit_rate:.0%}")
+        return ", ".join(parts) + " relative to target"
+
+
+def _evaluate(model, instances, offsets):
+    """Expected bookings (one per slot at most) and per-instance hit probabilities for fixed offsets."""
+    n = len(model.scenarios)
+    miss = defaultdict(lambda: [1.0] * n)
+    probabilities = []
+    for inst, t in zip(instances, offsets):
+        inside = model.in_window(t)
+        probabilities.append(sum(inside) / n * model.hit_rate)
+        slot_miss = miss[inst['slot']]
+        for s in range(n):
+            slot_miss[s] *= 1 - model.hit_rate * inside[s]
+    expected = sum(1 - sum(m) / n for m in miss.values())
+    return expected, probabilities
+
+
+def plan_submissions(instances, window=None, base_offset=0.0, min_spacing=0.05):
+    """
+    Plan offsets for ``instances`` (dicts with 'label', 'slot' and 'value', in preparation order).
+    ``window`` is a calibration entry from timing_calibration.load_window() and ``base_offset``
+    the target's offset after 8:00:00 in seconds. Without a usable window the plan is the fixed
+    ``idx * min_spacing`` stagger.
+    """
+    fixed = [idx * min_spacing for idx in range(len(instances))]
+    if not instances or not window or not (window.get('opens') or window.get('closes') or window.get('observed')):
+        return SubmitPlan(instances, fixed, [None] * len(instances), None,
+                          f"no acceptance window learned; fixed {min_spacing*1000:.0f}ms stagger")
+
+    model = _WindowModel(window, base_offset)
+    n = len(model.scenarios)
+    lo, hi = model.span(len(instances), min_spacing)
+    # Candidate grid is anchored on the target itself so offsets stay on min_spacing steps
+    candidates = [k * min_spacing for k in range(math.floor(lo / min_spacing), math.ceil(hi / min_spacing) + 1)]
+    in_window = {t: model.in_window(t) for t in candidates}
+
+    miss = defaultdict(lambda: [1.0] * n)
+    offsets = [None] * len(instances)
+    free = set(candidates)
+    # Most valuable slots choose first; ties keep preparation order
+    for i in sorted(range(len(instances)), key=lambda i: -instances[i]['value']):
+        inst = instances[i]
+        slot_miss = miss[inst['slot']]
+        best = None
+        for t in sorted(free, key=lambda t: (abs(t), t)):
+            inside = in_window[t]
+            gain = inst['value'] * model.hit_rate * sum(inside[s] * slot_miss[s] for s in range(n)) / n
+            if best is None or gain > best[1] + 1e-12:
+                best = (t, gain)
+        t = best[0]
+        free.discard(t)
+        offsets[i] = t
+        inside = in_window[t]
+        for s in range(n):
+            slot_miss[s] *= 1 - model.hit_rate * inside[s]
+
+    expected, probabilities = _evaluate(model, instances, offsets)
+    baseline, _ = _evaluate(model, instances, fixed)
+    return SubmitPlan(instances, offsets, probabilities, expected, model.describe(), baseline_bookings=baseline)
@@ -0,0 +1,66 @@
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import COURT_IDS
+from http_booker import HttpTennisBooker
+from precision_timer import SubmitWorker
+from stand_in_permit_server import serve_in_background
+
+PASSWORD = "stand-in-password"
+
+
+@pytest.fixture
+def stand_in():
+    server, base_url = serve_in_background(password=PASSWORD)
+    yield server, base_url
+    server.shutdown()
+
+
+def test_login_prepare_submit_verify(stand_in):
+    server, base_url = stand_in
+    booking_date = date.today() + timedelta(days=2)
+    booker = HttpTennisBooker(base_url=base_url)
+    try:
+        # Same calls, in the same order, as main()'s prep attempt and submit workers
+        assert booker.login("player@example.com", PASSWORD, account=None, reuse_session=True)
+        assert booker.prepare_booking(5, booking_date, "18:00", retries=2, deadline=time.time() + 60)
+        ok, _ = booker.preflight_check()
+        assert ok
+
+        worker = SubmitWorker(
+            "instance 1/1",
+            time.perf_counter(),
+            action=lambda w: booker.submit_prepared_booking(on_click=w.mark_click),
+            prepare=booker.locate_submit_button,
+        ).start()
+        assert worker.ready.wait(5)
+        worker.release()
+        worker.join(5)
+        assert worker.error is None
+        assert worker.clicked_perf is not None
+
+        assert booker.verify_submission() is True
+    finally:
+        booker.close()
+
+    assert len(server.state.submissions) == 1
+    submission = server.state.submissions[0]
+    assert submission['email'] == "player@example.com"
+    assert submission['facility'] == COURT_IDS[5]
+    assert submission['date'] == booking_date.strftime('%m/%d/%Y')
+    assert (submission['start_hour'], submission['end_hour']) == ("18", "19")
+
+
+def test_wrong_password_fails_login(stand_in):
+    _, base_url = stand_in
+    booker = HttpTennisBooker(base_url=base_url)
+    try:
+        assert not booker.login("player@example.com", "wrong")
+    finally:
+        booker.close()
@@ -0,0 +1,58 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from timing_calibration import MIN_EXPECTED_HIT_RATE, WeekdayCalibration, load_override, load_window, write_overrides
+
+
+def _observations(early, approved, late):
+    return (
+        [(o, 'early', 'a', 5, '18:00') for o in early]
+        + [(o, 'approved', 'a', 5, '18:00') for o in approved]
+        + [(o, 'late', 'a', 5, '18:00') for o in late]
+    )
+
+
+def _calibration():
+    return WeekdayCalibration(4, _observations(
+        early=[1.00, 1.10, 1.20, 1.30, 1.40],
+        approved=[1.60, 1.70, 1.80, 1.90, 2.00],
+        late=[2.30, 2.40, 2.50, 2.60, 2.70],
+    ))
+
+
+def test_point_is_inside_the_window():
+    cal = _calibration()
+    opens, opens_uncertainty, _ = cal.opening
+    closes, closes_uncertainty, _ = cal.closing
+    assert opens + opens_uncertainty <= cal.point <= closes - closes_uncertainty
+    assert opens < cal.point < closes
+    assert cal.usable
+
+
+def test_one_sided_or_low_rate_points_are_not_written(tmp_path):
+    only_late = WeekdayCalibration(2, _observations(early=[], approved=[2.9], late=[3.1, 3.2, 3.3, 3.4, 3.5, 3.6]))
+    assert only_late.point is not None and not only_late.usable
+
+    path = tmp_path / 'override.json'
+    write_overrides({2: only_late, 4: _calibration()}, path=str(path))
+    timings = json.loads(path.read_text())['timings']
+    assert set(timings) == {'4'}
+    assert load_override(2, path=str(path)) is None
+    assert load_override(4, path=str(path))['expected_hit_rate'] >= MIN_EXPECTED_HIT_RATE
+
+
+def test_load_ignores_unbracketed_entries_from_older_files(tmp_path):
+    path = tmp_path / 'override.json'
+    path.write_text(json.dumps({'timings': {'2': {'second': 3, 'millisecond': 33, 'expected_hit_rate': 0.02}}}))
+    assert load_override(2, path=str(path)) is None
+
+
+def test_planner_window_uses_the_override_gate(tmp_path):
+    only_late = WeekdayCalibration(2, _observations(early=[], approved=[2.9], late=[3.1, 3.2, 3.3, 3.4, 3.5, 3.6]))
+    path = tmp_path / 'override.json'
+    write_overrides({2: only_late, 4: _calibration()}, path=str(path))
+    assert load_window(2, path=str(path)) is None
+    assert load_window(4, path=str(path))['opens']
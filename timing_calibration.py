@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+Calibrate the per-weekday submit time from past booking summaries.
+
+Reads every booking_summary_YYYYMMDD.txt written by combine_results.py, takes the
+08:00 submissions from its "SUBMISSION RESULTS" section and classifies each one as
+approved, too early (cancelled) or too late (unable to process). Older summaries only
+mark failures with ❌; those are resolved through the ACCOUNT SUMMARY section when
+the account's outcome is unambiguous.
+
+For each weekday it estimates the acceptance window:
+  - opens between the cancelled submissions and the first processed ones
+  - closes between the approved submissions and the rejected ones
+each boundary being the split with the fewest misclassified observations, with the
+width of the best split range as its uncertainty. The submit point is the instant
+with the highest smoothed approval rate between the upper bound of the opening and the
+lower bound of the closing. It is only written to submit_timing_override.json (which
+auto_super_tennis_booker.py reads in preference to its hand-edited SUBMIT_TIMING_BY_DAY
+table) when both boundaries are estimated and the expected hit rate is at least
+MIN_EXPECTED_HIT_RATE.
+
+    python timing_calibration.py            # recalibrate and print the report
+    python timing_calibration.py --dry-run  # report only
+"""
+import argparse
+import glob
+import json
+import logging
+import math
+import os
+import re
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+SUMMARY_GLOB = 'booking_summary_*.txt'
+TIMING_OVERRIDE_FILE = 'submit_timing_override.json'
+
+# Weekdays with fewer classified observations than this keep the hand-edited timing
+MIN_OBSERVATIONS = 6
+# Gaussian kernel width (seconds) used to smooth approval rates over submit offsets
+KERNEL_BANDWIDTH = 0.1
+# Resolution of the submit point search (seconds)
+SEARCH_STEP = 0.01
+# Calibrated points with a lower expected hit rate than this keep the hand-edited timing
+MIN_EXPECTED_HIT_RATE = 0.25
+
+WEEKDAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+_ATTEMPT_RE = re.compile(
+    r'^\s*\d+\.\s+(\d{2}):(\d{2}):(\d{2})\.(\d{3})\s+(\S+)\s+(\S+)\s+→\s+Court\s+(\d+)\s+at\s+(\d{2}:\d{2})\s+on\s+(\S+)'
+)
+_HEADER_RE = re.compile(r'TENNIS BOOKING SUMMARY - (\d{4}-\d{2}-\d{2})')
+
+# ACCOUNT SUMMARY line labels -> outcome (only unambiguous outcomes are used)
+_ACCOUNT_OUTCOMES = {
+    'Unable to Process (too late)': 'late',
+    'Cancelled (too early)': 'early',
+    'Approved': 'approved',
+    'Fully successful': 'approved',
+}
+
+_EMOJI_OUTCOMES = {'✅': 'approved', '⏩': 'early', '⏰': 'late'}
+
+
+def parse_summary(path):
+    """Return (date, [(offset_seconds, outcome, account, court, slot_time), ...]) for one summary file."""
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+
+    header = _HEADER_RE.search(text)
+    if header:
+        date = datetime.strptime(header.group(1), '%Y-%m-%d')
+    else:
+        date = datetime.strptime(re.search(r'(\d{8})', os.path.basename(path)).group(1), '%Y%m%d')
+
+    account_outcomes = {}
+    for line in text.splitlines():
+        match = re.match(r'^\S+\s+(?:Submission Confirmed \+ )?([^:]+):\s*(.+)$', line.strip())
+        if match and match.group(1).strip() in _ACCOUNT_OUTCOMES:
+            for account in match.group(2).split(','):
+                account_outcomes[account.strip()] = _ACCOUNT_OUTCOMES[match.group(1).strip()]
+
+    observations = []
+    in_results = False
+    for line in text.splitlines():
+        if line.startswith('SUBMISSION RESULTS'):
+            in_results = True
+            continue
+        if in_results and line.startswith('ACCOUNT SUMMARY'):
+            break
+        match = _ATTEMPT_RE.match(line) if in_results else None
+        if not match:
+            continue
+        hour, minute, second, millis, emoji, account, court, slot_time, _ = match.groups()
+        # Only the scheduled 08:00 run; later manual reruns say nothing about the opening
+        if (int(hour), int(minute)) != (8, 0):
+            continue
+        outcome = _EMOJI_OUTCOMES.get(emoji)
+        if outcome is None and emoji == '❌':
+            outcome = account_outcomes.get(account)
+            if outcome == 'approved':
+                outcome = None
+        if outcome is None:
+            continue
+        observations.append((int(second) + int(millis) / 1000, outcome, account, int(court), slot_time))
+    return date, observations
+
+
+def load_history(pattern=SUMMARY_GLOB):
+    """Classified observations from every summary, keyed by weekday of the run."""
+    by_weekday = defaultdict(list)
+    for path in sorted(glob.glob(pattern)):
+        try:
+            date, observations = parse_summary(path)
+        except Exception as e:
+            logging.warning(f"Skipping unreadable summary {path}: {e}")
+            continue
+        by_weekday[date.weekday()].extend(observations)
+    return by_weekday
+
+
+def best_split(left, right):
+    """
+    Boundary separating ``left`` points (should be before it) from ``right`` points (after it)
+    with the fewest misclassifications. Returns (estimate, uncertainty, errors) or None.
+    """
+    if not left or not right:
+        return None
+    points = sorted(set(left) | set(right))
+    # Candidate boundaries: before all points, every gap between points, after all points
+    gaps = [(points[0], points[0])] + list(zip(points, points[1:])) + [(points[-1], points[-1])]
+    scored = []
+    for lo, hi in gaps:
+        boundary = (lo + hi) / 2
+        errors = sum(1 for x in left if x > boundary) + sum(1 for x in right if x < boundary)
+        scored.append((errors, lo, hi))
+    min_errors = min(e for e, _, _ in scored)
+    best = [(lo, hi) for e, lo, hi in scored if e == min_errors]
+    lower, upper = best[0][0], best[-1][1]
+    return (lower + upper) / 2, (upper - lower) / 2, min_errors
+
+
+def approval_rate(observations, at, bandwidth=KERNEL_BANDWIDTH, prior_rate=None, prior_weight=1.0):
+    """Kernel-smoothed share of approved submissions around offset ``at``."""
+    weight = hits = 0.0
+    for offset, outcome, *_ in observations:
+        w = math.exp(-0.5 * ((offset - at) / bandwidth) ** 2)
+        weight += w
+        hits += w * (outcome == 'approved')
+    if prior_rate is not None:
+        weight += prior_weight
+        hits += prior_weight * prior_rate
+    return hits / weight if weight else 0.0
+
+
+class WeekdayCalibration:
+    """Acceptance window estimate and chosen submit point for one weekday."""
+
+    def __init__(self, weekday, observations, pooled=None):
+        self.weekday = weekday
+        self.observations = observations
+        offsets = defaultdict(list)
+        for offset, outcome, *_ in observations:
+            offsets[outcome].append(offset)
+        # Anything processed (approved or rejected as taken) means the server was already open
+        self.opening = best_split(offsets['early'], offsets['approved'] + offsets['late'])
+        # Rejections before the opening are lost races for a contested slot, not lateness
+        opened = self.opening[0] if self.opening else -math.inf
+        self.closing = best_split(
+            [o for o in offsets['approved'] if o >= opened],
+            [o for o in offsets['late'] if o >= opened],
+        )
+        self.counts = {k: len(v) for k, v in offsets.items()}
+        self.pooled = pooled
+        self.point = None
+        self.expected_hit_rate = None
+        if len(observations) >= MIN_OBSERVATIONS and offsets['approved']:
+            self._choose_point()
+
+    def _choose_point(self):
+        all_offsets = [o for o, *_ in self.observations]
+        start = min(all_offsets)
+        end = max(all_offsets)
+        if self.opening:
+            # Don't plan inside the uncertain part of the opening boundary
+            start = max(start, self.opening[0] + self.opening[1])
+        if self.closing:
+            # ...nor inside the uncertain part of the closing one
+            end = min(end, self.closing[0] - self.closing[1])
+        if end < start:
+            return  # the boundaries' uncertainties overlap; no safe point
+        prior = None
+        if self.pooled:
+            prior = approval_rate(self.pooled, start)
+        best = None
+        steps = int(round((end - start) / SEARCH_STEP))
+        for i in range(steps + 1):
+            at = start + i * SEARCH_STEP
+            rate = approval_rate(self.observations, at, prior_rate=prior)
+            if best is None or rate > best[1] + 1e-9:
+                best = (at, rate)
+        self.point, self.expected_hit_rate = best
+
+    @property
+    def usable(self):
+        """True if the point may replace the hand-edited timing: both boundaries known and a decent hit rate."""
+        return (
+            self.point is not None and self.opening is not None and self.closing is not None
+            and self.expected_hit_rate >= MIN_EXPECTED_HIT_RATE
+        )
+
+    @property
+    def timing(self):
+        """{"second": int, "millisecond": int} for SUBMIT_TIMING_BY_DAY, or None."""
+        if self.point is None:
+            return None
+        total_ms = int(round(self.point * 1000))
+        return {"second": total_ms // 1000, "millisecond": total_ms % 1000}
+
+    def to_dict(self):
+        entry = dict(self.timing or {})
+        entry.update({
+            'expected_hit_rate': round(self.expected_hit_rate, 3) if self.expected_hit_rate is not None else None,
+            'observations': len(self.observations),
+            'counts': self.counts,
+        })
+        if self.observations:
+            offsets = [o for o, *_ in self.observations]
+            entry['observed'] = {'first': round(min(offsets), 3), 'last': round(max(offsets), 3)}
+        if self.opening:
+            entry['opens'] = {'offset': round(self.opening[0], 3), 'uncertainty': round(self.opening[1], 3), 'errors': self.opening[2]}
+        if self.closing:
+            entry['closes'] = {'offset': round(self.closing[0], 3), 'uncertainty': round(self.closing[1], 3), 'errors': self.closing[2]}
+        return entry
+
+    def describe(self):
+        name = WEEKDAY_NAMES[self.weekday]
+        counts = ", ".join(f"{k} {v}" for k, v in sorted(self.counts.items()))
+        lines = [f"{name}: {len(self.observations)} classified submissions ({counts or 'none'})"]
+        if self.opening:
+            lines.append(f"  opens  ≈ 8:00:{self.opening[0]:06.3f} ±{self.opening[1]*1000:.0f}ms ({self.opening[2]} misclassified)")
+        else:
+            lines.append("  opens  : not bracketed by the data")
+        if self.closing:
+            lines.append(f"  closes ≈ 8:00:{self.closing[0]:06.3f} ±{self.closing[1]*1000:.0f}ms ({self.closing[2]} misclassified)")
+        else:
+            lines.append("  closes : not bracketed by the data")
+        if self.point is not None:
+            lines.append(f"  submit at 8:00:{self.point:06.3f} (expected hit rate {self.expected_hit_rate:.0%})")
+            if not self.usable:
+                lines.append(
+                    f"  no override (needs both boundaries and an expected hit rate of {MIN_EXPECTED_HIT_RATE:.0%}+)"
+                )
+        elif self.opening and self.closing and self.counts.get('approved') and len(self.observations) >= MIN_OBSERVATIONS:
+            lines.append("  no override (opening and closing uncertainties overlap)")
+        else:
+            lines.append(f"  no override (needs {MIN_OBSERVATIONS}+ classified submissions including an approval)")
+        return "\n".join(lines)
+
+
+def calibrate(pattern=SUMMARY_GLOB):
+    """WeekdayCalibration for every weekday that has history."""
+    by_weekday = load_history(pattern)
+    pooled = [obs for observations in by_weekday.values() for obs in observations]
+    return {weekday: WeekdayCalibration(weekday, observations, pooled=pooled) for weekday, observations in sorted(by_weekday.items())}
+
+
+def write_overrides(calibrations, path=TIMING_OVERRIDE_FILE):
+    data = {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'timings': {str(weekday): cal.to_dict() for weekday, cal in calibrations.items() if cal.usable},
+        'windows': {str(weekday): cal.to_dict() for weekday, cal in calibrations.items()},
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+    return data
+
+
+def _usable_entry(entry):
+    """Same gate as WeekdayCalibration.usable, applied to a saved entry (files may predate it)."""
+    return (
+        'opens' in entry and 'closes' in entry
+        and (entry.get('observations') or 0) >= MIN_OBSERVATIONS
+        and (entry.get('expected_hit_rate') or 0) >= MIN_EXPECTED_HIT_RATE
+    )
+
+
+def load_override(weekday, path=TIMING_OVERRIDE_FILE):
+    """Calibrated {"second", "millisecond", ...} for ``weekday``, or None if there isn't one."""
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logging.warning(f"Ignoring unreadable timing override file {path}: {e}")
+        return None
+    entry = data.get('timings', {}).get(str(weekday))
+    if not entry or 'second' not in entry or 'millisecond' not in entry:
+        return None
+    # Files written before the usability check may hold one-sided or low-hit-rate points
+    if not _usable_entry(entry):
+        logging.info(f"Ignoring calibrated timing for {WEEKDAY_NAMES[weekday]}: window not bracketed or expected hit rate too low")
+        return None
+    return entry
+
+
+def load_window(weekday, path=TIMING_OVERRIDE_FILE):
+    """
+    Estimated acceptance window for ``weekday`` (opens/closes offsets after 8:00, hit rate), or
+    None unless it passes the same gate as an override (both boundaries, enough observations,
+    expected hit rate); the submit planner then keeps the fixed stagger.
+    """
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    entry = data.get('windows', {}).get(str(weekday))
+    if not entry or not _usable_entry(entry):
+        return None
+    return entry
+
+
+def render_report(calibrations, next_run=None):
+    lines = ["SUBMIT TIMING CALIBRATION", "=" * 60]
+    for cal in calibrations.values():
+        lines.append(cal.describe())
+    if next_run is not None:
+        cal = calibrations.get(next_run.weekday())
+        name = WEEKDAY_NAMES[next_run.weekday()]
+        if cal and cal.usable:
+            lines.append(
+                f"\nNext run ({name} {next_run.strftime('%Y-%m-%d')}): submit at "
+                f"8:00:{cal.timing['second']:02d}.{cal.timing['millisecond']:03d}, "
+                f"expected hit rate {cal.expected_hit_rate:.0%}"
+            )
+        else:
+            lines.append(f"\nNext run ({name} {next_run.strftime('%Y-%m-%d')}): no calibrated timing, SUBMIT_TIMING_BY_DAY applies")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Calibrate per-weekday submit timing from past booking summaries')
+    parser.add_argument('--summaries', default=SUMMARY_GLOB, help='Glob of booking summary files')
+    parser.add_argument('--output', default=TIMING_OVERRIDE_FILE)
+    parser.add_argument('--dry-run', action='store_true', help='Print the report without writing the override file')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    calibrations = calibrate(args.summaries)
+    if not calibrations:
+        print("No booking summaries found.")
+        return
+    print(render_report(calibrations, next_run=datetime.now() + timedelta(days=1)))
+    if not args.dry_run:
+        write_overrides(calibrations, args.output)
+        print(f"\nTiming overrides saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()